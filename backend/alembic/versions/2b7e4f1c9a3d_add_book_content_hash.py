@@ -0,0 +1,27 @@
+"""add content_hash to books
+
+Revision ID: 2b7e4f1c9a3d
+Revises: 1a2b3c4d5e6f
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e4f1c9a3d'
+down_revision = '1a2b3c4d5e6f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('books', sa.Column('content_hash', sa.String(), nullable=True))
+    op.create_index(op.f('ix_books_content_hash'), 'books', ['content_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_books_content_hash'), table_name='books')
+    with op.batch_alter_table('books') as batch_op:
+        batch_op.drop_column('content_hash')
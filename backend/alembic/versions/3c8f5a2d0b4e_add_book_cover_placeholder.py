@@ -0,0 +1,26 @@
+"""add cover_placeholder to books
+
+Revision ID: 3c8f5a2d0b4e
+Revises: 2b7e4f1c9a3d
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8f5a2d0b4e'
+down_revision = '2b7e4f1c9a3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los marcadores de portadas existentes se generan con `python optimize_covers.py --placeholders`
+    op.add_column('books', sa.Column('cover_placeholder', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('books') as batch_op:
+        batch_op.drop_column('cover_placeholder')
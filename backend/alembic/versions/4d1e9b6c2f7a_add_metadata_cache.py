@@ -0,0 +1,29 @@
+"""add metadata_cache table
+
+Revision ID: 4d1e9b6c2f7a
+Revises: 3c8f5a2d0b4e
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d1e9b6c2f7a'
+down_revision = '3c8f5a2d0b4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('metadata_cache',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('model', sa.String(), nullable=True),
+    sa.Column('result', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('metadata_cache')
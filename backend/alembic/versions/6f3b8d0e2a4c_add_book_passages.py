@@ -0,0 +1,56 @@
+"""add book_passages content index
+
+Revision ID: 6f3b8d0e2a4c
+Revises: 5e2a7c9d1f3b
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f3b8d0e2a4c'
+down_revision = '5e2a7c9d1f3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # El backend crea las tablas nuevas al arrancar (create_all): puede que ya exista
+    if 'book_passages' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('book_passages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=True),
+    sa.Column('page', sa.Integer(), nullable=True),
+    sa.Column('char_offset', sa.Integer(), nullable=True),
+    sa.Column('text', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_book_passages_book_id'), 'book_passages', ['book_id'], unique=False)
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS book_passages_fts USING fts5(text, content='book_passages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS book_passages_fts_ai AFTER INSERT ON book_passages BEGIN
+        INSERT INTO book_passages_fts(rowid, text) VALUES (new.id, new.text);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS book_passages_fts_ad AFTER DELETE ON book_passages BEGIN
+        INSERT INTO book_passages_fts(book_passages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS book_passages_fts_au AFTER UPDATE OF text ON book_passages BEGIN
+        INSERT INTO book_passages_fts(book_passages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO book_passages_fts(rowid, text) VALUES (new.id, new.text);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS books_passages_ad AFTER DELETE ON books BEGIN
+        DELETE FROM book_passages WHERE book_id = old.id;
+    END""")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS books_passages_ad")
+    op.execute("DROP TRIGGER IF EXISTS book_passages_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS book_passages_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS book_passages_fts_ai")
+    op.execute("DROP TABLE IF EXISTS book_passages_fts")
+    op.drop_index(op.f('ix_book_passages_book_id'), table_name='book_passages')
+    op.drop_table('book_passages')
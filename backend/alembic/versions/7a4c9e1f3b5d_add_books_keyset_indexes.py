@@ -0,0 +1,27 @@
+"""add composite indexes for keyset pagination of books
+
+Revision ID: 7a4c9e1f3b5d
+Revises: 6f3b8d0e2a4c
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c9e1f3b5d'
+down_revision = '6f3b8d0e2a4c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_books_category_id', 'books', ['category', 'id'], unique=False)
+    op.create_index('ix_books_author_id', 'books', ['author', 'id'], unique=False)
+    op.create_index('ix_books_title_id', 'books', ['title', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_books_title_id', table_name='books')
+    op.drop_index('ix_books_author_id', table_name='books')
+    op.drop_index('ix_books_category_id', table_name='books')
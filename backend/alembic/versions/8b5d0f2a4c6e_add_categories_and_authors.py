@@ -0,0 +1,80 @@
+"""add categories and authors tables with book counts
+
+Revision ID: 8b5d0f2a4c6e
+Revises: 7a4c9e1f3b5d
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b5d0f2a4c6e'
+down_revision = '7a4c9e1f3b5d'
+branch_labels = None
+depends_on = None
+
+CATALOG = (("categories", "category"), ("authors", "author"))
+
+
+def upgrade():
+    # El backend crea las tablas nuevas al arrancar (create_all): puede que ya existan
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    for table, column in CATALOG:
+        if table in existing:
+            op.execute(f"DELETE FROM {table}")
+        else:
+            op.create_table(table,
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('book_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+            )
+        # ADD COLUMN directo: el modo batch recrearía `books` y perdería sus triggers FTS5
+        op.execute(f"ALTER TABLE books ADD COLUMN {column}_id INTEGER REFERENCES {table}(id)")
+        op.create_index(f'ix_books_{column}_fk', 'books', [f'{column}_id'], unique=False)
+
+        # Relleno a partir de los libros existentes
+        op.execute(f"INSERT INTO {table}(name, book_count) SELECT {column}, COUNT(*) FROM books WHERE {column} IS NOT NULL GROUP BY {column}")
+        op.execute(f"UPDATE books SET {column}_id = (SELECT id FROM {table} WHERE name = books.{column})")
+
+        fk = f"{column}_id"
+        add_new = f"""
+        INSERT OR IGNORE INTO {table}(name, book_count) SELECT new.{column}, 0 WHERE new.{column} IS NOT NULL;
+        UPDATE {table} SET book_count = book_count + 1 WHERE name = new.{column};
+        UPDATE books SET {fk} = (SELECT id FROM {table} WHERE name = new.{column}) WHERE id = new.id;"""
+        remove_old = f"""
+        UPDATE {table} SET book_count = book_count - 1 WHERE id = old.{fk};
+        DELETE FROM {table} WHERE id = old.{fk} AND book_count <= 0;"""
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS books_{table}_ai AFTER INSERT ON books BEGIN{add_new}\n    END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS books_{table}_ad AFTER DELETE ON books BEGIN{remove_old}\n    END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS books_{table}_au AFTER UPDATE OF {column} ON books WHEN old.{column} IS NOT new.{column} BEGIN{remove_old}{add_new}\n    END")
+
+
+def downgrade():
+    for table, column in reversed(CATALOG):
+        for suffix in ("au", "ad", "ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS books_{table}_{suffix}")
+        op.drop_index(f'ix_books_{column}_fk', table_name='books')
+    # SQLite no permite DROP COLUMN de una clave ajena: se recrea la tabla...
+    with op.batch_alter_table('books') as batch_op:
+        batch_op.drop_column('author_id')
+        batch_op.drop_column('category_id')
+    for table, _column in reversed(CATALOG):
+        op.drop_table(table)
+    # ...y se restauran los triggers de las revisiones anteriores
+    op.execute("""CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, category) VALUES (new.id, new.title, new.author, new.category);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, category) VALUES ('delete', old.id, old.title, old.author, old.category);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, category ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, category) VALUES ('delete', old.id, old.title, old.author, old.category);
+        INSERT INTO books_fts(rowid, title, author, category) VALUES (new.id, new.title, new.author, new.category);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS books_passages_ad AFTER DELETE ON books BEGIN
+        DELETE FROM book_passages WHERE book_id = old.id;
+    END""")
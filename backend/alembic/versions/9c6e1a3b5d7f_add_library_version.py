@@ -0,0 +1,40 @@
+"""add library_version counter bumped by triggers on books
+
+Revision ID: 9c6e1a3b5d7f
+Revises: 8b5d0f2a4c6e
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c6e1a3b5d7f'
+down_revision = '8b5d0f2a4c6e'
+branch_labels = None
+depends_on = None
+
+EVENTS = (("ai", "INSERT"), ("ad", "DELETE"), ("au", "UPDATE"))
+
+
+def upgrade():
+    # El backend crea las tablas nuevas al arrancar (create_all): puede que ya exista
+    if 'library_version' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('library_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.execute("INSERT OR IGNORE INTO library_version(id, version) VALUES (1, 0)")
+    for suffix, event in EVENTS:
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS books_version_{suffix} AFTER {event} ON books BEGIN\n"
+            "        UPDATE library_version SET version = version + 1 WHERE id = 1;\n    END"
+        )
+
+
+def downgrade():
+    for suffix, _event in EVENTS:
+        op.execute(f"DROP TRIGGER IF EXISTS books_version_{suffix}")
+    op.drop_table('library_version')
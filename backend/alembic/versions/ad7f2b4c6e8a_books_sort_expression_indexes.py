@@ -0,0 +1,34 @@
+"""replace books keyset composite indexes with coalesce sort indexes
+
+Revision ID: ad7f2b4c6e8a
+Revises: 9c6e1a3b5d7f
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'ad7f2b4c6e8a'
+down_revision = '9c6e1a3b5d7f'
+branch_labels = None
+depends_on = None
+
+SORT_COLUMNS = ("title", "author")
+
+
+def upgrade():
+    # SQLite añade el rowid a cada índice: (category, id) duplicaba ix_books_category, etc.
+    for column in ("category", "author", "title"):
+        op.execute(f"DROP INDEX IF EXISTS ix_books_{column}_id")
+    # El orden por título/autor trata NULL como '' para que la clave (columna, id) sea comparable
+    for column in SORT_COLUMNS:
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_books_{column}_sort ON books (coalesce({column}, ''))")
+
+
+def downgrade():
+    for column in SORT_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_books_{column}_sort")
+    op.create_index('ix_books_category_id', 'books', ['category', 'id'], unique=False)
+    op.create_index('ix_books_author_id', 'books', ['author', 'id'], unique=False)
+    op.create_index('ix_books_title_id', 'books', ['title', 'id'], unique=False)
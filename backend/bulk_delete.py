@@ -0,0 +1,68 @@
+"""Borrado masivo de libros: filas, vectores RAG y archivos.
+
+Borrar una categoría grande libro a libro (cargar cada objeto del ORM, un
+DELETE por fila, dos `os.remove` síncronos y una llamada a ChromaDB por
+libro) tarda minutos. Aquí:
+
+1. `crud.delete_books_bulk` borra las filas con una sentencia
+   DELETE … RETURNING que devuelve id, archivo y portada (los triggers de
+   FTS5, catálogo, contenido y versión siguen actuando por fila dentro de SQLite);
+2. los vectores se borran con un solo filtro `$in` (`rag.delete_books_from_rag`);
+3. los archivos y portadas se borran en un pool de hilos en segundo plano
+   (`UNLINK_WORKERS`), sin que la petición espere por el disco.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+UNLINK_WORKERS = int(os.getenv("BULK_DELETE_UNLINK_WORKERS", "4"))
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=UNLINK_WORKERS, thread_name_prefix="unlink")
+    return _executor
+
+
+def _unlink(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        print(f"Advertencia: no se pudo borrar {path}: {e}")
+        return False
+
+
+def remove_files(paths) -> list:
+    """Programa el borrado de los archivos en el pool de hilos. Devuelve los futures."""
+    pool = _pool()
+    return [pool.submit(_unlink, path) for path in paths if path]
+
+
+def book_files(rows: list[dict]) -> list[str]:
+    """Rutas absolutas del archivo y la portada de cada libro borrado."""
+    from .crud import get_abs_path
+    return [get_abs_path(row[key]) for row in rows for key in ("file_path", "cover_image_url") if row.get(key)]
+
+
+def delete_books(db, book_ids: list[int] | None = None, category: str | None = None) -> dict:
+    """Borra los libros indicados (por IDs o por categoría) con sus vectores RAG y sus archivos.
+
+    Devuelve `deleted` (número) e `ids` (los que existían y se han borrado).
+    Los archivos se borran en segundo plano.
+    """
+    from . import crud
+    rows = crud.delete_books_bulk(db, book_ids=book_ids, category=category)
+    ids = [row["id"] for row in rows]
+    if ids:
+        try:
+            from . import rag
+            rag.delete_books_from_rag([str(i) for i in ids])
+        except Exception as e:
+            print(f"Advertencia: fallo al limpiar RAG para {len(ids)} libros: {e}")
+        remove_files(book_files(rows))
+    return {"deleted": len(ids), "ids": ids}
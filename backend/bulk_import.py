@@ -0,0 +1,341 @@
+"""Importación masiva de libros desde un árbol de directorios.
+
+Pensado para cargar archivos grandes (miles de libros) sin pasar por
+`/upload-book/` uno a uno:
+
+1. Recorre el directorio y descarta lo ya procesado según el checkpoint.
+2. Calcula el SHA-256 de cada archivo en un pool de procesos y deduplica
+   contra la biblioteca y contra el propio lote.
+3. Copia cada libro nuevo a `books/`, extrae el extracto, la portada y los
+   metadatos propios del archivo en el pool de procesos.
+4. Analiza con IA, de forma concurrente y mientras el pool prepara el lote
+   siguiente, solo los libros cuyos metadatos propios no son fiables (varios
+   libros por llamada si se indica `analyze_batch`).
+5. Inserta los libros de cada lote en una sola transacción y anota el
+   resultado en el checkpoint, de modo que una importación interrumpida se
+   reanuda donde se quedó.
+
+Uso desde la línea de comandos (desde la raíz del proyecto):
+
+    python -m backend.bulk_import /ruta/al/archivo --workers 4 --batch-size 50
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import covers, crud, database, ingest, local_metadata, utils
+
+SUPPORTED_EXTENSIONS = (".pdf", ".epub")
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_LLM_CONCURRENCY = 8
+DEFAULT_LLM_BATCH_SIZE = 8
+CHECKPOINTS_DIR = (Path(__file__).resolve().parent / "import_checkpoints").resolve()
+
+
+# --- Recorrido y checkpoint ---
+def iter_book_files(root: str):
+    """Devuelve, en orden estable, las rutas absolutas de los libros bajo `root`."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.abspath(os.path.join(dirpath, name))
+
+
+def default_checkpoint_path(root: str) -> str:
+    """Checkpoint por directorio de origen, dentro de `backend/import_checkpoints/`."""
+    key = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return str(CHECKPOINTS_DIR / f"{key}.jsonl")
+
+
+def load_checkpoint(checkpoint_path: str) -> dict[str, dict]:
+    """Lee el checkpoint (JSON Lines) y devuelve el último registro de cada ruta."""
+    done = {}
+    if not os.path.exists(checkpoint_path):
+        return done
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Última línea truncada por una interrupción: se reprocesa
+                continue
+            done[record["path"]] = record
+    return done
+
+
+def append_checkpoint(checkpoint_path: str, records: list[dict]):
+    if not records:
+        return
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    with open(checkpoint_path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# --- Trabajo en el pool de procesos ---
+def _unique_destination(src_path: str, content_hash: str, books_dir: str) -> tuple[str, bool]:
+    """Elige el destino en `books/` y lo reserva. Devuelve (ruta, reservado).
+
+    El nombre se reserva creando el archivo con `O_CREAT | O_EXCL`, así que dos
+    procesos del pool con libros del mismo nombre (en subcarpetas distintas)
+    nunca eligen el mismo destino. Si ya existe el mismo archivo (reanudación)
+    se reutiliza sin reservarlo (`reservado` es False).
+    """
+    base, ext = os.path.splitext(os.path.basename(src_path))
+    candidate = os.path.join(books_dir, f"{base}{ext}")
+    counter = 1
+    while True:
+        try:
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return candidate, True
+        except FileExistsError:
+            if utils.file_sha256(candidate) == content_hash:
+                return candidate, False
+        candidate = os.path.join(books_dir, f"{base}_{counter}{ext}")
+        counter += 1
+
+
+def prepare_book_file(src_path: str, content_hash: str, books_dir: str, covers_dir_fs: str, covers_url_prefix: str) -> dict:
+    """Copia un libro a la biblioteca y extrae su extracto y portada (se ejecuta en un proceso hijo)."""
+    dest_path = None
+    claimed = False
+    try:
+        dest_path, claimed = _unique_destination(src_path, content_hash, books_dir)
+        if claimed:
+            shutil.copyfile(src_path, dest_path)
+        data = ingest.read_book(dest_path, covers_dir_fs, covers_url_prefix)
+        cover_url = data["cover_image_url"]
+        placeholder = covers.make_placeholder(os.path.join(covers_dir_fs, os.path.basename(cover_url))) if cover_url else None
+        return {
+            "path": src_path, "hash": content_hash, "dest_path": dest_path, "text": data["text"],
+            "cover_image_url": cover_url, "cover_placeholder": placeholder,
+            "local_metadata": data.get("local_metadata"),
+        }
+    except Exception as e:
+        # Solo se borra lo que ha copiado este proceso, nunca un archivo reutilizado
+        if claimed and os.path.exists(dest_path):
+            os.remove(dest_path)
+        detail = getattr(e, "detail", None) or str(e)
+        return {"path": src_path, "hash": content_hash, "error": detail}
+
+
+def _hash_if_exists(file_path: str) -> str | None:
+    return utils.file_sha256(file_path) if file_path and os.path.exists(file_path) else None
+
+
+async def backfill_content_hashes(db, pool, resolve_path) -> int:
+    """Calcula el hash de los libros anteriores a la columna `content_hash` para poder deduplicar."""
+    loop = asyncio.get_running_loop()
+    missing = crud.get_books_without_content_hash(db)
+    if not missing:
+        return 0
+    hashes = await asyncio.gather(*(loop.run_in_executor(pool, _hash_if_exists, resolve_path(fp)) for _, fp in missing))
+    updates = {book_id: h for (book_id, _), h in zip(missing, hashes) if h}
+    crud.set_content_hashes(db, updates)
+    return len(updates)
+
+
+# --- Orquestación ---
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def import_directory(
+    root: str,
+    books_dir: str,
+    covers_dir_fs: str,
+    covers_url_prefix: str,
+    analyze,
+    relative_path,
+    resolve_path,
+    workers: int | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+    checkpoint_path: str | None = None,
+    progress: dict | None = None,
+    analyze_batch=None,
+    llm_batch_size: int = DEFAULT_LLM_BATCH_SIZE,
+) -> dict:
+    """Importa todos los libros de `root` y devuelve un informe con el rendimiento.
+
+    `analyze` es la corrutina de análisis de metadatos (p.ej. `main.analyze_with_gemini`),
+    `relative_path` convierte la ruta absoluta del libro en la que se guarda en BD y
+    `resolve_path` hace lo contrario.
+    `analyze_batch`, si se indica, analiza varios extractos en una sola llamada
+    (p.ej. `main.analyze_metadata_batch`) y se usa en grupos de `llm_batch_size`.
+    `progress`, si se indica, se actualiza en vivo con los contadores del informe.
+    """
+    started = time.monotonic()
+    checkpoint_path = checkpoint_path or default_checkpoint_path(root)
+    report = progress if progress is not None else {}
+    report.update({
+        "root": os.path.abspath(root), "checkpoint": checkpoint_path, "scanned": 0,
+        "resumed": 0, "imported": 0, "duplicates": 0, "rejected": 0, "errors": 0, "ai_skipped": 0,
+        "elapsed_seconds": 0.0, "books_per_minute": 0.0,
+    })
+
+    done = load_checkpoint(checkpoint_path)
+    pending = []
+    for path in iter_book_files(root):
+        report["scanned"] += 1
+        if path in done:
+            report["resumed"] += 1
+        else:
+            pending.append(path)
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, llm_concurrency))
+
+    async def analyze_limited(text: str) -> dict:
+        async with semaphore:
+            return await analyze(text)
+
+    async def analyze_group(texts: list[str]) -> list[dict]:
+        async with semaphore:
+            return await analyze_batch(texts)
+
+    async def analyze_all(texts: list[str]) -> list[dict]:
+        if analyze_batch is None:
+            return list(await asyncio.gather(*(analyze_limited(t) for t in texts)))
+        groups = await asyncio.gather(*(analyze_group(g) for g in _chunks(texts, max(1, llm_batch_size))))
+        return [meta for group in groups for meta in group]
+
+    def update_rate():
+        elapsed = time.monotonic() - started
+        report["elapsed_seconds"] = round(elapsed, 2)
+        report["books_per_minute"] = round(report["imported"] / elapsed * 60, 2) if elapsed > 0 else 0.0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 1. Hashes en paralelo y deduplicación (biblioteca + este mismo recorrido)
+        hashes = await asyncio.gather(*(loop.run_in_executor(pool, utils.file_sha256, p) for p in pending))
+        db = database.SessionLocal()
+        try:
+            await backfill_content_hashes(db, pool, resolve_path)
+            known = crud.get_existing_content_hashes(db, list(set(hashes)))
+            known.update(r["hash"] for r in done.values() if r.get("hash") and r.get("status") == "imported")
+            unique, duplicates = [], []
+            for path, content_hash in zip(pending, hashes):
+                if content_hash in known:
+                    duplicates.append({"path": path, "hash": content_hash, "status": "duplicate"})
+                else:
+                    known.add(content_hash)
+                    unique.append((path, content_hash))
+            append_checkpoint(checkpoint_path, duplicates)
+            report["duplicates"] += len(duplicates)
+
+            # 2. Preparación en el pool solapada con el análisis del lote anterior
+            def schedule(batch):
+                return asyncio.gather(*(
+                    loop.run_in_executor(pool, prepare_book_file, path, content_hash, books_dir, covers_dir_fs, covers_url_prefix)
+                    for path, content_hash in batch
+                ))
+
+            batches = list(_chunks(unique, max(1, batch_size)))
+            next_prepared = schedule(batches[0]) if batches else None
+            for i in range(len(batches)):
+                prepared = await next_prepared
+                if i + 1 < len(batches):
+                    next_prepared = schedule(batches[i + 1])
+
+                ready = [p for p in prepared if "error" not in p]
+                records = [{"path": p["path"], "hash": p["hash"], "status": "error", "error": p["error"]} for p in prepared if "error" in p]
+                report["errors"] += len(records)
+
+                # Solo pasan por la IA los libros cuyos metadatos propios no bastan
+                to_analyze = [p for p in ready if local_metadata.needs_ai(p.get("local_metadata"))]
+                analyzed = dict(zip((p["path"] for p in to_analyze), await analyze_all([p["text"] for p in to_analyze])))
+                report["ai_skipped"] += len(ready) - len(to_analyze)
+                rows, accepted = [], []
+                for item in ready:
+                    meta = local_metadata.combine(item.get("local_metadata"), analyzed.get(item["path"]))
+                    title = meta.get("title", "Desconocido")
+                    author = meta.get("author", "Desconocido")
+                    # Misma puerta de calidad que /upload-book/
+                    if title == "Desconocido" and author == "Desconocido":
+                        os.remove(item["dest_path"])
+                        records.append({"path": item["path"], "hash": item["hash"], "status": "rejected"})
+                        report["rejected"] += 1
+                        continue
+                    rows.append({
+                        "title": title,
+                        "author": author,
+                        "category": meta.get("category", "Desconocido"),
+                        "cover_image_url": item["cover_image_url"],
+                        "file_path": relative_path(item["dest_path"]),
+                        "content_hash": item["hash"],
+                        "cover_placeholder": item["cover_placeholder"],
+                    })
+                    accepted.append(item)
+
+                # 3. Inserción del lote en una sola transacción
+                ids = crud.create_books_bulk(db, rows) if rows else []
+                for item, book_id in zip(accepted, ids):
+                    records.append({"path": item["path"], "hash": item["hash"], "status": "imported", "book_id": book_id})
+                report["imported"] += len(ids)
+                append_checkpoint(checkpoint_path, records)
+                update_rate()
+        finally:
+            db.close()
+
+    update_rate()
+    return report
+
+
+def _format_report(report: dict) -> str:
+    return (
+        f"Escaneados: {report['scanned']} | Ya procesados: {report['resumed']} | "
+        f"Importados: {report['imported']} | Duplicados: {report['duplicates']} | "
+        f"Rechazados: {report['rejected']} | Errores: {report['errors']} | Sin IA: {report['ai_skipped']}\n"
+        f"Tiempo: {report['elapsed_seconds']:.1f}s | Rendimiento: {report['books_per_minute']:.1f} libros/min"
+    )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Importa en bloque todos los PDF/EPUB de un directorio.")
+    parser.add_argument("directory", help="Directorio raíz a recorrer")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para extracción y portadas (por defecto, nº de CPUs)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Libros por transacción")
+    parser.add_argument("--llm-concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY, help="Llamadas de IA simultáneas")
+    parser.add_argument("--llm-batch-size", type=int, default=DEFAULT_LLM_BATCH_SIZE, help="Libros analizados en cada llamada de IA")
+    parser.add_argument("--checkpoint", default=None, help="Archivo de checkpoint (JSON Lines)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"No existe el directorio: {args.directory}")
+
+    # Importación diferida: la app solo se carga en el proceso principal, no en los workers
+    from . import main as app_main
+
+    report = asyncio.run(import_directory(
+        args.directory,
+        str(app_main.BOOKS_DIR_FS),
+        str(app_main.STATIC_COVERS_DIR_FS),
+        app_main.STATIC_COVERS_URL_PREFIX,
+        app_main.analyze_metadata,
+        app_main.get_relative_path,
+        app_main.get_safe_path,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        llm_concurrency=args.llm_concurrency,
+        checkpoint_path=args.checkpoint,
+        analyze_batch=app_main.analyze_metadata_batch,
+        llm_batch_size=args.llm_batch_size,
+    ))
+    print(_format_report(report))
+
+
+if __name__ == "__main__":
+    main()
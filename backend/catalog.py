@@ -0,0 +1,51 @@
+"""Tablas normalizadas de categorías y autores con su número de libros.
+
+`books` conserva las columnas de texto `category` y `author` (las usan la
+búsqueda FTS5, la API y los scripts), y además apunta a `categories` y
+`authors` con `category_id` y `author_id`. Unos triggers de SQLite mantienen
+ambas cosas al día en cada INSERT, UPDATE y DELETE de `books`, también los
+que no pasan por el ORM:
+
+- crean la categoría/el autor la primera vez que aparece;
+- suman o restan uno a `book_count`;
+- borran la fila cuando se queda sin libros, de modo que `/categories/` solo
+  lista categorías con libros sin recorrer la tabla `books`.
+"""
+
+CATALOG_TABLES = ("categories", "authors")
+
+
+def _triggers(table: str, column: str) -> list[str]:
+    """Triggers que mantienen `table` (categories/authors) a partir de `books.column`."""
+    fk = f"{column}_id"
+    add_new = f"""
+        INSERT OR IGNORE INTO {table}(name, book_count) SELECT new.{column}, 0 WHERE new.{column} IS NOT NULL;
+        UPDATE {table} SET book_count = book_count + 1 WHERE name = new.{column};
+        UPDATE books SET {fk} = (SELECT id FROM {table} WHERE name = new.{column}) WHERE id = new.id;"""
+    remove_old = f"""
+        UPDATE {table} SET book_count = book_count - 1 WHERE id = old.{fk};
+        DELETE FROM {table} WHERE id = old.{fk} AND book_count <= 0;"""
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS books_{table}_ai AFTER INSERT ON books BEGIN{add_new}\n    END",
+        f"CREATE TRIGGER IF NOT EXISTS books_{table}_ad AFTER DELETE ON books BEGIN{remove_old}\n    END",
+        f"CREATE TRIGGER IF NOT EXISTS books_{table}_au AFTER UPDATE OF {column} ON books WHEN old.{column} IS NOT new.{column} BEGIN{remove_old}{add_new}\n    END",
+    ]
+
+
+CATALOG_DDL = _triggers("categories", "category") + _triggers("authors", "author")
+
+
+def backfill_statements(table: str, column: str) -> list[str]:
+    """Rellena `table` y `books.{column}_id` a partir de los libros existentes."""
+    return [
+        f"DELETE FROM {table}",
+        f"INSERT INTO {table}(name, book_count) SELECT {column}, COUNT(*) FROM books WHERE {column} IS NOT NULL GROUP BY {column}",
+        f"UPDATE books SET {column}_id = (SELECT id FROM {table} WHERE name = books.{column})",
+    ]
+
+
+def on_books_created(_table, connection, **_kw):
+    """Listener `after_create` de `books`: crea los triggers de categorías y autores."""
+    if connection.dialect.name == "sqlite":
+        for statement in CATALOG_DDL:
+            connection.exec_driver_sql(statement)
@@ -0,0 +1,148 @@
+"""Conversión de EPUB a PDF por capítulos en paralelo.
+
+Cada documento del spine (más una página de portada si la hay) se renderiza
+con WeasyPrint en un proceso del pool y se escribe a un PDF propio en un
+directorio temporal. Después PyMuPDF une los PDF de los capítulos, uno a uno,
+con guardados incrementales sobre el archivo de destino.
+
+Como cada proceso solo tiene en memoria el capítulo que está renderizando, y
+la unión solo el capítulo que está añadiendo, el consumo máximo depende del
+número de capítulos simultáneos (`CONVERSION_WORKERS`), no del tamaño del libro. La conversión devuelve un
+informe con el tiempo de cada capítulo.
+"""
+import mimetypes
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from .epub_engine import open_epub
+
+EPUB_BASE_URL = "file:///__epub__/"
+# Se incrementa cuando cambia el resultado de la conversión (invalida la caché de PDFs)
+CONVERTER_VERSION = 2
+# Capítulos que se renderizan a la vez (cada uno en su propio proceso)
+CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def epub_url_fetcher(book):
+    """`url_fetcher` de WeasyPrint que sirve los recursos directamente desde el zip del EPUB."""
+    from weasyprint.urls import default_url_fetcher
+
+    def fetcher(url, *args, **kwargs):
+        if url.startswith(EPUB_BASE_URL):
+            path = book.resolve(url[len(EPUB_BASE_URL):], base="")
+            mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            return {"string": book.read(path), "mime_type": mime_type, "redirected_url": url}
+        if url.startswith("file:"):
+            # Un EPUB no debe poder leer archivos locales del servidor
+            raise ValueError(f"Recurso no permitido en el EPUB: {url}")
+        return default_url_fetcher(url, *args, **kwargs)
+    return fetcher
+
+
+def render_chapter(epub_path: str, item_path: str | None, target_path: str) -> dict:
+    """Renderiza un capítulo (o la portada si `item_path` es None) a su propio PDF.
+
+    Se ejecuta en un proceso del pool: abre el EPUB por su cuenta y solo lee
+    del zip el capítulo y los recursos que este enlaza.
+    """
+    from weasyprint import HTML, CSS
+
+    start = time.perf_counter()
+    with open_epub(epub_path) as book:
+        fetcher = epub_url_fetcher(book)
+        stylesheets = [
+            CSS(string=book.read(item["path"]).decode("utf-8", errors="replace"), base_url=EPUB_BASE_URL + item["path"], url_fetcher=fetcher)
+            for item in book.stylesheets()
+        ]
+        if item_path is None:
+            cover = book.cover_item()
+            html = HTML(
+                string=f"<html><body style='text-align: center; margin: 0; padding: 0;'><img src='{EPUB_BASE_URL}{cover['path']}' style='width: 100%; height: 100%; object-fit: contain;'/></body></html>",
+                url_fetcher=fetcher,
+            )
+        else:
+            html = HTML(string=book.read(item_path).decode("utf-8", errors="replace"), base_url=EPUB_BASE_URL + item_path, url_fetcher=fetcher)
+        document = html.render(stylesheets=stylesheets)
+        document.write_pdf(target=target_path)
+    return {
+        "chapter": item_path or "cover",
+        "pages": len(document.pages),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def merge_pdfs(parts: list[str], output_path: str) -> int:
+    """Une los PDF de los capítulos en `output_path` (escritura atómica) y devuelve el número de páginas.
+
+    El primer capítulo se convierte en el archivo de salida y cada uno de los
+    siguientes se añade con un guardado incremental (`saveIncr`), cerrando y
+    reabriendo el documento entre capítulos: en memoria solo están el capítulo
+    que se está uniendo y la tabla de objetos, no el libro entero.
+    """
+    import fitz
+    if not parts:
+        raise ValueError("No hay capítulos que unir.")
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.replace(parts[0], tmp_path)
+        for part in parts[1:]:
+            with fitz.open(tmp_path) as merged, fitz.open(part) as src:
+                merged.insert_pdf(src)
+                merged.saveIncr()
+            # El PDF del capítulo ya no hace falta: se libera el disco según se une
+            os.remove(part)
+        with fitz.open(tmp_path) as merged:
+            page_count = len(merged)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    return page_count
+
+
+def convert_epub_to_pdf(epub_path: str, output_path: str, workers: int | None = None) -> dict:
+    """Convierte un EPUB en disco a PDF en `output_path` y devuelve un informe de tiempos.
+
+    El informe incluye `chapters` (capítulo, páginas y segundos de cada uno),
+    `render_seconds`, `merge_seconds`, `total_seconds` y `pages`.
+    """
+    start = time.perf_counter()
+    with open_epub(epub_path) as book:
+        chapters = ([None] if book.cover_item() else []) + [item["path"] for item in book.spine_items()]
+    if not chapters:
+        raise ValueError("No se encontró contenido HTML en el EPUB.")
+
+    workers = max(1, workers or CONVERSION_WORKERS)
+    with tempfile.TemporaryDirectory(prefix="epub2pdf_") as temp_dir:
+        parts = [os.path.join(temp_dir, f"{i:05d}.pdf") for i in range(len(chapters))]
+        if workers == 1 or len(chapters) == 1:
+            results = [render_chapter(epub_path, chapter, part) for chapter, part in zip(chapters, parts)]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chapters))) as pool:
+                results = list(pool.map(render_chapter, [epub_path] * len(chapters), chapters, parts))
+        rendered = time.perf_counter()
+        pages = merge_pdfs(parts, output_path)
+
+    end = time.perf_counter()
+    return {
+        "chapters": results,
+        "pages": pages,
+        "render_seconds": round(rendered - start, 3),
+        "merge_seconds": round(end - rendered, 3),
+        "total_seconds": round(end - start, 3),
+    }
+
+
+def format_report(report: dict) -> str:
+    """Resumen legible del informe de conversión (capítulos más lentos primero)."""
+    slowest = sorted(report["chapters"], key=lambda c: c["seconds"], reverse=True)
+    lines = [
+        f"Conversión: {report['pages']} páginas en {report['total_seconds']:.1f}s "
+        f"(render {report['render_seconds']:.1f}s, unión {report['merge_seconds']:.1f}s)"
+    ]
+    lines += [f"  {c['chapter']}: {c['seconds']:.2f}s, {c['pages']} páginas" for c in slowest[:10]]
+    return "\n".join(lines)
@@ -0,0 +1,121 @@
+"""Caché de conversiones EPUB → PDF indexada por contenido.
+
+Cada PDF generado se guarda en `backend/conversion_cache/` con el nombre
+`{sha256 del EPUB}-v{versión del conversor}.pdf`. Una conversión repetida del
+mismo EPUB (aunque se suba con otro nombre) reutiliza ese PDF sin volver a
+renderizar, y las conversiones simultáneas del mismo archivo se agrupan en
+una sola.
+
+El tamaño total está limitado (`CONVERSION_CACHE_MAX_MB`). Cada acierto
+actualiza la fecha de modificación del PDF y, al superar el límite, se borran
+primero los usados hace más tiempo (LRU).
+"""
+import asyncio
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from . import conversion, utils
+
+CACHE_DIR = (Path(__file__).resolve().parent / "conversion_cache").resolve()
+MAX_CACHE_BYTES = int(float(os.getenv("CONVERSION_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+# Conversiones en curso por clave: las peticiones repetidas esperan a la misma tarea
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def cache_key(epub_hash: str) -> str:
+    return f"{epub_hash}-v{conversion.CONVERTER_VERSION}"
+
+
+def cached_path(epub_hash: str) -> Path:
+    return CACHE_DIR / f"{cache_key(epub_hash)}.pdf"
+
+
+def lookup(epub_hash: str) -> str | None:
+    """Devuelve el PDF en caché para ese EPUB (marcándolo como usado), o None."""
+    path = cached_path(epub_hash)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return str(path)
+
+
+def evict(max_bytes: int | None = None, keep: str | None = None) -> int:
+    """Borra los PDF menos usados hasta quedar por debajo del límite. Devuelve cuántos borró."""
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for path in CACHE_DIR.glob("*.pdf"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        if keep and str(path) == keep:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+async def _default_runner(epub_path: str, output_path: str) -> dict:
+    return await asyncio.to_thread(conversion.convert_epub_to_pdf, epub_path, output_path)
+
+
+async def _convert_into_cache(epub_path: str, epub_hash: str, runner) -> tuple[str, dict]:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    target = cached_path(epub_hash)
+    # Se convierte a un nombre temporal: una conversión a medias nunca parece un acierto
+    tmp_target = target.with_name(f"{target.stem}.{uuid.uuid4().hex}.pdf.tmp")
+    try:
+        report = await runner(epub_path, str(tmp_target))
+        os.replace(tmp_target, target)
+    finally:
+        if tmp_target.exists():
+            tmp_target.unlink()
+    evict(keep=str(target))
+    return str(target), report
+
+
+async def get_or_convert(epub_path: str, epub_hash: str | None = None, runner=None) -> tuple[str, dict | None]:
+    """Devuelve (ruta del PDF en caché, informe de conversión o None si fue un acierto).
+
+    `epub_hash` es el SHA-256 del EPUB; si no se indica, se calcula.
+    `runner(epub_path, output_path)` es la corrutina que convierte (por defecto,
+    en un hilo; la API usa `conversion_jobs.run_isolated`).
+    """
+    if epub_hash is None:
+        epub_hash = await asyncio.to_thread(utils.file_sha256, epub_path)
+    hit = lookup(epub_hash)
+    if hit:
+        return hit, None
+
+    key = cache_key(epub_hash)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_convert_into_cache(epub_path, epub_hash, runner or _default_runner))
+        _inflight[key] = task
+        task.add_done_callback(lambda _t: _inflight.pop(key, None))
+        return await asyncio.shield(task)
+    # Otra petición ya está convirtiendo este mismo EPUB
+    path, _report = await asyncio.shield(task)
+    return path, None
+
+
+def copy_to(cached_pdf: str, destination: str):
+    """Coloca una copia del PDF en caché en `destination` (enlace duro si es posible)."""
+    try:
+        os.link(cached_pdf, destination)
+    except OSError:
+        shutil.copyfile(cached_pdf, destination)
@@ -0,0 +1,211 @@
+"""Cola de trabajos de conversión EPUB → PDF fuera del proceso de la API.
+
+Cada conversión se ejecuta en un proceso propio (que a su vez reparte los
+capítulos, ver `conversion`), así que WeasyPrint nunca compite por la memoria
+ni por el GIL con las peticiones normales de la API. Límites:
+
+- `CONVERSION_MAX_JOBS` conversiones simultáneas; el resto espera en cola.
+- `CONVERSION_QUEUE_SIZE` trabajos como máximo en cola (después, 503).
+- `CONVERSION_JOB_TIMEOUT` segundos por trabajo.
+- `CONVERSION_JOB_MAX_RSS_MB` de memoria residente por trabajo, sumando sus
+  procesos hijos. Se mide con `psutil` si está instalado o con `/proc` en
+  Linux; si no hay forma de medirla, este límite no se aplica.
+
+Los trabajos y su estado se guardan en memoria; los terminados se olvidan
+pasado `JOB_RETENTION_SECONDS`.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+
+from . import conversion
+
+MAX_CONCURRENT_JOBS = int(os.getenv("CONVERSION_MAX_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("CONVERSION_QUEUE_SIZE", "20"))
+JOB_TIMEOUT_SECONDS = float(os.getenv("CONVERSION_JOB_TIMEOUT", "900"))
+JOB_MAX_RSS_BYTES = int(float(os.getenv("CONVERSION_JOB_MAX_RSS_MB", "2048")) * 1024 * 1024)
+JOB_RETENTION_SECONDS = 3600
+POLL_INTERVAL_SECONDS = 0.5
+
+_jobs: dict[str, dict] = {}
+_semaphore: asyncio.Semaphore | None = None
+
+
+class QueueFullError(Exception):
+    """No se admiten más trabajos de conversión hasta que avance la cola."""
+
+
+# --- Proceso de conversión ---
+def _job_main(epub_path: str, output_path: str, conn):
+    """Punto de entrada del proceso hijo: convierte y envía el informe por la tubería."""
+    try:
+        conn.send(("ok", conversion.convert_epub_to_pdf(epub_path, output_path)))
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def _children(pid: int) -> list[int]:
+    """PIDs descendientes de un proceso (psutil o /proc); lista vacía si no se puede saber."""
+    try:
+        import psutil
+        return [c.pid for c in psutil.Process(pid).children(recursive=True)]
+    except ImportError:
+        pass
+    except Exception:
+        return []
+    found, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                kids = [int(k) for k in f.read().split()]
+        except OSError:
+            continue
+        found.extend(kids)
+        pending.extend(kids)
+    return found
+
+
+def _rss(pid: int) -> int | None:
+    """Memoria residente de un proceso en bytes, o None si no se puede medir."""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return 0
+
+
+def tree_rss(pid: int) -> int | None:
+    """Memoria residente de un proceso más la de todos sus descendientes."""
+    own = _rss(pid)
+    if own is None:
+        return None
+    return own + sum(_rss(child) or 0 for child in _children(pid))
+
+
+def _kill_tree(proc):
+    for child in _children(proc.pid):
+        try:
+            os.kill(child, 9)
+        except OSError:
+            pass
+    proc.kill()
+    proc.join(5)
+
+
+def supervise(proc, conn, timeout: float, max_rss: int | None) -> dict:
+    """Espera el resultado del proceso de conversión aplicando el tiempo y la memoria máximos."""
+    started = time.monotonic()
+    try:
+        while True:
+            if conn.poll(POLL_INTERVAL_SECONDS):
+                status, payload = conn.recv()
+                proc.join(5)
+                if status != "ok":
+                    raise RuntimeError(payload)
+                return payload
+            if not proc.is_alive():
+                raise RuntimeError(f"El proceso de conversión terminó inesperadamente (código {proc.exitcode}).")
+            if time.monotonic() - started > timeout:
+                _kill_tree(proc)
+                raise TimeoutError(f"La conversión superó el tiempo máximo de {timeout:.0f}s.")
+            rss = tree_rss(proc.pid) if max_rss else None
+            if rss is not None and rss > max_rss:
+                _kill_tree(proc)
+                raise MemoryError(f"La conversión superó el límite de memoria ({rss // (1024 * 1024)} MB).")
+    finally:
+        conn.close()
+
+
+def _run_in_process(epub_path: str, output_path: str) -> dict:
+    # 'spawn': el proceso hijo no hereda el estado de la API (ni sus hilos)
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_job_main, args=(epub_path, output_path, child_conn), name="epub2pdf")
+    proc.start()
+    child_conn.close()
+    return supervise(proc, parent_conn, JOB_TIMEOUT_SECONDS, JOB_MAX_RSS_BYTES)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, MAX_CONCURRENT_JOBS))
+    return _semaphore
+
+
+async def run_isolated(epub_path: str, output_path: str, job: dict | None = None) -> dict:
+    """Convierte en un proceso aparte respetando el límite de conversiones simultáneas.
+
+    Si se indica `job`, pasa a `running` cuando sale de la cola.
+    """
+    async with _get_semaphore():
+        if job is not None:
+            job["status"] = "running"
+        return await asyncio.to_thread(_run_in_process, epub_path, output_path)
+
+
+# --- Trabajos ---
+def _prune():
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job.get("finished_at") and now - job["finished_at"] > JOB_RETENTION_SECONDS:
+            del _jobs[job_id]
+
+
+def active_jobs() -> int:
+    return sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+
+
+def submit(run, filename: str) -> dict:
+    """Registra un trabajo y lanza `run(job)` en segundo plano. `run` rellena el resultado."""
+    _prune()
+    if active_jobs() >= MAX_CONCURRENT_JOBS + MAX_QUEUED_JOBS:
+        raise QueueFullError("Hay demasiadas conversiones en cola. Inténtalo de nuevo en unos minutos.")
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "status": "queued",
+        "filename": filename,
+        "created_at": time.time(),
+        "finished_at": None,
+        "download_url": None,
+        "error": None,
+    }
+    _jobs[job["job_id"]] = job
+
+    async def runner():
+        try:
+            await run(job)
+            job["status"] = "completed"
+        except Exception as e:
+            print(f"Error en el trabajo de conversión {job['job_id']}: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = time.time()
+
+    job["_task"] = asyncio.ensure_future(runner())
+    return job
+
+
+def get_job(job_id: str) -> dict | None:
+    return _jobs.get(job_id)
+
+
+def public_view(job: dict) -> dict:
+    """Estado del trabajo sin los campos internos."""
+    return {k: v for k, v in job.items() if not k.startswith("_")}
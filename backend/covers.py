@@ -0,0 +1,156 @@
+"""Derivados de portadas: varios anchos en WebP y JPEG con nombres por hash de contenido.
+
+La portada guardada en la ingesta (`static/covers/...`) es la imagen maestra.
+A partir de ella se sirven variantes más pequeñas bajo
+`/covers/{book_id}/{hash}-{ancho}.{webp|jpg}`, donde `hash` es el SHA-256
+(abreviado) de la maestra. Como la URL cambia cuando cambia la portada, las
+variantes se sirven como `immutable` durante un año.
+
+Las variantes se generan bajo demanda la primera vez que se piden y se
+guardan en una caché en disco (`backend/cover_cache/`).
+
+También genera los marcadores de baja calidad (LQIP) que se guardan en BD
+para pintar la cuadrícula antes de que carguen las portadas reales.
+"""
+import base64
+import hashlib
+import io
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+
+from PIL import Image
+
+base_dir = Path(__file__).resolve().parent
+COVER_CACHE_DIR = (base_dir / "cover_cache").resolve()
+
+COVER_WIDTHS = (160, 240, 320, 400)
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Marcador de baja calidad (LQIP) que se incrusta en las respuestas de /books/
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 50
+
+_VARIANT_RE = re.compile(r"^(?P<hash>[0-9a-f]{16})-(?P<width>\d+)\.(?P<ext>webp|jpg)$")
+
+# Memo de la maestra por ruta: (mtime_ns, tamaño) -> (hash, ancho)
+_master_info: dict[str, tuple[int, int, str, int]] = {}
+_master_lock = threading.Lock()
+
+
+def _resolve(cover_image_url: str) -> str:
+    """Ruta absoluta de una portada guardada como relativa al directorio 'backend'."""
+    if os.path.isabs(cover_image_url):
+        return cover_image_url
+    return os.path.abspath(os.path.join(str(base_dir), cover_image_url))
+
+
+def master_info(master_path: str) -> tuple[str, int] | None:
+    """Devuelve (hash, ancho) de la portada maestra, o None si no existe o no es legible."""
+    try:
+        st = os.stat(master_path)
+    except OSError:
+        return None
+    with _master_lock:
+        cached = _master_info.get(master_path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2], cached[3]
+    try:
+        with open(master_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        with Image.open(master_path) as img:
+            width = img.width
+    except Exception as e:
+        print(f"Error leyendo la portada {master_path}: {e}")
+        return None
+    with _master_lock:
+        _master_info[master_path] = (st.st_mtime_ns, st.st_size, digest, width)
+    return digest, width
+
+
+def variant_widths(master_width: int) -> list[int]:
+    """Anchos disponibles para una maestra: nunca se amplía la imagen."""
+    widths = [w for w in COVER_WIDTHS if w < master_width]
+    widths.append(min(master_width, COVER_WIDTHS[-1]))
+    return widths
+
+
+def cover_variants(book_id: int, cover_image_url: str | None) -> list[dict]:
+    """Lista de variantes de la portada, lista para construir un `srcset`.
+
+    Cada elemento es `{"width": ..., "webp": url, "jpeg": url}` con URLs relativas a la API.
+    """
+    if not cover_image_url or book_id is None:
+        return []
+    info = master_info(_resolve(cover_image_url))
+    if info is None:
+        return []
+    digest, master_width = info
+    return [
+        {
+            "width": w,
+            "webp": f"covers/{book_id}/{digest}-{w}.webp",
+            "jpeg": f"covers/{book_id}/{digest}-{w}.jpg",
+        }
+        for w in variant_widths(master_width)
+    ]
+
+
+def parse_variant_name(name: str) -> tuple[str, int, str] | None:
+    """Descompone `{hash}-{ancho}.{ext}`; None si el nombre no es válido."""
+    match = _VARIANT_RE.match(name)
+    if not match:
+        return None
+    return match["hash"], int(match["width"]), match["ext"]
+
+
+def get_or_create_variant(cover_image_url: str, digest: str, width: int, ext: str) -> tuple[str, str] | None:
+    """Devuelve (ruta, media_type) de la variante pedida, generándola si hace falta.
+
+    Devuelve None si el hash no corresponde a la portada actual o el ancho no es válido.
+    """
+    master_path = _resolve(cover_image_url)
+    info = master_info(master_path)
+    if info is None or info[0] != digest or width not in variant_widths(info[1]):
+        return None
+    pil_format, media_type = FORMATS[ext]
+    target = COVER_CACHE_DIR / f"{digest}-{width}.{ext}"
+    if not target.exists():
+        os.makedirs(COVER_CACHE_DIR, exist_ok=True)
+        with Image.open(master_path) as img:
+            img = img.convert("RGB")
+            if img.width > width:
+                height = max(1, round(img.height * width / img.width))
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+            # Escritura atómica: peticiones simultáneas no ven archivos a medias
+            tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+            if pil_format == "WEBP":
+                img.save(tmp, pil_format, quality=78, method=4)
+            else:
+                img.save(tmp, pil_format, quality=80, optimize=True, progressive=True)
+            os.replace(tmp, target)
+    return str(target), media_type
+
+
+def make_placeholder(image_path: str) -> str | None:
+    """Genera un marcador diminuto (JPEG de 16px en base64, como data URI) de una portada."""
+    try:
+        with Image.open(image_path) as img:
+            img = img.convert("RGB")
+            height = max(1, round(img.height * PLACEHOLDER_WIDTH / img.width))
+            img = img.resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BILINEAR)
+            buffer = io.BytesIO()
+            img.save(buffer, "JPEG", quality=PLACEHOLDER_QUALITY, optimize=True)
+    except Exception as e:
+        print(f"Error generando el marcador de {image_path}: {e}")
+        return None
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def placeholder_for(cover_image_url: str | None) -> str | None:
+    """Marcador de una portada guardada (ruta relativa al directorio 'backend' o absoluta)."""
+    if not cover_image_url:
+        return None
+    return make_placeholder(_resolve(cover_image_url))
@@ -1,7 +1,9 @@
 # Test comment to trigger workflow
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
-from . import models
+from sqlalchemy import asc, delete, desc, func, literal_column, or_, text, tuple_
+from . import models, fulltext, library_version
+import base64
+import json
 import os
 from pathlib import Path
 
@@ -17,6 +19,19 @@ def get_book(db: Session, book_id: int):
     """Obtiene un libro por su ID."""
     return db.query(models.Book).filter(models.Book.id == book_id).first()
 
+def get_books_by_ids(db: Session, book_ids: list[int]) -> list[models.Book]:
+    """Obtiene varios libros por ID con una consulta `IN` (por bloques), en el orden pedido.
+
+    Los IDs repetidos se devuelven una sola vez y los que no existen se omiten.
+    """
+    ids = list(dict.fromkeys(book_ids))
+    found = {}
+    # SQLite limita el número de parámetros por consulta; consultamos por bloques
+    for i in range(0, len(ids), 500):
+        for book in db.query(models.Book).filter(models.Book.id.in_(ids[i:i + 500])).all():
+            found[book.id] = book
+    return [found[book_id] for book_id in ids if book_id in found]
+
 def get_book_by_path(db: Session, file_path: str):
     """Obtiene un libro por su ruta de archivo."""
     return db.query(models.Book).filter(models.Book.file_path == file_path).first()
@@ -25,15 +40,50 @@ def get_book_by_title(db: Session, title: str):
     """Obtiene un libro por su título exacto."""
     return db.query(models.Book).filter(models.Book.title == title).first()
 
+def _match_books(query, match: str):
+    """Filtra una consulta de libros con el índice FTS5 y la ordena por relevancia (bm25)."""
+    return (
+        query.join(fulltext.books_fts, fulltext.books_fts.c.rowid == models.Book.id)
+        .filter(fulltext.MATCH_CLAUSE)
+        .params(fts_match=match)
+        .order_by(fulltext.books_fts.c.rank, desc(models.Book.id))
+    )
+
 def get_books_by_partial_title(db: Session, title: str, skip: int = 0, limit: int = 100):
-    """Busca libros por un título parcial (case-insensitive)."""
+    """Busca libros por un título parcial (sin distinguir mayúsculas ni acentos), los más relevantes primero."""
+    match = fulltext.books_match(title=title)
+    if match and fulltext.is_available(db):
+        return _match_books(db.query(models.Book), match).offset(skip).limit(limit).all()
     return db.query(models.Book).filter(models.Book.title.ilike(f"%{title}%")).offset(skip).limit(limit).all()
 
-def get_books(db: Session, category: str | None = None, search: str | None = None, author: str | None = None, skip: int = 0, limit: int = 20):
-    """Obtiene una lista paginada de libros, con opciones de filtrado."""
+# Órdenes del listado: columnas de la clave (la última siempre es el ID, que la hace única)
+BOOK_SORTS = {
+    "recent": (desc, [models.Book.id]),
+    "title": (asc, [models.Book.title, models.Book.id]),
+    "author": (asc, [models.Book.author, models.Book.id]),
+}
+
+def _sort_key(column):
+    """Expresión por la que se ordena `column`: título y autor pueden ser NULL y cuentan como ''.
+
+    Sin esto la clave (NULL, id) no es comparable y la paginación por clave se
+    saltaría esos libros. Coincide con los índices `ix_books_*_sort` (literal, no parámetro).
+    """
+    return column if column.primary_key else func.coalesce(column, literal_column("''"))
+
+def _filtered_books(db: Session, category: str | None, search: str | None, author: str | None):
+    """Consulta de libros con los filtros del listado. Devuelve (consulta, si usa el índice FTS5)."""
     query = db.query(models.Book)
     if category:
         query = query.filter(models.Book.category == category)
+    match = fulltext.books_match(search=search, author=author) if (search or author) else None
+    if match and fulltext.is_available(db):
+        query = (
+            query.join(fulltext.books_fts, fulltext.books_fts.c.rowid == models.Book.id)
+            .filter(fulltext.MATCH_CLAUSE)
+            .params(fts_match=match)
+        )
+        return query, True
     if author:
         query = query.filter(models.Book.author.ilike(f"%{author}%"))
     if search:
@@ -45,26 +95,222 @@ def get_books(db: Session, category: str | None = None, search: str | None = Non
                 models.Book.category.ilike(search_term)
             )
         )
-    return query.order_by(desc(models.Book.id)).offset(skip).limit(limit).all()
+    return query, False
+
+def _order_books(query, sort: str):
+    direction, columns = BOOK_SORTS[sort]
+    return query.order_by(*[direction(_sort_key(c)) for c in columns])
+
+def _sort_value(book, column):
+    value = getattr(book, column.key)
+    return value if column.primary_key or value is not None else ""
+
+def _encode_cursor(sort: str, state) -> str:
+    raw = json.dumps({"s": sort, "k": state}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str, sort: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        state = data["k"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor de paginación no válido.")
+    if data.get("s") != sort:
+        raise ValueError("El cursor corresponde a otro orden del listado.")
+    return state
+
+def get_books(db: Session, category: str | None = None, search: str | None = None, author: str | None = None, skip: int = 0, limit: int = 20, sort: str | None = None):
+    """Obtiene una lista paginada (por desplazamiento) de libros, con opciones de filtrado.
+
+    Sin `sort`, las búsquedas se ordenan por relevancia y el resto por los más recientes.
+    Para recorrer bibliotecas grandes es preferible `get_books_page`.
+    """
+    if sort is not None and sort not in BOOK_SORTS:
+        raise ValueError(f"Orden no válido: {sort}")
+    query, ranked = _filtered_books(db, category, search, author)
+    if ranked and sort is None:
+        query = query.order_by(fulltext.books_fts.c.rank, desc(models.Book.id))
+    else:
+        query = _order_books(query, sort or "recent")
+    return query.offset(skip).limit(limit).all()
+
+def get_books_page(db: Session, category: str | None = None, search: str | None = None, author: str | None = None, sort: str | None = None, cursor: str | None = None, limit: int = 20):
+    """Obtiene una página de libros por cursor. Devuelve (libros, cursor de la siguiente página o None).
+
+    Con los órdenes de `BOOK_SORTS` la página siguiente empieza justo después de
+    la clave del último libro (paginación por clave), así que cualquier página
+    cuesta lo mismo que la primera gracias a los índices. El orden
+    por relevancia de las búsquedas (`sort=None` con texto) guarda en el cursor
+    el desplazamiento, porque bm25 no sirve como clave.
+    """
+    if sort is not None and sort not in BOOK_SORTS:
+        raise ValueError(f"Orden no válido: {sort}")
+    query, ranked = _filtered_books(db, category, search, author)
+    sort = sort or ("relevance" if ranked else "recent")
+    state = _decode_cursor(cursor, sort) if cursor else None
+
+    if sort == "relevance":
+        offset = int(state or 0)
+        rows = query.order_by(fulltext.books_fts.c.rank, desc(models.Book.id)).offset(offset).limit(limit + 1).all()
+        next_state = offset + limit
+    else:
+        direction, columns = BOOK_SORTS[sort]
+        if state is not None:
+            if len(state) != len(columns):
+                raise ValueError("Cursor de paginación no válido.")
+            keys = [_sort_key(c) for c in columns]
+            key = tuple_(*keys)
+            # La cota sobre la primera columna permite a SQLite buscar en el índice en lugar de recorrerlo
+            if direction is desc:
+                query = query.filter(keys[0] <= state[0], key < tuple_(*state))
+            else:
+                query = query.filter(keys[0] >= state[0], key > tuple_(*state))
+        rows = _order_books(query, sort).limit(limit + 1).all()
+        last = rows[limit - 1] if len(rows) > limit else None
+        next_state = [_sort_value(last, c) for c in columns] if last is not None else None
+
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], _encode_cursor(sort, next_state)
+
+def has_book_passages(db: Session, book_id: int) -> bool:
+    """Indica si el contenido del libro ya está indexado para la búsqueda."""
+    return db.query(models.BookPassage.id).filter(models.BookPassage.book_id == book_id).first() is not None
+
+def replace_book_passages(db: Session, book_id: int, passages) -> int:
+    """Sustituye los fragmentos indexados de un libro. Devuelve cuántos se guardaron.
+
+    `passages` es un iterable de dicts con `page`, `char_offset` y `text`; se
+    insertan por bloques sin cargar el libro entero en memoria.
+    """
+    db.query(models.BookPassage).filter(models.BookPassage.book_id == book_id).delete(synchronize_session=False)
+    count, block = 0, []
+    for passage in passages:
+        block.append({**passage, "book_id": book_id})
+        if len(block) >= 500:
+            db.execute(models.BookPassage.__table__.insert(), block)
+            count += len(block)
+            block = []
+    if block:
+        db.execute(models.BookPassage.__table__.insert(), block)
+        count += len(block)
+    db.commit()
+    return count
+
+def search_book_passages(db: Session, query: str, book_id: int | None = None, skip: int = 0, limit: int = 20) -> list[dict]:
+    """Busca en el contenido indexado y devuelve las coincidencias más relevantes con su fragmento resaltado."""
+    match = fulltext.content_match(query)
+    if not match:
+        return []
+    sql = f"""
+        SELECT p.book_id, b.title, b.author, b.file_path, p.page, p.char_offset,
+               snippet(book_passages_fts, 0, :mark_open, :mark_close, '…', {fulltext.SNIPPET_TOKENS}) AS snippet,
+               bm25(book_passages_fts) AS score
+        FROM book_passages_fts
+        JOIN book_passages p ON p.id = book_passages_fts.rowid
+        JOIN books b ON b.id = p.book_id
+        WHERE book_passages_fts MATCH :match {"AND p.book_id = :book_id" if book_id is not None else ""}
+        ORDER BY rank
+        LIMIT :limit OFFSET :skip
+    """
+    rows = db.execute(text(sql), {"match": match, "book_id": book_id, "limit": limit, "skip": skip,
+                               "mark_open": fulltext.SNIPPET_OPEN, "mark_close": fulltext.SNIPPET_CLOSE}).mappings().all()
+    return [
+        {
+            "book_id": r["book_id"],
+            "title": r["title"],
+            "author": r["author"],
+            # En los EPUB la posición es el capítulo del spine
+            "unit": "chapter" if (r["file_path"] or "").lower().endswith(".epub") else "page",
+            "page": r["page"],
+            "char_offset": r["char_offset"],
+            # Texto del libro escapado: solo las marcas de coincidencia son HTML
+            "snippet": fulltext.highlight_snippet(r["snippet"]),
+            "score": round(-r["score"], 4),
+        }
+        for r in rows
+    ]
 
 def get_categories(db: Session) -> list[str]:
-    """Obtiene una lista de todas las categorías de libros únicas."""
-    return [c[0] for c in db.query(models.Book.category).distinct().order_by(models.Book.category).all()]
+    """Obtiene una lista de todas las categorías con libros."""
+    return [c[0] for c in db.query(models.Category.name).order_by(models.Category.name).all()]
+
+def get_categories_with_counts(db: Session) -> list[dict]:
+    """Categorías con libros y cuántos tiene cada una (sin recorrer la tabla `books`)."""
+    rows = db.query(models.Category.name, models.Category.book_count).order_by(models.Category.name).all()
+    return [{"name": name, "book_count": count} for name, count in rows]
+
+def get_book_by_content_hash(db: Session, content_hash: str):
+    """Obtiene un libro por el SHA-256 de su archivo."""
+    return db.query(models.Book).filter(models.Book.content_hash == content_hash).first()
 
-def create_book(db: Session, title: str, author: str, category: str, cover_image_url: str, file_path: str):
+def get_existing_content_hashes(db: Session, hashes: list[str]) -> set[str]:
+    """Devuelve cuáles de los hashes indicados ya pertenecen a algún libro."""
+    found = set()
+    # SQLite limita el número de parámetros por consulta; consultamos por bloques
+    for i in range(0, len(hashes), 500):
+        block = hashes[i:i + 500]
+        rows = db.query(models.Book.content_hash).filter(models.Book.content_hash.in_(block)).all()
+        found.update(r[0] for r in rows)
+    return found
+
+def get_books_without_content_hash(db: Session) -> list[tuple[int, str]]:
+    """Devuelve (id, file_path) de los libros que aún no tienen hash de contenido."""
+    return [(r[0], r[1]) for r in db.query(models.Book.id, models.Book.file_path).filter(models.Book.content_hash.is_(None)).all()]
+
+def set_content_hashes(db: Session, hashes: dict[int, str]):
+    """Guarda los hashes de contenido indicados por ID de libro en una sola transacción."""
+    if not hashes:
+        return
+    db.bulk_update_mappings(models.Book, [{"id": book_id, "content_hash": h} for book_id, h in hashes.items()])
+    db.commit()
+
+def get_cached_metadata(db: Session, keys: list[str]) -> dict[str, dict]:
+    """Devuelve los análisis de metadatos guardados para las claves indicadas."""
+    found = {}
+    for i in range(0, len(keys), 500):
+        block = keys[i:i + 500]
+        rows = db.query(models.MetadataCache.key, models.MetadataCache.result).filter(models.MetadataCache.key.in_(block)).all()
+        found.update((k, json.loads(r)) for k, r in rows)
+    return found
+
+def save_cached_metadata(db: Session, model_name: str, results: dict[str, dict]):
+    """Guarda (o reemplaza) análisis de metadatos por clave en una sola transacción."""
+    if not results:
+        return
+    for key, metadata in results.items():
+        db.merge(models.MetadataCache(key=key, model=model_name, result=json.dumps(metadata, ensure_ascii=False)))
+    db.commit()
+
+def create_book(db: Session, title: str, author: str, category: str, cover_image_url: str, file_path: str, content_hash: str | None = None, cover_placeholder: str | None = None):
     """Crea un nuevo libro en la base de datos."""
     db_book = models.Book(
         title=title,
         author=author,
         category=category,
         cover_image_url=cover_image_url,
-        file_path=file_path
+        file_path=file_path,
+        content_hash=content_hash,
+        cover_placeholder=cover_placeholder
     )
     db.add(db_book)
     db.commit()
     db.refresh(db_book)
     return db_book
 
+def create_books_bulk(db: Session, books: list[dict]) -> list[int]:
+    """Crea varios libros en una única transacción y devuelve sus IDs.
+
+    Cada elemento de `books` contiene las mismas claves que los argumentos de `create_book`.
+    """
+    db_books = [models.Book(**data) for data in books]
+    db.add_all(db_books)
+    db.flush()
+    ids = [b.id for b in db_books]
+    db.commit()
+    return ids
+
 def delete_book(db: Session, book_id: int):
     """Elimina un libro de la base de datos por su ID, incluyendo sus archivos asociados."""
     book = db.query(models.Book).filter(models.Book.id == book_id).first()
@@ -83,32 +329,50 @@ def delete_book(db: Session, book_id: int):
         db.commit()
     return book
 
-def delete_books_by_category(db: Session, category: str):
-    """Elimina todos los libros de una categoría específica, incluyendo sus archivos asociados."""
-    books_to_delete = db.query(models.Book).filter(models.Book.category == category).all()
-    if not books_to_delete:
-        return 0
-    
-    for book in books_to_delete:
-        # Eliminar archivos asociados
-        abs_file_path = get_abs_path(book.file_path)
-        if abs_file_path and os.path.exists(abs_file_path):
-            os.remove(abs_file_path)
-            
-        abs_cover_path = get_abs_path(book.cover_image_url)
-        if abs_cover_path and os.path.exists(abs_cover_path):
-            os.remove(abs_cover_path)
-        db.delete(book)
-        
-    count = len(books_to_delete)
+def delete_books_bulk(db: Session, book_ids: list[int] | None = None, category: str | None = None) -> list[dict]:
+    """Borra con DELETE … RETURNING los libros con esos IDs o de esa categoría.
+
+    No carga objetos del ORM ni toca archivos: la misma sentencia devuelve id,
+    file_path, cover_image_url y category de los libros borrados para que el
+    llamador limpie archivos y vectores (ver `bulk_delete`).
+    """
+    table = models.Book.__table__
+    if book_ids is not None:
+        ids = list(dict.fromkeys(book_ids))
+        # SQLite limita el número de parámetros por consulta; por bloques, en la misma transacción
+        blocks = [table.c.id.in_(ids[i:i + 500]) for i in range(0, len(ids), 500)]
+    elif category is not None:
+        blocks = [table.c.category == category]
+    else:
+        raise ValueError("Indica los IDs o la categoría de los libros a borrar.")
+    rows = []
+    for condition in blocks:
+        deleted = db.execute(delete(table).where(condition).returning(table.c.id, table.c.file_path, table.c.cover_image_url, table.c.category))
+        rows.extend(dict(row) for row in deleted.mappings())
+    db.commit()
+    return rows
+
+def get_library_version(db: Session) -> int:
+    """Versión actual de la biblioteca (sube con cada escritura, ver `library_version`)."""
+    return db.query(models.LibraryVersion.version).filter(models.LibraryVersion.id == 1).scalar() or 0
+
+def get_rag_version(db: Session) -> int:
+    """Versión del índice RAG (sube al añadir o borrar vectores, ver `library_version.bump_rag`)."""
+    return db.query(models.LibraryVersion.version).filter(models.LibraryVersion.id == library_version.RAG_VERSION_ID).scalar() or 0
+
+def bump_rag_version(db: Session):
+    """Sube la versión del índice RAG, creando su fila si aún no existe."""
+    db.execute(
+        text("INSERT INTO library_version(id, version) VALUES (:id, 1) ON CONFLICT(id) DO UPDATE SET version = version + 1"),
+        {"id": library_version.RAG_VERSION_ID},
+    )
     db.commit()
-    return count
 
 def get_books_count(db: Session) -> int:
     """Obtiene el número total de libros en la base de datos."""
     return db.query(models.Book).count()
 
-def update_book(db: Session, book_id: int, title: str, author: str, cover_image_url: str | None):
+def update_book(db: Session, book_id: int, title: str, author: str, cover_image_url: str | None, cover_placeholder: str | None = None):
     """Actualiza los datos de un libro por su ID."""
     book = db.query(models.Book).filter(models.Book.id == book_id).first()
     if book:
@@ -117,6 +381,8 @@ def update_book(db: Session, book_id: int, title: str, author: str, cover_image_
         if cover_image_url:
             # Si hay una nueva imagen, se actualiza la ruta
             book.cover_image_url = cover_image_url
+        if cover_placeholder:
+            book.cover_placeholder = cover_placeholder
         db.commit()
         db.refresh(book)
     return book
\ No newline at end of file
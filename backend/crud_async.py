@@ -0,0 +1,93 @@
+"""Versiones asíncronas (AsyncSession + aiosqlite) de las operaciones CRUD que usan los endpoints `async`.
+
+Mismo comportamiento que sus equivalentes de `crud`; así una consulta a la
+base de datos no bloquea el bucle de eventos mientras se atienden subidas,
+conversiones o consultas RAG.
+"""
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import library_version, models
+
+
+async def get_book(db: AsyncSession, book_id: int):
+    """Obtiene un libro por su ID."""
+    return await db.get(models.Book, book_id)
+
+async def get_book_by_path(db: AsyncSession, file_path: str):
+    """Obtiene un libro por su ruta de archivo."""
+    return (await db.scalars(select(models.Book).where(models.Book.file_path == file_path).limit(1))).first()
+
+async def get_book_by_content_hash(db: AsyncSession, content_hash: str):
+    """Obtiene un libro por el SHA-256 de su archivo."""
+    return (await db.scalars(select(models.Book).where(models.Book.content_hash == content_hash).limit(1))).first()
+
+async def get_books_by_ids(db: AsyncSession, book_ids: list[int]) -> list[models.Book]:
+    """Obtiene varios libros por ID con una consulta `IN` (por bloques), en el orden pedido."""
+    ids = list(dict.fromkeys(book_ids))
+    found = {}
+    # SQLite limita el número de parámetros por consulta; consultamos por bloques
+    for i in range(0, len(ids), 500):
+        for book in await db.scalars(select(models.Book).where(models.Book.id.in_(ids[i:i + 500]))):
+            found[book.id] = book
+    return [found[book_id] for book_id in ids if book_id in found]
+
+async def get_books_by_category(db: AsyncSession, category: str) -> list[models.Book]:
+    """Libros de una categoría."""
+    return list(await db.scalars(select(models.Book).where(models.Book.category == category)))
+
+async def get_books_by_author(db: AsyncSession, author_id: int | None, author: str, exclude_book_id: int | None = None, limit: int = 50) -> list[models.Book]:
+    """Libros de un autor: por su ID en `authors` si se conoce y, si no, por el nombre."""
+    condition = models.Book.author_id == author_id if author_id is not None else models.Book.author == author
+    query = select(models.Book).where(condition)
+    if exclude_book_id is not None:
+        query = query.where(models.Book.id != exclude_book_id)
+    return list(await db.scalars(query.limit(limit)))
+
+async def get_all_books(db: AsyncSession) -> list[models.Book]:
+    """Todos los libros de la biblioteca."""
+    return list(await db.scalars(select(models.Book)))
+
+async def get_library_version(db: AsyncSession) -> int:
+    """Versión actual de la biblioteca (sube con cada escritura, ver `library_version`)."""
+    return await db.scalar(select(models.LibraryVersion.version).where(models.LibraryVersion.id == 1)) or 0
+
+async def get_rag_version(db: AsyncSession) -> int:
+    """Versión del índice RAG (sube al añadir o borrar vectores, ver `library_version.bump_rag`)."""
+    return await db.scalar(select(models.LibraryVersion.version).where(models.LibraryVersion.id == library_version.RAG_VERSION_ID)) or 0
+
+async def get_books_count(db: AsyncSession) -> int:
+    """Obtiene el número total de libros en la base de datos."""
+    return await db.scalar(select(func.count()).select_from(models.Book))
+
+async def create_book(db: AsyncSession, title: str, author: str, category: str, cover_image_url: str, file_path: str, content_hash: str | None = None, cover_placeholder: str | None = None):
+    """Crea un nuevo libro en la base de datos."""
+    db_book = models.Book(
+        title=title,
+        author=author,
+        category=category,
+        cover_image_url=cover_image_url,
+        file_path=file_path,
+        content_hash=content_hash,
+        cover_placeholder=cover_placeholder
+    )
+    db.add(db_book)
+    await db.commit()
+    # Relee la fila: los triggers del catálogo rellenan category_id y author_id
+    await db.refresh(db_book)
+    return db_book
+
+async def update_book(db: AsyncSession, book_id: int, title: str, author: str, cover_image_url: str | None, cover_placeholder: str | None = None):
+    """Actualiza los datos de un libro por su ID."""
+    book = await db.get(models.Book, book_id)
+    if book:
+        book.title = title
+        book.author = author
+        if cover_image_url:
+            # Si hay una nueva imagen, se actualiza la ruta
+            book.cover_image_url = cover_image_url
+        if cover_placeholder:
+            book.cover_placeholder = cover_placeholder
+        await db.commit()
+        await db.refresh(book)
+    return book
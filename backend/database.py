@@ -1,16 +1,107 @@
-from sqlalchemy import create_engine
+"""Conexión a SQLite con los PRAGMA ajustados para uso concurrente.
+
+Cada conexión nueva se configura con (todo ajustable por entorno):
+
+- `journal_mode=WAL` (`SQLITE_JOURNAL_MODE`): las lecturas no esperan a las
+  escrituras ni al revés;
+- `synchronous=NORMAL` (`SQLITE_SYNCHRONOUS`), suficiente con WAL;
+- `mmap_size` (`SQLITE_MMAP_MB`) y `cache_size` (`SQLITE_CACHE_MB`);
+- `busy_timeout` (`SQLITE_BUSY_TIMEOUT_MS`): una escritura espera a la otra
+  en vez de fallar con "database is locked".
+
+Hay dos engines: `engine`/`SessionLocal` para escribir y
+`read_engine`/`ReadSessionLocal`, con su propio pool
+(`SQLITE_READ_POOL_SIZE`) y conexiones `query_only`, para los listados y
+búsquedas. `optimize()` ejecuta `PRAGMA optimize` (y `ANALYZE` la primera
+vez) y la API la lanza cada `SQLITE_OPTIMIZE_MINUTES`.
+
+Los endpoints `async` usan `async_engine`/`AsyncSessionLocal` y
+`async_read_engine`/`AsyncReadSessionLocal` (aiosqlite, mismos PRAGMA y
+mismo reparto lectura/escritura): la consulta se ejecuta en el hilo de
+aiosqlite y el bucle de eventos sigue atendiendo otras peticiones.
+"""
+import os
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from pathlib import Path
 
 # Usamos una base de datos SQLite ubicada en la raíz del proyecto, resolviendo ruta absoluta
 _base_dir = Path(__file__).resolve().parent
 _db_path = (_base_dir.parent / "library.db").resolve()
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{_db_path.as_posix()}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{_db_path.as_posix()}"
+
+JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+MMAP_BYTES = int(float(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024)
+CACHE_KIB = int(float(os.getenv("SQLITE_CACHE_MB", "64")) * 1024)
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+OPTIMIZE_INTERVAL_SECONDS = float(os.getenv("SQLITE_OPTIMIZE_MINUTES", "60")) * 60
+
+
+def configure_connection(dbapi_connection, readonly: bool = False):
+    """Aplica los PRAGMA de rendimiento a una conexión sqlite3 recién abierta."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        # Negativo: tamaño en KiB en lugar de en páginas
+        cursor.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        if readonly:
+            cursor.execute("PRAGMA query_only = ON")
+    finally:
+        cursor.close()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def create_sqlite_engine(url: str = SQLALCHEMY_DATABASE_URL, readonly: bool = False, tuned: bool = True, **kwargs):
+    """Engine SQLite con los PRAGMA de `configure_connection` (si `tuned`)."""
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": BUSY_TIMEOUT_MS / 1000},
+        **kwargs,
+    )
+    if tuned:
+        event.listen(engine, "connect", lambda conn, _record: configure_connection(conn, readonly=readonly))
+    return engine
+
+
+def create_async_sqlite_engine(url: str = ASYNC_DATABASE_URL, readonly: bool = False, **kwargs):
+    """Engine aiosqlite con los mismos PRAGMA que `create_sqlite_engine`."""
+    engine = create_async_engine(url, connect_args={"timeout": BUSY_TIMEOUT_MS / 1000}, **kwargs)
+    # Los eventos de conexión se registran en el engine síncrono que envuelve al asíncrono
+    event.listen(engine.sync_engine, "connect", lambda conn, _record: configure_connection(conn, readonly=readonly))
+    return engine
+
+
+def optimize(target=None):
+    """`PRAGMA optimize` sobre la base de datos; `ANALYZE` completo si nunca se analizó."""
+    target = target or engine
+    with target.begin() as conn:
+        analyzed = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first()
+        if not analyzed:
+            conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("PRAGMA analysis_limit = 1000")
+        conn.exec_driver_sql("PRAGMA optimize")
+
+
+engine = create_sqlite_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+read_engine = create_sqlite_engine(readonly=True, pool_size=READ_POOL_SIZE, max_overflow=READ_POOL_SIZE)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# expire_on_commit=False: tras el commit los objetos se siguen leyendo sin volver a la base de datos
+async_engine = create_async_sqlite_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async_read_engine = create_async_sqlite_engine(readonly=True, pool_size=READ_POOL_SIZE, max_overflow=READ_POOL_SIZE)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
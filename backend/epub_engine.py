@@ -0,0 +1,310 @@
+"""Lectura de EPUB en una sola pasada sobre el zip.
+
+Un EPUB es un zip con un manifiesto OPF que declara sus recursos y el orden
+de lectura (spine). `EpubBook` abre el zip una vez, analiza el contenedor y el
+OPF con lxml y después sirve los documentos del spine bajo demanda:
+
+- `iter_text()` / `text()`: texto plano, extraído en streaming con
+  `lxml.etree.iterparse` (ingesta e indexación RAG);
+- `iter_documents()` / `read()`: bytes sin procesar (conversión a PDF);
+- `cover_item()`, `stylesheets()` y `metadata`: portada, CSS y metadatos Dublin Core;
+- `toc()` y `rewrite_document()`: índice (nav de EPUB 3 o NCX de EPUB 2) y
+  documentos con sus enlaces reescritos (lectura por capítulos en la API).
+
+Es el único lector de EPUB que usan la subida, el RAG y la conversión.
+"""
+import io
+import posixpath
+import re
+import zipfile
+from urllib.parse import unquote
+
+from lxml import etree
+
+CONTAINER_PATH = "META-INF/container.xml"
+DOCUMENT_TYPES = ("application/xhtml+xml", "text/html", "application/x-dtbook+xml")
+# Elementos cuyo contenido no es texto del libro
+_SKIP_TAGS = {"script", "style", "head", "title"}
+# Elementos de bloque: se separan con un espacio para no pegar palabras
+_BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "td", "th",
+    "blockquote", "section", "article", "pre", "dd", "dt", "figcaption", "hr", "body",
+}
+_XML_PARSER = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+NCX_TYPE = "application/x-dtbncx+xml"
+# Atributos que apuntan a otros recursos del libro
+_LINK_ATTRS = ("href", "src", "poster", "{http://www.w3.org/1999/xlink}href")
+# Enlaces externos o embebidos: esquema (http:, mailto:, data:...) o "//host"
+_EXTERNAL_RE = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|//)", re.IGNORECASE)
+# Contenido activo que se elimina al servir un capítulo (el EPUB lo sube cualquiera)
+_ACTIVE_TAGS = {"script", "object", "embed", "iframe", "frame", "frameset", "base"}
+_SCRIPT_URL_RE = re.compile(r"^\s*(?:javascript|vbscript):", re.IGNORECASE)
+
+
+def _local(tag) -> str:
+    """Nombre del elemento sin espacio de nombres ('' para comentarios e instrucciones)."""
+    return etree.QName(tag).localname.lower() if isinstance(tag, str) else ""
+
+
+class EpubBook:
+    """EPUB abierto a partir de una ruta o de sus bytes. Se usa como gestor de contexto."""
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self._zip = zipfile.ZipFile(source)
+        try:
+            self._names = set(self._zip.namelist())
+            container = etree.fromstring(self._zip.read(CONTAINER_PATH), _XML_PARSER)
+            rootfile = next((el for el in container.iter() if _local(el.tag) == "rootfile"), None)
+            if rootfile is None or not rootfile.get("full-path"):
+                raise ValueError("El EPUB no declara ningún archivo OPF.")
+            self.opf_path = posixpath.normpath(rootfile.get("full-path"))
+            self.opf_dir = posixpath.dirname(self.opf_path)
+            self._parse_opf(etree.fromstring(self._zip.read(self.opf_path), _XML_PARSER))
+        except Exception:
+            self._zip.close()
+            raise
+
+    # --- OPF ---
+    def _parse_opf(self, opf):
+        self.metadata = {"title": [], "creator": [], "subject": [], "language": []}
+        self.manifest: dict[str, dict] = {}
+        self.spine: list[str] = []
+        self._cover_id = None
+        self._ncx_id = None
+        for el in opf.iter():
+            tag = _local(el.tag)
+            if tag in self.metadata and el.text and el.text.strip():
+                role = next((v for k, v in el.attrib.items() if _local(k) == "role"), None)
+                self.metadata[tag].append({"value": " ".join(el.text.split()), "role": role})
+            elif tag == "meta" and el.get("name") == "cover":
+                self._cover_id = el.get("content")
+            elif tag == "item" and el.get("id") and el.get("href"):
+                self.manifest[el.get("id")] = {
+                    "id": el.get("id"),
+                    "href": el.get("href"),
+                    "path": self.resolve(el.get("href")),
+                    "media_type": el.get("media-type", ""),
+                    "properties": el.get("properties", ""),
+                }
+            elif tag == "spine":
+                self._ncx_id = el.get("toc")
+            elif tag == "itemref" and el.get("idref") and el.get("linear", "yes") != "no":
+                self.spine.append(el.get("idref"))
+
+    def resolve(self, href: str, base: str | None = None) -> str:
+        """Ruta dentro del zip de un `href` relativo al OPF (o al documento `base`)."""
+        href = unquote(href.split("#", 1)[0])
+        folder = posixpath.dirname(base) if base is not None else self.opf_dir
+        return posixpath.normpath(posixpath.join(folder, href)).lstrip("/")
+
+    # --- Recursos ---
+    def has(self, path: str) -> bool:
+        return path in self._names
+
+    def read(self, path: str) -> bytes:
+        """Bytes de un recurso del zip (ruta ya resuelta, ver `resolve`)."""
+        return self._zip.read(path)
+
+    def spine_items(self) -> list[dict]:
+        """Documentos del spine, en orden de lectura, que existen en el zip."""
+        items = []
+        for idref in self.spine:
+            item = self.manifest.get(idref)
+            if item and item["media_type"] in DOCUMENT_TYPES and item["path"] in self._names:
+                items.append(item)
+        return items
+
+    def stylesheets(self) -> list[dict]:
+        return [i for i in self.manifest.values() if i["media_type"] == "text/css" and i["path"] in self._names]
+
+    def cover_item(self) -> dict | None:
+        """Imagen de portada: la declarada en el OPF (EPUB 2 o 3) o una imagen llamada 'cover'."""
+        candidates = [self.manifest.get(self._cover_id)] if self._cover_id else []
+        candidates += [i for i in self.manifest.values() if "cover-image" in i["properties"].split()]
+        candidates += [i for i in self.manifest.values() if i["media_type"].startswith("image/") and "cover" in i["href"].lower()]
+        for item in candidates:
+            if item and item["media_type"].startswith("image/") and item["path"] in self._names:
+                return item
+        return None
+
+    def iter_documents(self):
+        """Genera (item, bytes) de cada documento del spine, leyéndolos de uno en uno."""
+        for item in self.spine_items():
+            yield item, self._zip.read(item["path"])
+
+    # --- Índice y lectura por capítulos ---
+    def _toc_entry(self, title: str, href: str | None, base: str, children: list) -> dict:
+        return {
+            "title": title,
+            "path": self.resolve(href, base=base) if href else None,
+            "fragment": href.split("#", 1)[1] if href and "#" in href else None,
+            "children": children,
+        }
+
+    def _nav_entries(self, ol, base: str) -> list[dict]:
+        entries = []
+        for li in ol:
+            if _local(li.tag) != "li":
+                continue
+            label = next((c for c in li if _local(c.tag) in ("a", "span")), None)
+            sub = next((c for c in li if _local(c.tag) == "ol"), None)
+            title = " ".join("".join(label.itertext()).split()) if label is not None else ""
+            href = label.get("href") if label is not None else None
+            entries.append(self._toc_entry(title, href, base, self._nav_entries(sub, base) if sub is not None else []))
+        return entries
+
+    def _ncx_entries(self, parent, base: str) -> list[dict]:
+        entries = []
+        for point in parent:
+            if _local(point.tag) != "navpoint":
+                continue
+            label = next((el for el in point.iter() if _local(el.tag) == "text"), None)
+            content = next((c for c in point if _local(c.tag) == "content"), None)
+            title = " ".join((label.text or "").split()) if label is not None else ""
+            href = content.get("src") if content is not None else None
+            entries.append(self._toc_entry(title, href, base, self._ncx_entries(point, base)))
+        return entries
+
+    def toc(self) -> list[dict]:
+        """Índice del libro como árbol de `{"title", "path", "fragment", "children"}`.
+
+        Usa el documento nav de EPUB 3 y, si no lo hay, el NCX de EPUB 2. Si
+        el libro no trae índice, devuelve una entrada por documento del spine.
+        """
+        nav = next((i for i in self.manifest.values() if "nav" in i["properties"].split() and i["path"] in self._names), None)
+        if nav:
+            root = etree.fromstring(self._zip.read(nav["path"]), _XML_PARSER)
+            navs = [el for el in root.iter() if _local(el.tag) == "nav"] if root is not None else []
+            # El índice es el <nav epub:type="toc">; los demás (landmarks, páginas) se ignoran
+            toc_nav = next((n for n in navs if any(_local(k) == "type" and "toc" in v.split() for k, v in n.attrib.items())), None)
+            toc_nav = toc_nav if toc_nav is not None else (navs[0] if navs else None)
+            ol = next((el for el in toc_nav.iter() if _local(el.tag) == "ol"), None) if toc_nav is not None else None
+            if ol is not None:
+                entries = self._nav_entries(ol, nav["path"])
+                if entries:
+                    return entries
+        ncx = self.manifest.get(self._ncx_id) if self._ncx_id else None
+        ncx = ncx or next((i for i in self.manifest.values() if i["media_type"] == NCX_TYPE), None)
+        if ncx and ncx["path"] in self._names:
+            root = etree.fromstring(self._zip.read(ncx["path"]), _XML_PARSER)
+            nav_map = next((el for el in root.iter() if _local(el.tag) == "navmap"), None) if root is not None else None
+            if nav_map is not None:
+                entries = self._ncx_entries(nav_map, ncx["path"])
+                if entries:
+                    return entries
+        return [
+            {"title": f"Capítulo {n}", "path": item["path"], "fragment": None, "children": []}
+            for n, item in enumerate(self.spine_items(), start=1)
+        ]
+
+    def rewrite_document(self, path: str, rewrite) -> bytes:
+        """Documento XHTML con sus enlaces internos reescritos y sin contenido activo.
+
+        `rewrite(ruta, fragmento)` recibe la ruta dentro del zip a la que apunta
+        cada `href`/`src` relativo y devuelve la URL nueva (o None para dejarlo
+        como está). Los enlaces externos y los de solo `#fragmento` no se tocan.
+        Se quitan los scripts (y `object`, `iframe`...), los atributos `on*` y
+        las URLs `javascript:`, para que el lector pueda insertar el capítulo
+        en su página sin ejecutar código del libro.
+        """
+        root = etree.fromstring(self._zip.read(path), _XML_PARSER)
+        if root is None:
+            raise ValueError(f"{path} no es un documento XHTML válido.")
+        for el in [el for el in root.iter() if _local(el.tag) in _ACTIVE_TAGS]:
+            parent = el.getparent()
+            if parent is not None:
+                # Se conserva el texto que sigue al elemento
+                if el.tail:
+                    previous = el.getprevious()
+                    if previous is not None:
+                        previous.tail = (previous.tail or "") + el.tail
+                    else:
+                        parent.text = (parent.text or "") + el.tail
+                parent.remove(el)
+        for el in root.iter():
+            if not isinstance(el.tag, str):
+                continue
+            for attr in [a for a in el.attrib if _local(a).startswith("on")]:
+                del el.attrib[attr]
+            for attr in _LINK_ATTRS:
+                if _SCRIPT_URL_RE.match(el.get(attr) or ""):
+                    del el.attrib[attr]
+                value = el.get(attr)
+                if not value or value.startswith("#") or _EXTERNAL_RE.match(value):
+                    continue
+                fragment = value.split("#", 1)[1] if "#" in value else None
+                url = rewrite(self.resolve(value, base=path), fragment)
+                if url is not None:
+                    el.set(attr, url)
+        return etree.tostring(root.getroottree(), xml_declaration=True, encoding="utf-8")
+
+    # --- Texto ---
+    def iter_text(self):
+        """Genera el texto plano de cada documento del spine."""
+        for item in self.spine_items():
+            try:
+                with self._zip.open(item["path"]) as f:
+                    text = document_text(f)
+            except Exception as e:
+                print(f"Error leyendo {item['path']} del EPUB: {e}")
+                continue
+            if text:
+                yield text
+
+    def text(self, max_chars: int | None = None) -> str:
+        """Texto de los documentos del spine; deja de leer al superar `max_chars`."""
+        text = ""
+        for doc_text in self.iter_text():
+            text += doc_text + "\n"
+            if max_chars is not None and len(text) > max_chars:
+                break
+        return text
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+
+def document_text(source) -> str:
+    """Texto plano de un documento XHTML (archivo o bytes) recorrido con iterparse.
+
+    El texto de cada elemento se compone al cerrarlo y sus hijos se liberan,
+    así que la memoria no depende del tamaño del árbol.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    stack = [[]]
+    # Parser HTML de libxml2: tolera XHTML mal formado y entidades como &nbsp; sin DTD.
+    # La especificación EPUB exige UTF-8 en los documentos de contenido.
+    for event, el in etree.iterparse(source, events=("start", "end", "comment", "pi"), html=True,
+                                     encoding="utf-8", recover=True, no_network=True, huge_tree=True):
+        if event == "start":
+            stack.append([])
+            continue
+        if event in ("comment", "pi"):
+            stack[-1].append((el, ""))
+            continue
+        children = stack.pop()
+        tag = _local(el.tag)
+        if tag in _SKIP_TAGS:
+            text = ""
+        else:
+            text = (el.text or "") + "".join(child_text + (child.tail or "") for child, child_text in children)
+            if tag in _BLOCK_TAGS:
+                text = f" {text} "
+        for child, _ in children:
+            child.clear(keep_tail=True)
+        stack[-1].append((el, text))
+    return " ".join("".join(text for _, text in stack[0]).split())
+
+
+def open_epub(source) -> EpubBook:
+    """Abre un EPUB desde una ruta o desde sus bytes."""
+    return EpubBook(source)
@@ -0,0 +1,231 @@
+"""Búsqueda de texto completo en el catálogo con SQLite FTS5.
+
+`books_fts` es una tabla virtual FTS5 de contenido externo sobre `books`
+(título, autor y categoría). Unos triggers la mantienen sincronizada con cada
+INSERT/UPDATE/DELETE, también con los que no pasan por el ORM (importación
+masiva, scripts con sqlite3).
+
+El tokenizador `unicode61 remove_diacritics 2` ignora mayúsculas y acentos
+("garcia" encuentra "García"), y los resultados se ordenan por bm25 dando más
+peso al título que al autor y a la categoría. Cada palabra de la búsqueda se
+trata como prefijo ("cien años" encuentra "Cien años de soledad").
+
+Si el SQLite instalado no tiene FTS5, `crud` vuelve a las búsquedas con LIKE.
+
+El contenido de los libros se indexa aparte: `book_passages` guarda el texto
+por fragmentos (cada página de un PDF o cada capítulo del spine de un EPUB,
+troceados en `PASSAGE_CHARS` caracteres) y `book_passages_fts` lo indexa con
+el mismo tokenizador. Así una búsqueda dentro de los libros devuelve la página
+o el capítulo y un fragmento resaltado sin pasar por el modelo.
+"""
+import html
+import re
+import weakref
+
+from sqlalchemy import column, table, text
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+# Pesos de bm25 por columna: título, autor, categoría
+RANK = "bm25(10.0, 5.0, 1.0)"
+
+BOOKS_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(title, author, category, content='books', content_rowid='id', tokenize='{TOKENIZER}')",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, category) VALUES (new.id, new.title, new.author, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, category) VALUES ('delete', old.id, old.title, old.author, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, category ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, category) VALUES ('delete', old.id, old.title, old.author, old.category);
+        INSERT INTO books_fts(rowid, title, author, category) VALUES (new.id, new.title, new.author, new.category);
+    END""",
+    f"INSERT INTO books_fts(books_fts, rank) VALUES ('rank', '{RANK}')",
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+]
+
+BOOK_PASSAGES_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS book_passages_fts USING fts5(text, content='book_passages', content_rowid='id', tokenize='{TOKENIZER}')",
+    """CREATE TRIGGER IF NOT EXISTS book_passages_fts_ai AFTER INSERT ON book_passages BEGIN
+        INSERT INTO book_passages_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS book_passages_fts_ad AFTER DELETE ON book_passages BEGIN
+        INSERT INTO book_passages_fts(book_passages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS book_passages_fts_au AFTER UPDATE OF text ON book_passages BEGIN
+        INSERT INTO book_passages_fts(book_passages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO book_passages_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    # Al borrar un libro (también por categoría o desde scripts) se borra su contenido indexado
+    """CREATE TRIGGER IF NOT EXISTS books_passages_ad AFTER DELETE ON books BEGIN
+        DELETE FROM book_passages WHERE book_id = old.id;
+    END""",
+    "INSERT INTO book_passages_fts(book_passages_fts) VALUES ('rebuild')",
+]
+# Caracteres máximos de cada fragmento indexado (se corta en un espacio)
+PASSAGE_CHARS = 1500
+# Palabras de contexto alrededor de las coincidencias en los fragmentos resaltados
+SNIPPET_TOKENS = 24
+# Marcadores de las coincidencias en `snippet()`. Son separadores de control
+# que `split_passage` elimina al normalizar los espacios, así que nunca
+# aparecen en el texto indexado y no se confunden con el contenido del libro.
+SNIPPET_OPEN = "\x1e"
+SNIPPET_CLOSE = "\x1f"
+
+# Para usar en consultas del ORM: join por rowid y orden por `rank` (bm25)
+books_fts = table("books_fts", column("rowid"), column("rank"))
+MATCH_CLAUSE = text("books_fts MATCH :fts_match")
+
+_WORD_RE = re.compile(r"\w+")
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+_available: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def match_expression(terms: str | None, column_name: str | None = None) -> str | None:
+    """Convierte lo que escribe el usuario en una expresión MATCH segura.
+
+    Cada palabra va entre comillas (así no se interpretan operadores de FTS5)
+    y como prefijo; todas deben aparecer. Devuelve None si no hay palabras.
+    """
+    words = _WORD_RE.findall(terms or "")
+    if not words:
+        return None
+    scope = f"{column_name} : " if column_name else ""
+    return " ".join(f'{scope}"{word}"*' for word in words)
+
+
+def books_match(search: str | None = None, author: str | None = None, title: str | None = None) -> str | None:
+    """Expresión MATCH para los filtros de texto de `/books/` y `/books/search/`."""
+    parts = [
+        match_expression(search),
+        match_expression(author, "author"),
+        match_expression(title, "title"),
+    ]
+    parts = [p for p in parts if p]
+    return " ".join(parts) if parts else None
+
+
+def content_match(query: str | None) -> str | None:
+    """Expresión MATCH para buscar en el contenido.
+
+    Lo que va entre comillas se busca como frase exacta; el resto de palabras,
+    como prefijos que deben aparecer todos.
+    """
+    query = query or ""
+    phrases = [" ".join(_WORD_RE.findall(p)) for p in _PHRASE_RE.findall(query)]
+    parts = [f'"{p}"' for p in phrases if p]
+    rest = match_expression(_PHRASE_RE.sub(" ", query))
+    if rest:
+        parts.append(rest)
+    return " ".join(parts) if parts else None
+
+
+def create_books_fts(connection):
+    """Crea la tabla FTS5 y sus triggers (si faltan) e indexa los libros existentes."""
+    for statement in BOOKS_FTS_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def on_books_created(_table, connection, **_kw):
+    """Listener `after_create` de `books`: las bases nuevas nacen con el índice FTS."""
+    if connection.dialect.name == "sqlite":
+        try:
+            create_books_fts(connection)
+        except Exception as e:
+            print(f"Advertencia: no se pudo crear el índice FTS5 de libros: {e}")
+
+
+def on_passages_created(_table, connection, **_kw):
+    """Listener `after_create` de `book_passages`: crea su índice FTS5 y sus triggers."""
+    if connection.dialect.name == "sqlite":
+        try:
+            for statement in BOOK_PASSAGES_FTS_DDL:
+                connection.exec_driver_sql(statement)
+        except Exception as e:
+            print(f"Advertencia: no se pudo crear el índice FTS5 del contenido: {e}")
+
+
+def ensure_books_fts(engine) -> bool:
+    """Crea el índice en bases de datos anteriores a FTS5. Devuelve si está disponible."""
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'books_fts'").first()
+            if not exists:
+                print("Creando el índice de búsqueda FTS5 de libros...")
+                create_books_fts(conn)
+        return True
+    except Exception as e:
+        print(f"Advertencia: búsqueda FTS5 no disponible, se usará LIKE: {e}")
+        return False
+
+
+def is_available(db) -> bool:
+    """Indica (con caché por engine) si la base de datos de la sesión tiene `books_fts`."""
+    engine = db.get_bind()
+    if engine not in _available:
+        try:
+            found = db.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'books_fts'")).first()
+            _available[engine] = found is not None
+        except Exception:
+            _available[engine] = False
+    return _available[engine]
+
+
+# --- Contenido ---
+def highlight_snippet(raw: str) -> str:
+    """Fragmento de `snippet()` listo para HTML: texto escapado y coincidencias entre `<mark>`."""
+    return html.escape(raw or "").replace(SNIPPET_OPEN, "<mark>").replace(SNIPPET_CLOSE, "</mark>")
+
+
+def split_passage(text: str, size: int = PASSAGE_CHARS):
+    """Genera (desplazamiento, fragmento) de como mucho `size` caracteres, cortando en espacios."""
+    text = " ".join(text.split())
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start, end)
+            if cut > start:
+                end = cut
+        yield start, text[start:end]
+        start = end + 1 if end < len(text) and text[end] == " " else end
+
+
+def iter_page_texts(file_path: str):
+    """Genera `(número, texto)` de cada página de un PDF o capítulo del spine de un EPUB (desde 1)."""
+    if file_path.lower().endswith(".pdf"):
+        import fitz
+        with fitz.open(file_path) as doc:
+            for number, page in enumerate(doc, start=1):
+                yield number, page.get_text("text", sort=True)
+    elif file_path.lower().endswith(".epub"):
+        from .epub_engine import document_text, open_epub
+        with open_epub(file_path) as book:
+            for number, item in enumerate(book.spine_items(), start=1):
+                try:
+                    text = document_text(book.read(item["path"]))
+                except Exception as e:
+                    print(f"Error leyendo {item['path']} del EPUB: {e}")
+                    continue
+                yield number, text
+    else:
+        raise ValueError("Tipo de archivo no soportado. Solo se admiten PDF y EPUB.")
+
+
+def passages_from_pages(pages):
+    """Trocea los `(número, texto)` de `iter_page_texts` en dicts `page`, `char_offset` y `text`."""
+    for number, text in pages:
+        for offset, passage in split_passage(text):
+            yield {"page": number, "char_offset": offset, "text": passage}
+
+
+def iter_passages(file_path: str):
+    """Genera los fragmentos de texto de un libro como dicts `page`, `char_offset` y `text`.
+
+    `page` es el número de página (1..n) de un PDF o la posición del capítulo
+    en el spine (1..n) de un EPUB; `char_offset`, la posición del fragmento
+    dentro de esa página o capítulo.
+    """
+    return passages_from_pages(iter_page_texts(file_path))
@@ -0,0 +1,272 @@
+"""Etapas de ingesta de libros y su orquestación en paralelo.
+
+La subida de un libro se modela como un pequeño grafo de tareas:
+
+    extracto (primeras páginas) ──> análisis de metadatos (IA) ─┐
+    portada                      ──────────────────────────────┴─> respuesta
+    texto completo               ──> fragmentos + trozos RAG ──> indexación (tras crear el libro)
+
+El texto completo empieza a leerse nada más llegar el archivo y el análisis
+con IA arranca en cuanto el extracto está listo, mientras la portada se
+procesa en otro hilo. La subida responde en cuanto hay metadatos y portada,
+sin esperar al texto completo: esa tarea sigue en marcha y la indexación en
+segundo plano recoge su resultado cuando el libro ya tiene ID. El texto se
+lee una sola vez (`extract_full_text`) para la búsqueda en el contenido y
+para RAG.
+
+Los PDF se leen en una sola pasada (`read_pdf`): texto de las primeras
+páginas, metadatos, número de páginas y portada con el documento abierto una
+única vez. En la subida la portada se extrae aparte (`with_cover=False`) para
+que no retrase la llamada a la IA.
+"""
+import asyncio
+import io
+import os
+
+from fastapi import HTTPException
+from PIL import Image
+
+from . import covers, fulltext, local_metadata, utils
+
+# Tamaño del extracto que se envía a la IA para identificar el libro
+EXCERPT_PDF_PAGES = 5
+EXCERPT_EPUB_CHARS = 4500
+# Mínimo de texto exigido a un EPUB para poder analizarlo
+MIN_EPUB_TEXT_CHARS = 100
+# Búsqueda de portada en PDF: solo las primeras páginas y solo imágenes grandes.
+# Si no aparece ninguna, se renderiza la primera página a baja resolución.
+COVER_SCAN_PAGES = int(os.getenv("COVER_SCAN_PAGES", "10"))
+COVER_MIN_SIZE = 300
+COVER_FALLBACK_DPI = 72
+
+
+# --- Utilidades de Imagen ---
+def save_optimized_image(pix_or_bytes, target_path, is_pixmap=True):
+    """Guarda una imagen optimizada (redimensionada y comprimida)."""
+    if is_pixmap:
+        # pix_or_bytes es un fitz.Pixmap
+        img = Image.frombytes("RGB", [pix_or_bytes.width, pix_or_bytes.height], pix_or_bytes.samples)
+    else:
+        # pix_or_bytes es un objeto bytes (de EPUB)
+        img = Image.open(io.BytesIO(pix_or_bytes))
+        if img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
+
+    # Redimensionar si es muy grande (máximo 400px de ancho para portadas)
+    MAX_WIDTH = 400
+    if img.width > MAX_WIDTH:
+        ratio = MAX_WIDTH / float(img.width)
+        new_height = int(float(img.height) * ratio)
+        img = img.resize((MAX_WIDTH, new_height), Image.Resampling.LANCZOS)
+
+    # Guardar como JPEG con calidad optimizada
+    img.save(target_path, "JPEG", quality=80, optimize=True)
+
+
+# --- Etapas ---
+def extract_excerpt(file_path: str) -> str:
+    """Extrae el texto de las primeras páginas, suficiente para identificar el libro."""
+    if file_path.lower().endswith(".pdf"):
+        return utils.extract_text_from_pdf(file_path, max_pages=EXCERPT_PDF_PAGES)
+    if file_path.lower().endswith(".epub"):
+        text = utils.extract_text_from_epub(file_path, max_chars=EXCERPT_EPUB_CHARS)
+        if len(text.strip()) < MIN_EPUB_TEXT_CHARS:
+            raise HTTPException(status_code=422, detail="No se pudo extraer suficiente texto del EPUB para su análisis.")
+        return text
+    raise HTTPException(status_code=400, detail="Tipo de archivo no soportado.")
+
+
+def _find_pdf_cover_xref(doc, max_pages: int) -> int | None:
+    """Busca una imagen grande en las primeras páginas usando solo las dimensiones declaradas.
+
+    `get_page_images` devuelve ancho y alto sin decodificar la imagen, así que
+    solo se decodifica la imagen elegida.
+    """
+    for i in range(min(len(doc), max_pages)):
+        for img in doc.get_page_images(i):
+            xref, width, height = img[0], img[2], img[3]
+            if width > COVER_MIN_SIZE and height > COVER_MIN_SIZE:
+                return xref
+    return None
+
+
+def _pdf_cover_pixmap(doc):
+    """Pixmap RGB de la portada: la primera imagen grande o, si no la hay, la página 1 renderizada."""
+    import fitz
+    xref = _find_pdf_cover_xref(doc, COVER_SCAN_PAGES)
+    if xref is not None:
+        pix = fitz.Pixmap(doc, xref)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        if pix.n != 3:
+            # CMYK, escala de grises, etc.
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        return pix
+    if len(doc) == 0:
+        return None
+    return doc.load_page(0).get_pixmap(dpi=COVER_FALLBACK_DPI, alpha=False)
+
+
+def save_pdf_cover(doc, file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> str | None:
+    """Guarda la portada de un PDF ya abierto y devuelve su URL relativa."""
+    pix = _pdf_cover_pixmap(doc)
+    if pix is None:
+        return None
+    cover_filename = f"cover_{os.path.basename(file_path)}.jpg"
+    cover_full_path = os.path.join(covers_dir_fs, cover_filename)
+    save_optimized_image(pix, cover_full_path, is_pixmap=True)
+    return f"{covers_url_prefix}/{cover_filename}"
+
+
+def read_pdf(file_path: str, covers_dir_fs: str, covers_url_prefix: str, max_pages: int = EXCERPT_PDF_PAGES,
+             with_cover: bool = True) -> dict:
+    """Lectura de ingesta de un PDF abriéndolo una sola vez.
+
+    Devuelve el texto de las primeras `max_pages` páginas, los metadatos del
+    documento (solo claves con valor), el número de páginas y la URL de la portada
+    (None con `with_cover=False`, para extraerla aparte en paralelo).
+    """
+    import fitz
+    doc = fitz.open(file_path)
+    try:
+        text = ""
+        for i in range(min(len(doc), max_pages)):
+            text += doc.load_page(i).get_text("text", sort=True) + "\n"
+        metadata = {k: v for k, v in (doc.metadata or {}).items() if v}
+        if not with_cover:
+            return {"text": text, "metadata": metadata, "page_count": len(doc), "cover_image_url": None}
+        try:
+            cover_url = save_pdf_cover(doc, file_path, covers_dir_fs, covers_url_prefix)
+        except Exception as e:
+            print(f"Error al extraer la portada de {file_path}: {e}")
+            cover_url = None
+        return {"text": text, "metadata": metadata, "page_count": len(doc), "cover_image_url": cover_url}
+    finally:
+        doc.close()
+
+
+def extract_pdf_cover(file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> str | None:
+    """Guarda la portada de un PDF (ver `save_pdf_cover`) y devuelve su URL relativa."""
+    import fitz
+    doc = fitz.open(file_path)
+    try:
+        return save_pdf_cover(doc, file_path, covers_dir_fs, covers_url_prefix)
+    finally:
+        doc.close()
+
+
+def extract_epub_cover(file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> str | None:
+    """Busca la portada del EPUB (metadatos o nombre de archivo) y devuelve su URL relativa."""
+    from .epub_engine import open_epub
+    with open_epub(file_path) as book:
+        cover_item = book.cover_item()
+        if not cover_item:
+            return None
+        content = book.read(cover_item["path"])
+
+    cover_filename = f"cover_{os.path.basename(file_path)}_{cover_item['href']}".replace('/', '_').replace('\\', '_')
+    if not cover_filename.lower().endswith(('.jpg', '.jpeg')):
+        cover_filename = os.path.splitext(cover_filename)[0] + ".jpg"
+    cover_full_path = os.path.join(covers_dir_fs, cover_filename)
+    save_optimized_image(content, cover_full_path, is_pixmap=False)
+    return f"{covers_url_prefix}/{cover_filename}"
+
+
+def extract_cover(file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> str | None:
+    """Extrae la portada según el tipo de archivo. Un fallo aquí no impide añadir el libro."""
+    try:
+        if file_path.lower().endswith(".pdf"):
+            return extract_pdf_cover(file_path, covers_dir_fs, covers_url_prefix)
+        if file_path.lower().endswith(".epub"):
+            return extract_epub_cover(file_path, covers_dir_fs, covers_url_prefix)
+    except Exception as e:
+        print(f"Error al extraer la portada de {file_path}: {e}")
+    return None
+
+
+def extract_full_text(file_path: str) -> dict:
+    """Lee el texto completo una sola vez y prepara lo que necesitan las dos indexaciones.
+
+    Devuelve `passages` (fragmentos por página para `crud.replace_book_passages`)
+    y `chunks` (trozos para RAG). Cualquiera de los dos es None si no se pudo
+    preparar; en ese caso su indexación lee el archivo por su cuenta.
+    """
+    try:
+        pages = list(fulltext.iter_page_texts(file_path))
+    except Exception as e:
+        print(f"Error al leer el texto completo de {file_path}: {e}")
+        return {"passages": None, "chunks": None}
+    passages = list(fulltext.passages_from_pages(pages))
+    try:
+        from . import rag
+        chunks = rag.chunk_text(rag.join_page_texts(file_path, [text for _, text in pages])) or None
+    except Exception as e:
+        print(f"Error al preparar los trozos RAG de {file_path}: {e}")
+        chunks = None
+    return {"passages": passages, "chunks": chunks}
+
+
+def read_book(file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> dict:
+    """Extracto, portada y metadatos locales de un libro. Los PDF se leen en una sola pasada."""
+    if file_path.lower().endswith(".pdf"):
+        data = read_pdf(file_path, covers_dir_fs, covers_url_prefix)
+        data["local_metadata"] = local_metadata.from_info(data["metadata"])
+        return data
+    text = extract_excerpt(file_path)
+    return {
+        "text": text,
+        "cover_image_url": extract_cover(file_path, covers_dir_fs, covers_url_prefix),
+        "local_metadata": local_metadata.from_epub(file_path),
+    }
+
+
+def process_pdf(file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> dict:
+    """Extracto y portada de un PDF."""
+    data = read_pdf(file_path, covers_dir_fs, covers_url_prefix)
+    return {"text": data["text"], "cover_image_url": data["cover_image_url"]}
+
+
+def process_epub(file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> dict:
+    """Extracto y portada de un EPUB, de forma secuencial."""
+    text = extract_excerpt(file_path)
+    return {"text": text, "cover_image_url": extract_cover(file_path, covers_dir_fs, covers_url_prefix)}
+
+
+# --- Orquestación ---
+async def run_pipeline(file_path: str, covers_dir_fs: str, covers_url_prefix: str, analyze) -> dict:
+    """Ejecuta las etapas de ingesta solapando el análisis de IA con el trabajo local.
+
+    `analyze` es la corrutina que recibe el extracto y devuelve los metadatos; solo
+    se llama cuando los metadatos propios del archivo no son fiables o les falta
+    la categoría (ver `local_metadata`).
+    Devuelve un dict con `metadata`, `cover_image_url`, `cover_placeholder`, `text` (el extracto) y
+    `full_text`: la tarea, aún en marcha, de `extract_full_text`. Quien llama no la
+    espera para responder; se la pasa a la indexación o la cancela si descarta el libro.
+    """
+    full_text = asyncio.ensure_future(asyncio.to_thread(extract_full_text, file_path))
+    try:
+        if file_path.lower().endswith(".pdf"):
+            info = await asyncio.to_thread(read_pdf, file_path, covers_dir_fs, covers_url_prefix, with_cover=False)
+            local = local_metadata.from_info(info["metadata"])
+        else:
+            info = {"text": await asyncio.to_thread(extract_excerpt, file_path)}
+            local = await asyncio.to_thread(local_metadata.from_epub, file_path)
+        excerpt = info["text"]
+
+        # La IA solo se consulta si los metadatos del archivo no bastan; la portada, en paralelo
+        analysis = analyze(excerpt) if local_metadata.needs_ai(local) else _completed(None)
+        cover_stage = asyncio.to_thread(extract_cover, file_path, covers_dir_fs, covers_url_prefix)
+        ai_result, cover_url = await asyncio.gather(analysis, cover_stage)
+        metadata = local_metadata.combine(local, ai_result)
+        placeholder = None
+        if cover_url:
+            placeholder = await asyncio.to_thread(covers.make_placeholder, os.path.join(covers_dir_fs, os.path.basename(cover_url)))
+    except BaseException:
+        full_text.cancel()
+        raise
+    return {"metadata": metadata, "cover_image_url": cover_url, "cover_placeholder": placeholder, "text": excerpt,
+            "full_text": full_text}
+
+
+async def _completed(value):
+    return value
@@ -0,0 +1,67 @@
+"""Versión de la biblioteca: un contador que sube con cada escritura.
+
+La fila 1 de la tabla `library_version` es la versión del catálogo: unos
+triggers la incrementan con cada INSERT, UPDATE o DELETE de `books` (también
+los de la importación masiva y los scripts). La fila `RAG_VERSION_ID` es un
+contador aparte para el índice RAG, que sube al añadir o borrar vectores
+(`bump_rag`): indexar o caducar un libro temporal no cambia el catálogo y no
+debe invalidar sus listados.
+
+Los listados (`/books/`, `/categories/`, `/books/count`; `/rag/stats` con el
+contador de RAG) devuelven un ETag formado por la versión y la ruta con sus parámetros; si el
+cliente manda ese ETag en `If-None-Match`, la API responde 304 tras leer
+solo la versión, sin repetir la consulta ni serializar el resultado.
+"""
+import hashlib
+
+VERSION_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS books_version_{suffix} AFTER {event} ON books BEGIN\n"
+    "        UPDATE library_version SET version = version + 1 WHERE id = 1;\n    END"
+    for suffix, event in (("ai", "INSERT"), ("ad", "DELETE"), ("au", "UPDATE"))
+]
+SEED = "INSERT OR IGNORE INTO library_version(id, version) VALUES (1, 0)"
+# Fila del contador del índice RAG (se crea la primera vez que sube)
+RAG_VERSION_ID = 2
+
+
+def etag(version: int, *parts) -> str:
+    """ETag débil para un recurso (ruta y parámetros en `parts`) en una versión de la biblioteca."""
+    digest = hashlib.sha1("\n".join(map(str, parts)).encode("utf-8")).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def matches(if_none_match: str | None, tag: str) -> bool:
+    """Indica si la cabecera `If-None-Match` incluye `tag` (comparación débil, como manda HTTP)."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or tag.removeprefix("W/") in (c.removeprefix("W/") for c in candidates)
+
+
+def on_books_created(_table, connection, **_kw):
+    """Listener `after_create` de `books`: crea los triggers que suben la versión."""
+    if connection.dialect.name == "sqlite":
+        for statement in VERSION_TRIGGERS:
+            connection.exec_driver_sql(statement)
+
+
+def on_version_created(_table, connection, **_kw):
+    """Listener `after_create` de `library_version`: crea la fila (y los triggers, si `books` ya existía)."""
+    if connection.dialect.name != "sqlite":
+        return
+    connection.exec_driver_sql(SEED)
+    if connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books'").first():
+        for statement in VERSION_TRIGGERS:
+            connection.exec_driver_sql(statement)
+
+
+def bump_rag():
+    """Sube el contador del índice RAG. Escribe en SQLite: desde código asíncrono, con `asyncio.to_thread`."""
+    from . import crud, database
+    db = database.SessionLocal()
+    try:
+        crud.bump_rag_version(db)
+    except Exception as e:
+        print(f"Advertencia: no se pudo actualizar la versión del índice RAG: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,128 @@
+"""Metadatos locales del propio archivo, antes de recurrir a la IA.
+
+Muchos libros ya traen título y autor fiables: el diccionario de información
+del PDF (`doc.metadata`) o `dc:title`, `dc:creator` y `dc:subject` en el OPF
+de un EPUB. Aquí se leen, se puntúan con una confianza entre 0 y 1 y se
+decide si hace falta la IA:
+
+- confianza alta y categoría presente: no se llama a la IA;
+- confianza alta sin categoría: la IA solo aporta la categoría;
+- confianza baja: se usa la IA y los valores locales cubren sus huecos.
+"""
+import os
+import re
+
+UNKNOWN = "Desconocido"
+AI_ERROR = "Error de IA"
+# Confianza mínima para dar por buenos el título y el autor locales
+MIN_CONFIDENCE = float(os.getenv("LOCAL_METADATA_MIN_CONFIDENCE", "0.75"))
+# Un "subject" de PDF más largo que esto suele ser una descripción, no una categoría
+MAX_CATEGORY_CHARS = 40
+
+# Valores de relleno habituales de los programas que generan PDF y EPUB
+_JUNK_TITLE_RE = re.compile(
+    r"^(untitled|unknown|sin t[ií]tulo|desconocido|title|t[ií]tulo|document\d*|documento\d*|"
+    r"microsoft (word|powerpoint)\b.*|.*\.(docx?|pdf|tex|indd|qxd|rtf|odt|html?))$",
+    re.IGNORECASE,
+)
+_JUNK_AUTHOR_RE = re.compile(
+    r"^(unknown|desconocido|anonymous|admin|administrator|administrador|user|usuario|owner|author|autor|"
+    r"calibre.*|adobe.*|microsoft.*|pdf.*|scanner|\d+)$",
+    re.IGNORECASE,
+)
+
+
+def _clean(value) -> str:
+    return " ".join(str(value).split()) if value else ""
+
+
+def title_score(title: str) -> float:
+    """Confianza en un título local: 0 si falta o es un valor de relleno."""
+    title = _clean(title)
+    if not title or _JUNK_TITLE_RE.match(title) or not re.search(r"[^\W\d_]", title):
+        return 0.0
+    return 0.5 if len(title) < 3 else 1.0
+
+
+def author_score(author: str) -> float:
+    """Confianza en un autor local: 0 si falta o es un valor de relleno."""
+    author = _clean(author)
+    if not author or _JUNK_AUTHOR_RE.match(author) or not re.search(r"[^\W\d_]", author):
+        return 0.0
+    return 0.5 if len(author) < 3 else 1.0
+
+
+def assess(title: str, author: str, category: str | None = None) -> dict:
+    """Normaliza unos metadatos locales y calcula su confianza (media de título y autor)."""
+    title, author, category = _clean(title), _clean(author), _clean(category)
+    if len(category) > MAX_CATEGORY_CHARS:
+        category = ""
+    confidence = (title_score(title) + author_score(author)) / 2
+    return {
+        "title": title or None,
+        "author": author or None,
+        "category": category or None,
+        "confidence": round(confidence, 2),
+    }
+
+
+def from_info(info: dict | None) -> dict:
+    """Metadatos locales a partir de un diccionario con `title`, `author` y `subject`.
+
+    Sirve tal cual para el diccionario de información de un PDF (`doc.metadata`).
+    """
+    info = info or {}
+    return assess(info.get("title"), info.get("author"), info.get("subject"))
+
+
+def read_epub_opf(file_path: str) -> dict:
+    """Lee título, autores y primera materia del OPF de un EPUB sin cargar el libro entero."""
+    from .epub_engine import open_epub
+    with open_epub(file_path) as book:
+        meta = book.metadata
+    titles = [m["value"] for m in meta["title"]]
+    # Solo autores: se descartan editores, traductores, ilustradores...
+    authors = [m["value"] for m in meta["creator"] if (m["role"] or "aut") == "aut"]
+    subjects = [m["value"] for m in meta["subject"]]
+    return {
+        "title": titles[0] if titles else None,
+        "author": ", ".join(authors) if authors else None,
+        "subject": subjects[0] if subjects else None,
+    }
+
+
+def from_epub(file_path: str) -> dict:
+    """Metadatos locales de un EPUB; confianza 0 si el OPF no se puede leer."""
+    try:
+        info = read_epub_opf(file_path)
+    except Exception as e:
+        print(f"No se pudieron leer los metadatos OPF de {file_path}: {e}")
+        info = {}
+    return from_info(info)
+
+
+def needs_ai(local: dict | None) -> bool:
+    """Indica si hay que llamar a la IA (metadatos poco fiables o sin categoría)."""
+    return not local or local["confidence"] < MIN_CONFIDENCE or not local.get("category")
+
+
+def combine(local: dict | None, ai: dict | None) -> dict:
+    """Metadatos finales a partir de los locales y, si se pidió, del resultado de la IA."""
+    local = local or {"title": None, "author": None, "category": None, "confidence": 0.0}
+    ai = ai or {}
+
+    def ai_value(key):
+        value = ai.get(key)
+        return value if value and value not in (UNKNOWN, AI_ERROR) else None
+
+    if local["confidence"] >= MIN_CONFIDENCE:
+        return {
+            "title": local["title"],
+            "author": local["author"],
+            "category": local["category"] or ai_value("category") or UNKNOWN,
+        }
+    result = dict(ai)
+    for key in ("title", "author", "category"):
+        # Se respeta la respuesta de la IA; los valores locales solo cubren sus huecos
+        result[key] = ai_value(key) or local[key] or ai.get(key) or UNKNOWN
+    return result
@@ -1,19 +1,22 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Form, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Form, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
 import shutil
 import os
+import hashlib
 from pathlib import Path
 import asyncio
-import io
 from dotenv import load_dotenv
 import json
+from email.utils import formatdate, parsedate_to_datetime
 from typing import List, Optional
-from PIL import Image
 
-from . import crud, models, database, schemas, utils
+from . import crud, crud_async, models, database, schemas, utils, ingest, conversion, conversion_cache, conversion_jobs, temp_store, fulltext, library_version, response_cache, bulk_delete
+from .ingest import save_optimized_image, process_pdf, process_epub  # noqa: F401 (reexportados por compatibilidad)
 import uuid # For generating unique book IDs
 
 # --- Configuración Inicial ---
@@ -26,28 +29,7 @@ if AI_ENABLED:
     import google.generativeai as genai
     genai.configure(api_key=API_KEY)
 models.Base.metadata.create_all(bind=database.engine)
-
-# --- Utilidades de Imagen ---
-def save_optimized_image(pix_or_bytes, target_path, is_pixmap=True):
-    """Guarda una imagen optimizada (redimensionada y comprimida)."""
-    if is_pixmap:
-        # pix_or_bytes es un fitz.Pixmap
-        img = Image.frombytes("RGB", [pix_or_bytes.width, pix_or_bytes.height], pix_or_bytes.samples)
-    else:
-        # pix_or_bytes es un objeto bytes (de EPUB)
-        img = Image.open(io.BytesIO(pix_or_bytes))
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-
-    # Redimensionar si es muy grande (máximo 400px de ancho para portadas)
-    MAX_WIDTH = 400
-    if img.width > MAX_WIDTH:
-        ratio = MAX_WIDTH / float(img.width)
-        new_height = int(float(img.height) * ratio)
-        img = img.resize((MAX_WIDTH, new_height), Image.Resampling.LANCZOS)
-    
-    # Guardar como JPEG con calidad optimizada
-    img.save(target_path, "JPEG", quality=80, optimize=True)
+fulltext.ensure_books_fts(database.engine)
 
 # --- Utilidades de Ruta ---
 def get_safe_path(db_path: str) -> str:
@@ -68,13 +50,28 @@ def get_relative_path(abs_path: str) -> str:
         return abs_path
 
 # --- Funciones de IA y Procesamiento ---
+AI_ERROR_METADATA = {"title": "Error de IA", "author": "Error de IA", "category": "Error de IA"}
+# Extractos que se envían juntos en una sola llamada de análisis por lotes
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "8"))
+
+def _parse_gemini_json(raw: str):
+    """Decodifica el JSON de una respuesta de Gemini, quitando el bloque ```json si lo hay."""
+    match = raw.strip()
+    if match.startswith("```json"):
+        match = match[7:]
+    if match.endswith("```"):
+        match = match[:-3]
+    return json.loads(match.strip())
+
+def _metadata_model_name() -> str:
+    # Permite configurar el modelo por variable de entorno; por defecto 2.5 (sin alias -latest)
+    return os.getenv("GEMINI_MODEL_MAIN", "gemini-2.5-flash")
+
 async def analyze_with_gemini(text: str) -> dict:
     if os.getenv("DISABLE_AI") == "1" or not AI_ENABLED:
         return {"title": "Desconocido", "author": "Desconocido", "category": "Desconocido"}
     import google.generativeai as genai
-    # Permite configurar el modelo por variable de entorno; por defecto 2.5 (sin alias -latest)
-    model_name = os.getenv("GEMINI_MODEL_MAIN", "gemini-2.5-flash")
-    model = genai.GenerativeModel(model_name)
+    model = genai.GenerativeModel(_metadata_model_name())
     prompt = f"""
     Eres un bibliotecario experto. Analiza el siguiente texto extraído de las primeras páginas de un libro.
     Tu tarea es identificar el título, el autor y la categoría principal del libro.
@@ -87,73 +84,99 @@ async def analyze_with_gemini(text: str) -> dict:
         response = await model.generate_content_async(prompt)
         if os.getenv("DEBUG_GEMINI") == "1":
             print(f"DEBUG: Gemini raw response: {response.text}")
-        match = response.text.strip()
-        if match.startswith("```json"):
-            match = match[7:]
-        if match.endswith("```"):
-            match = match[:-3]
-        return json.loads(match.strip())
+        return _parse_gemini_json(response.text)
     except Exception as e:
         print(f"Error al analizar con Gemini: {e}")
         if 'response' in locals() and os.getenv("DEBUG_GEMINI") == "1":
             print(f"DEBUG: Gemini raw response on error: {response.text}")
-        return {"title": "Error de IA", "author": "Error de IA", "category": "Error de IA"}
-
-def process_pdf(file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> dict:
-    import fitz
-    text = utils.extract_text_from_pdf(file_path, max_pages=5)
-    doc = fitz.open(file_path)
-    cover_path = None
-    for i in range(len(doc)):
-        for img in doc.get_page_images(i):
-            xref = img[0]
-            pix = fitz.Pixmap(doc, xref)
-            if pix.width > 300 and pix.height > 300:
-                cover_filename = f"cover_{os.path.basename(file_path)}.jpg"
-                cover_full_path = os.path.join(covers_dir_fs, cover_filename)
-                save_optimized_image(pix, cover_full_path, is_pixmap=True)
-                cover_path = f"{covers_url_prefix}/{cover_filename}"
-                break
-        if cover_path:
-            break
-    return {"text": text, "cover_image_url": cover_path}
-
-def process_epub(file_path: str, covers_dir_fs: str, covers_url_prefix: str) -> dict:
-    """ Lógica de procesamiento de EPUB muy mejorada con fallbacks para la portada. """
-    text = utils.extract_text_from_epub(file_path, max_chars=4500)
-    
-    import ebooklib
-    from ebooklib import epub
-    book = epub.read_epub(file_path)
-    
-    if len(text.strip()) < 100:
-        raise HTTPException(status_code=422, detail="No se pudo extraer suficiente texto del EPUB para su análisis.")
+        return AI_ERROR_METADATA.copy()
 
-    cover_path = None
-    cover_item = None
+def _metadata_cache_key(text: str, model_name: str) -> str:
+    """Clave de caché: hash del modelo y del texto que realmente se envía a la IA."""
+    return hashlib.sha256(f"{model_name}\n{text[:4000]}".encode("utf-8")).hexdigest()
 
-    # Intento 1: Buscar la portada oficial en metadatos
-    cover_items = list(book.get_items_of_type(ebooklib.ITEM_COVER))
-    if cover_items:
-        cover_item = cover_items[0]
-    
-    # Intento 2: Si no hay portada oficial, buscar por nombre de archivo "cover"
-    if not cover_item:
-        for item in book.get_items_of_type(ebooklib.ITEM_IMAGE):
-            if 'cover' in item.get_name().lower():
-                cover_item = item
-                break
-
-    # Si encontramos una portada por cualquiera de los métodos
-    if cover_item:
-        cover_filename = f"cover_{os.path.basename(file_path)}_{cover_item.get_name()}".replace('/', '_').replace('\\', '_')
-        if not cover_filename.lower().endswith(('.jpg', '.jpeg')):
-            cover_filename = os.path.splitext(cover_filename)[0] + ".jpg"
-        cover_full_path = os.path.join(covers_dir_fs, cover_filename)
-        save_optimized_image(cover_item.get_content(), cover_full_path, is_pixmap=False)
-        cover_path = f"{covers_url_prefix}/{cover_filename}"
-
-    return {"text": text, "cover_image_url": cover_path}
+def _load_cached_metadata(keys: list[str]) -> dict[str, dict]:
+    db = database.SessionLocal()
+    try:
+        return crud.get_cached_metadata(db, keys)
+    finally:
+        db.close()
+
+def _store_cached_metadata(model_name: str, results: dict[str, dict]):
+    db = database.SessionLocal()
+    try:
+        crud.save_cached_metadata(db, model_name, results)
+    finally:
+        db.close()
+
+async def analyze_books_with_gemini(texts: list[str]) -> list[dict]:
+    """Analiza varios extractos en una sola llamada, pidiendo un array JSON en el mismo orden.
+
+    Si la respuesta no se puede interpretar, se recurre a una llamada por libro.
+    """
+    if not texts:
+        return []
+    if os.getenv("DISABLE_AI") == "1" or not AI_ENABLED:
+        return [{"title": "Desconocido", "author": "Desconocido", "category": "Desconocido"} for _ in texts]
+    import google.generativeai as genai
+    model = genai.GenerativeModel(_metadata_model_name())
+    excerpts = "\n".join(f"### Libro {i}\n--- {text[:4000]} ---" for i, text in enumerate(texts))
+    prompt = f"""
+    Eres un bibliotecario experto. Analiza los siguientes {len(texts)} textos, cada uno extraído de las primeras páginas de un libro distinto.
+    Para cada libro identifica el título, el autor y la categoría principal.
+    Devuelve ÚNICAMENTE un array JSON con {len(texts)} objetos, en el mismo orden que los libros, con las claves "index", "title", "author" y "category".
+    Si no puedes determinar un valor, usa "Desconocido".
+    Ejemplo: [{{"index": 0, "title": "El nombre del viento", "author": "Patrick Rothfuss", "category": "Fantasía"}}]
+    {excerpts}
+    """
+    try:
+        response = await model.generate_content_async(prompt)
+        if os.getenv("DEBUG_GEMINI") == "1":
+            print(f"DEBUG: Gemini raw batch response: {response.text}")
+        items = _parse_gemini_json(response.text)
+        if not isinstance(items, list) or len(items) != len(texts) or not all(isinstance(i, dict) for i in items):
+            raise ValueError(f"se esperaban {len(texts)} resultados")
+        if all(isinstance(i.get("index"), int) for i in items) and sorted(i["index"] for i in items) == list(range(len(texts))):
+            items = sorted(items, key=lambda i: i["index"])
+        return [{k: i.get(k, "Desconocido") for k in ("title", "author", "category")} for i in items]
+    except Exception as e:
+        print(f"Error al analizar un lote con Gemini, se analiza libro a libro: {e}")
+        return list(await asyncio.gather(*(analyze_with_gemini(text) for text in texts)))
+
+async def analyze_metadata_batch(texts: list[str]) -> list[dict]:
+    """Analiza varios extractos usando la caché persistente y lotes de `GEMINI_BATCH_SIZE`.
+
+    Los textos idénticos (resubidas, PDFs convertidos de un EPUB existente) no
+    vuelven a la IA. Los errores de IA no se guardan en caché.
+    """
+    if os.getenv("DISABLE_AI") == "1" or not AI_ENABLED:
+        return await analyze_books_with_gemini(texts)
+    model_name = _metadata_model_name()
+    keys = [_metadata_cache_key(text, model_name) for text in texts]
+    cached = await asyncio.to_thread(_load_cached_metadata, list(set(keys)))
+
+    # Un único análisis por clave, aunque el mismo texto aparezca varias veces
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+    pending = list(missing.items())
+    batches = [pending[i:i + GEMINI_BATCH_SIZE] for i in range(0, len(pending), max(1, GEMINI_BATCH_SIZE))]
+    results = await asyncio.gather(*(analyze_books_with_gemini([text for _, text in batch]) for batch in batches))
+
+    fresh = {}
+    for batch, metadata_list in zip(batches, results):
+        for (key, _), metadata in zip(batch, metadata_list):
+            cached[key] = metadata
+            if metadata != AI_ERROR_METADATA:
+                fresh[key] = metadata
+    if fresh:
+        await asyncio.to_thread(_store_cached_metadata, model_name, fresh)
+    return [dict(cached[key]) for key in keys]
+
+async def analyze_metadata(text: str) -> dict:
+    """Análisis de un único libro con caché persistente (ver `analyze_metadata_batch`)."""
+    return (await analyze_metadata_batch([text]))[0]
 
 # --- Configuración de la App FastAPI ---
 # Test comment
@@ -173,13 +196,22 @@ os.makedirs(BOOKS_DIR_FS, exist_ok=True)
 
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR_FS)), name="static")
 
+# Archivos efímeros de temp_books (conversiones y libros subidos solo para RAG)
+temp_books_store = temp_store.TempStore(str(TEMP_BOOKS_DIR_FS), index_path=str(base_dir / "temp_store_index.json"))
+
 # Cache headers for static files (covers and others)
 @app.middleware("http")
 async def add_cache_headers(request, call_next):
+    if request.url.path.startswith("/temp_books/") and request.url.path.rsplit("/", 1)[-1].startswith("."):
+        # Archivos ocultos (índices, temporales): nunca se sirven
+        return Response(status_code=404)
     response = await call_next(request)
     if request.url.path.startswith("/static/"):
         # Cache for 1 day
         response.headers["Cache-Control"] = "public, max-age=86400"
+    elif request.url.path.startswith("/temp_books/"):
+        # Una descarga cuenta como uso para la expulsión LRU del almacén temporal
+        temp_books_store.touch(request.url.path.rsplit("/", 1)[-1])
     return response
 
 app.mount("/temp_books", StaticFiles(directory=str(TEMP_BOOKS_DIR_FS)), name="temp_books")
@@ -201,6 +233,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Rangos y validación de las descargas (visor PDF) y cursor de /books/
+    expose_headers=["X-Next-Cursor", "ETag", "Accept-Ranges", "Content-Range", "Content-Length"],
 )
 
 def get_db():
@@ -210,16 +244,113 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Sesión de solo lectura (pool propio) para listados y búsquedas."""
+    db = database.ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Sesión asíncrona (aiosqlite) para los endpoints `async`: no bloquea el bucle de eventos."""
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """Sesión asíncrona de solo lectura."""
+    async with database.AsyncReadSessionLocal() as db:
+        yield db
+
+def check_library_etag(request: Request, response: Response, version: int) -> int:
+    """ETag de un listado según la versión de la biblioteca; 304 si el cliente ya lo tiene.
+
+    La versión se lee antes que los datos: si entre medias hay una escritura,
+    el ETag queda atrasado y el cliente solo vuelve a descargar de más.
+    Devuelve la versión, con la que `response_cache` descarta las respuestas antiguas.
+    """
+    tag = library_version.etag(version, request.url.path, sorted(request.query_params.multi_items()))
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if library_version.matches(request.headers.get("if-none-match"), tag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return version
+
+# Tamaño de los bloques al enviar archivos sin `pathsend` (el ASGI no envía el archivo por sí mismo)
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_KB", "1024")) * 1024
+# IDs máximos por petición a /books/batch
+BATCH_MAX_IDS = int(os.getenv("BOOKS_BATCH_MAX_IDS", "200"))
+_books_json = TypeAdapter(List[schemas.Book])
+_categories_json = TypeAdapter(List[schemas.CategoryCount])
+
+def parse_book_ids(ids: str) -> list[int]:
+    """Convierte `ids=3,1,2` en una lista de enteros (400 si alguno no es numérico)."""
+    try:
+        return [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="`ids` debe ser una lista de IDs numéricos separados por comas.")
+
+def cached_json(response: Response, key: tuple, version: int, build) -> Response:
+    """Respuesta JSON servida desde `response_cache`.
+
+    Si la clave no está en la versión `version` (la leída para el ETag),
+    `build()` devuelve (bytes JSON, cabeceras propias del recurso) y se guarda.
+    Las cabeceras ya puestas en `response` (ETag) se copian a la respuesta devuelta.
+    """
+    cached = response_cache.cache.get(key, version)
+    if cached is None:
+        body, headers = build()
+        response_cache.cache.put(key, body, headers, version)
+    else:
+        body, headers = cached
+    return Response(content=body, media_type="application/json", headers={**response.headers, **headers})
+
 # --- Rutas de la API ---
 
-async def background_index_book(book_id: int, file_path: str):
-    """Tarea en segundo plano para indexar un libro en RAG."""
+def index_book_content(book_id: int, file_path: str, force: bool = True, passages: list[dict] | None = None) -> int:
+    """Indexa el texto del libro por páginas/capítulos para `/books/search/content`.
+
+    Con `force=False` no hace nada si el libro ya estaba indexado. Si se pasan
+    `passages` (ver `ingest.extract_full_text`) no se vuelve a leer el archivo.
+    Devuelve el número de fragmentos.
+    """
+    db = database.SessionLocal()
+    try:
+        if not force and crud.has_book_passages(db, book_id):
+            return 0
+        return crud.replace_book_passages(db, book_id, passages if passages is not None else fulltext.iter_passages(file_path))
+    finally:
+        db.close()
+
+async def background_index_book(book_id: int, file_path: str, full_text=None):
+    """Tarea en segundo plano para indexar un libro: contenido (búsqueda de texto) y RAG.
+
+    `full_text` es la tarea de `ingest.extract_full_text` que arrancó la ingesta
+    (ver `ingest.run_pipeline`); sin ella el texto se lee aquí. En ambos casos
+    se lee una sola vez para las dos indexaciones.
+    """
+    data = await full_text if full_text is not None else await asyncio.to_thread(ingest.extract_full_text, file_path)
+    try:
+        await asyncio.to_thread(index_book_content, book_id, file_path, True, data["passages"])
+    except Exception as e:
+        print(f"Error al indexar el contenido de book_id={book_id}: {e}")
     try:
         from . import rag
-        await rag.process_book_for_rag(file_path, str(book_id))
+        await rag.process_book_for_rag(file_path, str(book_id), chunks=data["chunks"])
     except Exception as e:
         print(f"Error en indexación de fondo para book_id={book_id}: {e}")
 
+async def reindex_book(book_id: int, file_path: str, force: bool):
+    """(Re)indexa el contenido y RAG de un libro. Los errores se propagan.
+
+    Con `force` el texto se lee una sola vez para las dos indexaciones; sin él
+    cada una comprueba antes si ya estaba hecha y solo lee el archivo si no.
+    """
+    full_text = await asyncio.to_thread(ingest.extract_full_text, file_path) if force else {"passages": None, "chunks": None}
+    await asyncio.to_thread(index_book_content, book_id, file_path, force, full_text["passages"])
+    from . import rag
+    await rag.process_book_for_rag(file_path, str(book_id), force_reindex=force, chunks=full_text["chunks"])
+
 async def background_convert_and_index(book_id: int, original_path: str, db_session_factory):
     """Tarea compleja en segundo plano: convertir, analizar e indexar."""
     # Nota: Aquí necesitaríamos manejar nuestra propia sesión si quisiéramos actualizar la BD
@@ -227,12 +358,12 @@ async def background_convert_and_index(book_id: int, original_path: str, db_sess
     pass
 
 @app.post("/api/books/{book_id}/convert", response_model=schemas.Book)
-async def convert_book_to_pdf(book_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def convert_book_to_pdf(book_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """
     Convierte un libro EPUB existente a PDF y lo añade a la biblioteca como un nuevo libro.
     """
     # 1. Obtener el libro original
-    original_book = crud.get_book(db, book_id=book_id)
+    original_book = await crud_async.get_book(db, book_id=book_id)
     if not original_book:
         raise HTTPException(status_code=404, detail="Libro original no encontrado.")
 
@@ -240,22 +371,12 @@ async def convert_book_to_pdf(book_id: int, background_tasks: BackgroundTasks, d
     if not original_book.file_path.lower().endswith('.epub'):
         raise HTTPException(status_code=400, detail="La conversión solo es posible para libros en formato EPUB.")
 
-    # 3. Leer el contenido del archivo EPUB
+    # 3. Comprobar que el archivo EPUB existe
     abs_epub_path = get_safe_path(original_book.file_path)
-    try:
-        with open(abs_epub_path, "rb") as f:
-            epub_content = f.read()
-    except FileNotFoundError:
+    if not os.path.exists(abs_epub_path):
         raise HTTPException(status_code=404, detail="Archivo EPUB no encontrado en el disco.")
 
-    # 4. Convertir a PDF (Esto sigue siendo una tarea pesada, pero la mantenemos aquí para devolver el libro)
-    # En una versión futura podríamos devolver 202 Accepted y notificar por WebSocket.
-    try:
-        pdf_bytes = await asyncio.to_thread(utils.convert_epub_bytes_to_pdf_bytes, epub_content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error durante la conversión a PDF: {e}")
-
-    # 5. Guardar el nuevo archivo PDF
+    # 4. Elegir el nombre del nuevo archivo PDF
     base_filename = os.path.splitext(os.path.basename(original_book.file_path))[0]
     new_filename = f"{base_filename}.pdf"
     new_filepath_abs = os.path.join(str(BOOKS_DIR_FS), new_filename)
@@ -266,14 +387,22 @@ async def convert_book_to_pdf(book_id: int, background_tasks: BackgroundTasks, d
         new_filename = f"{base_filename}_{counter}.pdf"
         new_filepath_abs = os.path.join(str(BOOKS_DIR_FS), new_filename)
         counter += 1
-    
-    with open(new_filepath_abs, "wb") as f:
-        f.write(pdf_bytes)
+
+    # 5. Convertir a PDF en un proceso aparte (o reutilizar una conversión previa del mismo EPUB)
+    # (Sigue siendo una tarea pesada; en una versión futura podríamos devolver 202 Accepted).
+    try:
+        cached_pdf, report = await conversion_cache.get_or_convert(abs_epub_path, original_book.content_hash, runner=conversion_jobs.run_isolated)
+        if report:
+            print(conversion.format_report(report))
+        conversion_cache.copy_to(cached_pdf, new_filepath_abs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error durante la conversión a PDF: {e}")
 
     # 6. Procesar el nuevo PDF para añadirlo a la biblioteca (lógica de /upload-book)
+    book_data = None
     try:
-        book_data = process_pdf(new_filepath_abs, str(STATIC_COVERS_DIR_FS), STATIC_COVERS_URL_PREFIX)
-        gemini_result = await analyze_with_gemini(book_data["text"])
+        book_data = await ingest.run_pipeline(new_filepath_abs, str(STATIC_COVERS_DIR_FS), STATIC_COVERS_URL_PREFIX, analyze_metadata)
+        gemini_result = book_data["metadata"]
 
         title = gemini_result.get("title", "Desconocido")
         author = gemini_result.get("author", "Desconocido")
@@ -282,20 +411,27 @@ async def convert_book_to_pdf(book_id: int, background_tasks: BackgroundTasks, d
             os.remove(new_filepath_abs)
             raise HTTPException(status_code=422, detail="La IA no pudo identificar metadatos del PDF convertido.")
 
-        new_book = crud.create_book(
+        # El PDF puede ser un enlace duro a la caché de conversiones, cuyos aciertos cambian su mtime:
+        # el hash da un ETag de descarga estable
+        content_hash = await asyncio.to_thread(utils.file_sha256, new_filepath_abs)
+        new_book = await crud_async.create_book(
             db=db,
             title=title,
             author=author,
             category=gemini_result.get("category", original_book.category), # Usar categoría original como fallback
             cover_image_url=book_data.get("cover_image_url"),
-            file_path=get_relative_path(new_filepath_abs)
+            file_path=get_relative_path(new_filepath_abs),
+            content_hash=content_hash,
+            cover_placeholder=book_data.get("cover_placeholder")
         )
         
         # Disparar indexación RAG en segundo plano
-        background_tasks.add_task(background_index_book, new_book.id, new_filepath_abs)
+        background_tasks.add_task(background_index_book, new_book.id, new_filepath_abs, book_data["full_text"])
         
         return new_book
     except Exception as e:
+        if book_data is not None:
+            book_data["full_text"].cancel()
         # Si algo falla, limpiar el PDF creado
         if os.path.exists(new_filepath_abs):
             os.remove(new_filepath_abs)
@@ -303,85 +439,234 @@ async def convert_book_to_pdf(book_id: int, background_tasks: BackgroundTasks, d
         raise HTTPException(status_code=500, detail=f"Error al procesar el nuevo PDF: {e}")
 
 
-@app.post("/tools/convert-epub-to-pdf")
+@app.post("/tools/convert-epub-to-pdf", status_code=202)
 async def convert_epub_to_pdf_tool(file: UploadFile = File(...)):
     """
-    Convierte un archivo EPUB subido a PDF y devuelve un enlace de descarga temporal.
+    Encola la conversión a PDF de un archivo EPUB subido y devuelve el ID del trabajo.
+    El estado y el enlace de descarga se consultan en `/tools/convert-epub-to-pdf/{job_id}`.
     """
     if not file.filename.lower().endswith('.epub'):
         raise HTTPException(status_code=400, detail="El archivo debe ser un EPUB.")
 
-    try:
-        epub_content = await file.read()
-        pdf_bytes = await asyncio.to_thread(utils.convert_epub_bytes_to_pdf_bytes, epub_content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error durante la conversión: {e}")
-
-    # Guardar el PDF en un directorio temporal
-    base_filename = os.path.splitext(file.filename)[0]
+    # El PDF se genera directamente en el directorio temporal
+    base_filename = os.path.splitext(os.path.basename(file.filename))[0]
     # Usar un UUID para evitar colisiones y añadir seguridad
     unique_id = uuid.uuid4()
     new_filename = f"{base_filename}_{unique_id}.pdf"
     temp_pdf_path = os.path.join(str(TEMP_BOOKS_DIR_FS), new_filename)
+    temp_epub_path = os.path.join(str(TEMP_BOOKS_DIR_FS), f"{unique_id}.epub.upload")
 
-    with open(temp_pdf_path, "wb") as f:
-        f.write(pdf_bytes)
+    with open(temp_epub_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
 
-    # Devolver la URL para descargar el archivo
-    download_url = f"/temp_books/{new_filename}"
-    return {"download_url": download_url}
+    async def run(job):
+        try:
+            # Un EPUB ya convertido antes se sirve desde la caché sin volver a renderizar
+            cached_pdf, report = await conversion_cache.get_or_convert(
+                temp_epub_path, runner=lambda epub, pdf: conversion_jobs.run_isolated(epub, pdf, job)
+            )
+            if report:
+                print(conversion.format_report(report))
+            conversion_cache.copy_to(cached_pdf, temp_pdf_path)
+            await asyncio.to_thread(temp_books_store.register, temp_pdf_path)
+        finally:
+            if os.path.exists(temp_epub_path):
+                os.remove(temp_epub_path)
+        # Tiempos por capítulo (None si el PDF venía de la caché)
+        job["conversion"] = report
+        job["cached"] = report is None
+        job["download_url"] = f"/temp_books/{new_filename}"
+
+    try:
+        job = conversion_jobs.submit(run, file.filename)
+    except conversion_jobs.QueueFullError as e:
+        os.remove(temp_epub_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job["job_id"], "status": job["status"]}
+
+@app.get("/tools/convert-epub-to-pdf/{job_id}")
+async def get_conversion_job(job_id: str):
+    """Estado de un trabajo de conversión; incluye `download_url` cuando ha terminado."""
+    job = conversion_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo de conversión no encontrado.")
+    return conversion_jobs.public_view(job)
 
 
 @app.post("/upload-book/", response_model=schemas.Book)
-async def upload_book(background_tasks: BackgroundTasks, db: Session = Depends(get_db), book_file: UploadFile = File(...)):
+async def upload_book(background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db), book_file: UploadFile = File(...)):
     books_dir = str(BOOKS_DIR_FS)
     safe_name = os.path.basename(book_file.filename)
     file_path_abs = os.path.abspath(os.path.join(books_dir, safe_name))
 
-    if crud.get_book_by_path(db, file_path_abs) or crud.get_book_by_path(db, get_relative_path(file_path_abs)):
+    if await crud_async.get_book_by_path(db, file_path_abs) or await crud_async.get_book_by_path(db, get_relative_path(file_path_abs)):
         raise HTTPException(status_code=409, detail="Este libro ya ha sido añadido.")
 
     with open(file_path_abs, "wb") as buffer:
         shutil.copyfileobj(book_file.file, buffer)
 
-    file_ext = os.path.splitext(book_file.filename)[1].lower()
+    content_hash = await asyncio.to_thread(utils.file_sha256, file_path_abs)
+    if await crud_async.get_book_by_content_hash(db, content_hash):
+        os.remove(file_path_abs)
+        raise HTTPException(status_code=409, detail="Este libro ya ha sido añadido.")
+
+    # Extracto, IA y portada se ejecutan solapados (ver ingest.run_pipeline)
     try:
-        if file_ext == ".pdf":
-            book_data = process_pdf(file_path_abs, str(STATIC_COVERS_DIR_FS), STATIC_COVERS_URL_PREFIX)
-        elif file_ext == ".epub":
-            book_data = process_epub(file_path_abs, str(STATIC_COVERS_DIR_FS), STATIC_COVERS_URL_PREFIX)
-        else:
-            raise HTTPException(status_code=400, detail="Tipo de archivo no soportado.")
+        book_data = await ingest.run_pipeline(file_path_abs, str(STATIC_COVERS_DIR_FS), STATIC_COVERS_URL_PREFIX, analyze_metadata)
     except HTTPException as e:
         os.remove(file_path_abs) # Limpiar el archivo subido si el procesamiento falla
         raise e
 
-    gemini_result = await analyze_with_gemini(book_data["text"])
-    
+    gemini_result = book_data["metadata"]
+
     # --- Puerta de Calidad ---
     title = gemini_result.get("title", "Desconocido")
     author = gemini_result.get("author", "Desconocido")
 
     if title == "Desconocido" and author == "Desconocido":
+        book_data["full_text"].cancel()
         os.remove(file_path_abs) # Borrar el archivo que no se pudo analizar
         raise HTTPException(status_code=422, detail="La IA no pudo identificar el título ni el autor del libro. No se ha añadido.")
 
-    new_book = crud.create_book(
-        db=db, 
-        title=title, 
-        author=author, 
-        category=gemini_result.get("category", "Desconocido"), 
-        cover_image_url=book_data.get("cover_image_url"), 
-        file_path=get_relative_path(file_path_abs)
-    )
+    try:
+        new_book = await crud_async.create_book(
+            db=db, 
+            title=title, 
+            author=author, 
+            category=gemini_result.get("category", "Desconocido"), 
+            cover_image_url=book_data.get("cover_image_url"), 
+            file_path=get_relative_path(file_path_abs),
+            content_hash=content_hash,
+            cover_placeholder=book_data.get("cover_placeholder")
+        )
+    except BaseException:
+        book_data["full_text"].cancel()
+        raise
 
-    # Disparar indexación RAG en segundo plano
-    background_tasks.add_task(background_index_book, new_book.id, file_path_abs)
+    # El texto completo se sigue leyendo: la indexación recoge su resultado ya con el ID del libro
+    background_tasks.add_task(background_index_book, new_book.id, file_path_abs, book_data["full_text"])
 
     return new_book
 
+# --- Almacén temporal ---
+async def sweep_temp_books_periodically():
+    """Barre `temp_books` cada `TEMP_STORE_SWEEP_MINUTES` mientras la app está en marcha."""
+    while True:
+        try:
+            metrics = await asyncio.to_thread(temp_books_store.sweep)
+            if metrics["last_sweep_removed"]:
+                print(f"temp_books: {metrics['last_sweep_removed']} archivos borrados; quedan {metrics['entries']} "
+                      f"({metrics['bytes'] // (1024 * 1024)} MB)")
+        except Exception as e:
+            print(f"Error barriendo temp_books: {e}")
+        await asyncio.sleep(temp_store.SWEEP_INTERVAL_SECONDS)
+
+@app.on_event("startup")
+async def start_temp_books_sweeper():
+    app.state.temp_sweeper = asyncio.create_task(sweep_temp_books_periodically())
+
+@app.on_event("shutdown")
+async def stop_temp_books_sweeper():
+    task = getattr(app.state, "temp_sweeper", None)
+    if task:
+        task.cancel()
+
+# --- Mantenimiento de la base de datos ---
+async def optimize_database_periodically():
+    """`PRAGMA optimize` cada `SQLITE_OPTIMIZE_MINUTES` (la primera vez, al arrancar)."""
+    while True:
+        try:
+            await asyncio.to_thread(database.optimize)
+        except Exception as e:
+            print(f"Error optimizando la base de datos: {e}")
+        await asyncio.sleep(database.OPTIMIZE_INTERVAL_SECONDS)
+
+@app.on_event("startup")
+async def start_database_optimizer():
+    if database.OPTIMIZE_INTERVAL_SECONDS > 0:
+        app.state.db_optimizer = asyncio.create_task(optimize_database_periodically())
+
+@app.on_event("shutdown")
+async def stop_database_optimizer():
+    task = getattr(app.state, "db_optimizer", None)
+    if task:
+        task.cancel()
+
+@app.get("/admin/temp-store")
+async def get_temp_store_metrics():
+    """Ocupación y contadores del almacén temporal (`temp_books`)."""
+    return temp_books_store.metrics()
+
+@app.get("/admin/response-cache")
+async def get_response_cache_metrics():
+    """Aciertos, fallos, expulsiones y ocupación de la caché de respuestas de los listados."""
+    return response_cache.cache.metrics()
+
+# --- Importación masiva ---
+_import_jobs: dict[str, dict] = {}
+
+async def background_bulk_import(job_id: str, request: schemas.BulkImportRequest):
+    """Tarea en segundo plano que ejecuta una importación masiva y guarda su progreso."""
+    from . import bulk_import
+    progress = _import_jobs[job_id]
+    try:
+        await bulk_import.import_directory(
+            request.directory,
+            str(BOOKS_DIR_FS),
+            str(STATIC_COVERS_DIR_FS),
+            STATIC_COVERS_URL_PREFIX,
+            analyze_metadata,
+            get_relative_path,
+            get_safe_path,
+            workers=request.workers,
+            batch_size=request.batch_size,
+            llm_concurrency=request.llm_concurrency,
+            analyze_batch=analyze_metadata_batch,
+            llm_batch_size=request.llm_batch_size,
+            progress=progress,
+        )
+        progress["status"] = "completed"
+    except Exception as e:
+        print(f"Error en importación masiva {job_id}: {e}")
+        progress["status"] = "failed"
+        progress["error"] = str(e)
+
+def resolve_import_directory(directory: str) -> str:
+    """Ruta real de un directorio a importar, que debe estar dentro de `BULK_IMPORT_ROOT`.
+
+    Las rutas relativas se toman desde esa raíz. Sin raíz configurada la
+    importación por API está desactivada (403); la CLI no tiene esta restricción.
+    """
+    root = os.getenv("BULK_IMPORT_ROOT")
+    if not root:
+        raise HTTPException(status_code=403, detail="La importación por API está desactivada: configura BULK_IMPORT_ROOT.")
+    root = os.path.realpath(root)
+    target = os.path.realpath(os.path.join(root, directory))
+    if os.path.commonpath([root, target]) != root:
+        raise HTTPException(status_code=403, detail="El directorio debe estar dentro de BULK_IMPORT_ROOT.")
+    if not os.path.isdir(target):
+        raise HTTPException(status_code=400, detail="El directorio indicado no existe en el servidor.")
+    return target
+
+@app.post("/admin/import")
+async def start_bulk_import(request: schemas.BulkImportRequest, background_tasks: BackgroundTasks):
+    """Inicia la importación masiva de un directorio del servidor (reanudable)."""
+    request.directory = resolve_import_directory(request.directory)
+    job_id = str(uuid.uuid4())
+    _import_jobs[job_id] = {"status": "running"}
+    background_tasks.add_task(background_bulk_import, job_id, request)
+    return {"job_id": job_id, "status": "running"}
+
+@app.get("/admin/import/{job_id}")
+def get_bulk_import_status(job_id: str):
+    """Progreso e informe de rendimiento (libros/minuto) de una importación masiva."""
+    job = _import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Importación no encontrada.")
+    return {"job_id": job_id, **job}
+
 @app.get("/api/books/search/semantic", response_model=List[schemas.Book])
-async def semantic_search(q: str, db: Session = Depends(get_db)):
+async def semantic_search(q: str, db: AsyncSession = Depends(get_async_read_db)):
     """Busca libros usando similitud semántica (IA) a través de RAG."""
     if not AI_ENABLED:
         raise HTTPException(status_code=400, detail="La búsqueda semántica requiere que la IA esté habilitada.")
@@ -390,32 +675,42 @@ async def semantic_search(q: str, db: Session = Depends(get_db)):
         from . import rag
         semantic_results = await rag.query_semantic_books(q)
         
-        # Obtener los objetos Book completos de la DB
-        books_map = {}
-        for res in semantic_results:
-            book = crud.get_book(db, book_id=res["book_id"])
-            if book:
-                books_map[book.id] = book
-        
-        # Mantener el orden de relevancia devuelto por RAG
-        ordered_books = []
-        for res in semantic_results:
-            if res["book_id"] in books_map:
-                ordered_books.append(books_map[res["book_id"]])
-                
-        return ordered_books
+        # Libros completos en una sola consulta, en el orden de relevancia devuelto por RAG
+        return await crud_async.get_books_by_ids(db, [res["book_id"] for res in semantic_results])
     except Exception as e:
         print(f"Error en búsqueda semántica: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/books/", response_model=List[schemas.Book])
-def read_books(category: str | None = None, search: str | None = None, author: str | None = None, db: Session = Depends(get_db), skip: int = 0, limit: int = 20):
-    return crud.get_books(db, category=category, search=search, author=author, skip=skip, limit=limit)
+def read_books(request: Request, response: Response, category: str | None = None, search: str | None = None, author: str | None = None, db: Session = Depends(get_read_db), skip: int = 0, limit: int = 20, sort: str | None = None, cursor: str | None = None):
+    """Lista libros con filtros. `sort`: recent (por defecto), title o author; las búsquedas, por relevancia.
+
+    La paginación es por cursor: si hay más resultados, la cabecera `X-Next-Cursor`
+    trae el valor de `cursor` para pedir la página siguiente. `skip` se mantiene
+    para clientes antiguos (paginación por desplazamiento).
+    """
+    version = check_library_etag(request, response, crud.get_library_version(db))
+    category = category or None
+    search, author = response_cache.normalize_text(search), response_cache.normalize_text(author)
+
+    def build():
+        try:
+            if skip and not cursor:
+                books, next_cursor = crud.get_books(db, category=category, search=search, author=author, skip=skip, limit=limit, sort=sort), None
+            else:
+                books, next_cursor = crud.get_books_page(db, category=category, search=search, author=author, sort=sort, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        body = _books_json.dump_json(_books_json.validate_python(books, from_attributes=True))
+        return body, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+    key = response_cache.make_key("books", category=category, search=search, author=author, skip=skip, limit=limit, sort=sort or None, cursor=cursor or None)
+    return cached_json(response, key, version, build)
 
 @app.put("/books/{book_id}", response_model=schemas.Book)
 async def update_book_details(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     title: str = Form(...),
     author: str = Form(...),
     cover_image: Optional[UploadFile] = File(None)
@@ -423,11 +718,12 @@ async def update_book_details(
     """
     Actualiza los detalles de un libro, incluyendo título, autor y portada.
     """
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    db_book = await crud_async.get_book(db, book_id=book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
 
     new_cover_path = db_book.cover_image_url
+    new_placeholder = None
 
     if cover_image:
         # Hay una nueva imagen, hay que guardarla
@@ -445,13 +741,16 @@ async def update_book_details(
             shutil.copyfileobj(cover_image.file, buffer)
         
         new_cover_path = f"{STATIC_COVERS_URL_PREFIX}/{new_cover_filename}"
+        from . import covers
+        new_placeholder = covers.make_placeholder(str(new_cover_full_path))
 
-    updated_book = crud.update_book(
+    updated_book = await crud_async.update_book(
         db=db,
         book_id=book_id,
         title=title,
         author=author,
-        cover_image_url=new_cover_path
+        cover_image_url=new_cover_path,
+        cover_placeholder=new_placeholder
     )
 
     if not updated_book:
@@ -461,19 +760,77 @@ async def update_book_details(
     return updated_book
 
 @app.get("/books/count", response_model=int)
-def get_books_count(db: Session = Depends(get_db)):
+def get_books_count(request: Request, response: Response, db: Session = Depends(get_read_db)):
     """Obtiene el número total de libros en la biblioteca."""
-    return crud.get_books_count(db)
+    version = check_library_etag(request, response, crud.get_library_version(db))
+    return cached_json(response, response_cache.make_key("count"), version, lambda: (json.dumps(crud.get_books_count(db)).encode(), {}))
+
+@app.get("/books/batch", response_model=List[schemas.Book])
+def read_books_batch(ids: str, db: Session = Depends(get_read_db)):
+    """Varios libros por ID (`ids=3,1,2`) en una sola consulta, en el orden pedido.
+
+    Los IDs que no existen se omiten.
+    """
+    book_ids = parse_book_ids(ids)
+    if len(book_ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Como mucho {BATCH_MAX_IDS} IDs por petición.")
+    return crud.get_books_by_ids(db, book_ids)
 
 @app.get("/books/search/", response_model=List[schemas.Book])
-def search_books(title: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def search_books(response: Response, title: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """Busca libros por un título parcial, con opciones de paginación."""
-    books = crud.get_books_by_partial_title(db, title=title, skip=skip, limit=limit)
-    return books
+    title = response_cache.normalize_text(title) or ""
+    version = crud.get_library_version(db)
 
-@app.get("/categories/", response_model=List[str])
-def read_categories(db: Session = Depends(get_db)):
-    return crud.get_categories(db)
+    def build():
+        books = crud.get_books_by_partial_title(db, title=title, skip=skip, limit=limit)
+        return _books_json.dump_json(_books_json.validate_python(books, from_attributes=True)), {}
+
+    key = response_cache.make_key("search", title=title, skip=skip, limit=limit)
+    return cached_json(response, key, version, build)
+
+@app.get("/books/search/content", response_model=List[schemas.ContentSearchHit])
+def search_books_content(q: str, book_id: int | None = None, skip: int = 0, limit: int = 20, db: Session = Depends(get_read_db)):
+    """Busca un texto dentro de los libros (toda la biblioteca o uno solo) sin usar la IA.
+
+    Devuelve las coincidencias más relevantes con su página (o capítulo, en EPUB)
+    y un fragmento con los términos entre `<mark>`. Las frases entre comillas se buscan literalmente.
+    """
+    try:
+        return crud.search_book_passages(db, q, book_id=book_id, skip=skip, limit=min(limit, 100))
+    except Exception as e:
+        print(f"Error en la búsqueda de contenido: {e}")
+        raise HTTPException(status_code=500, detail=f"Error en la búsqueda de contenido: {e}")
+
+async def background_index_library_content(force: bool):
+    """Indexa el contenido de los libros que aún no lo tienen (o de todos, con `force`)."""
+    async with database.AsyncReadSessionLocal() as db:
+        books = [(b.id, b.file_path) for b in await crud_async.get_all_books(db)]
+    indexed = 0
+    for book_id, file_path in books:
+        try:
+            if await asyncio.to_thread(index_book_content, book_id, get_safe_path(file_path), force):
+                indexed += 1
+        except Exception as e:
+            print(f"Error al indexar el contenido de book_id={book_id}: {e}")
+    print(f"Contenido indexado: {indexed} libros")
+
+@app.post("/admin/content-index")
+async def rebuild_content_index(background_tasks: BackgroundTasks, force: bool = False, db: AsyncSession = Depends(get_async_read_db)):
+    """Indexa en segundo plano el contenido de la biblioteca para la búsqueda de texto."""
+    background_tasks.add_task(background_index_library_content, force)
+    return {"message": "Indexado del contenido iniciado en segundo plano.", "total_books": await crud_async.get_books_count(db), "force": force}
+
+@app.get("/categories/", response_model=List[schemas.CategoryCount])
+def read_categories(request: Request, response: Response, db: Session = Depends(get_read_db)):
+    """Categorías con el número de libros de cada una."""
+    version = check_library_etag(request, response, crud.get_library_version(db))
+
+    def build():
+        categories = crud.get_categories_with_counts(db)
+        return _categories_json.dump_json(_categories_json.validate_python(categories)), {}
+
+    return cached_json(response, response_cache.make_key("categories"), version, build)
 
 @app.delete("/books/{book_id}")
 def delete_single_book(book_id: int, db: Session = Depends(get_db)):
@@ -490,45 +847,264 @@ def delete_single_book(book_id: int, db: Session = Depends(get_db)):
 
 @app.delete("/categories/{category_name}")
 def delete_category_and_books(category_name: str, db: Session = Depends(get_db)):
-    # Obtener IDs antes de borrar para limpiar RAG
-    ids = [str(row.id) for row in db.query(models.Book).filter(models.Book.category == category_name).all()]
-    deleted_count = crud.delete_books_by_category(db, category=category_name)
-    for bid in ids:
-        try:
-            rag.delete_book_from_rag(bid)
-        except Exception as e:
-            print(f"Advertencia: fallo al limpiar RAG para book_id={bid}: {e}")
+    """Borra la categoría y sus libros: filas en una sentencia, vectores RAG de una vez y archivos en segundo plano."""
+    deleted_count = bulk_delete.delete_books(db, category=category_name)["deleted"]
     if deleted_count == 0:
         raise HTTPException(status_code=404, detail=f"Categoría '{category_name}' no encontrada o ya está vacía.")
     return {"message": f"Categoría '{category_name}' y sus {deleted_count} libros han sido eliminados."}
 
-@app.get("/books/download/{book_id}")
-def download_book(book_id: int, db: Session = Depends(get_db)):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+@app.delete("/books")
+def delete_books(ids: str, db: Session = Depends(get_db)):
+    """Borra varios libros (`ids=1,2,3`) con sus vectores RAG; los archivos se borran en segundo plano."""
+    book_ids = parse_book_ids(ids)
+    result = bulk_delete.delete_books(db, book_ids=book_ids)
+    found = set(result["ids"])
+    return {**result, "not_found": [book_id for book_id in dict.fromkeys(book_ids) if book_id not in found]}
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Petición condicional: `If-None-Match` (prioritaria) o `If-Modified-Since`."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return library_version.matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@app.api_route("/books/download/{book_id}", methods=["GET", "HEAD"])
+def download_book(book_id: int, request: Request, db: Session = Depends(get_read_db)):
+    """Descarga (o abre, si es PDF) el archivo de un libro.
+
+    Admite peticiones por rangos (`Range` -> 206, con `If-Range`) para que el
+    visor cargue el PDF por partes, y peticiones condicionales: el ETag fuerte
+    es el SHA-256 del archivo y, si el cliente ya lo tiene, la respuesta es
+    304 sin cuerpo. Si el servidor ASGI admite `http.response.pathsend`, es él
+    quien envía el archivo sin copiarlo a Python.
+    """
+    book = crud.get_book(db, book_id=book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Libro no encontrado.")
     
     abs_file_path = get_safe_path(book.file_path)
-    if not os.path.exists(abs_file_path):
+    try:
+        stat = os.stat(abs_file_path)
+    except OSError:
         raise HTTPException(status_code=404, detail="Archivo no encontrado en el disco.")
 
     file_ext = os.path.splitext(abs_file_path)[1].lower()
     filename = os.path.basename(abs_file_path)
-    
-    if file_ext == ".pdf":
-        return FileResponse(
-            path=abs_file_path,
-            filename=filename,
-            media_type='application/pdf',
-            content_disposition_type='inline'
-        )
-    else: # Para EPUB y otros tipos de archivo
-        return FileResponse(
-            path=abs_file_path,
-            filename=filename,
-            media_type='application/epub+zip',
-            content_disposition_type='attachment'
-        )
+    headers = {
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        # Se guarda en caché pero se revalida en cada apertura (304 si no ha cambiado)
+        "Cache-Control": "private, no-cache",
+    }
+    # Libros anteriores al hash de contenido: tamaño y fecha del archivo
+    headers["ETag"] = f'"{book.content_hash}"' if book.content_hash else f'"{stat.st_size}-{int(stat.st_mtime)}"'
+    if _not_modified(request, headers["ETag"], stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    response = FileResponse(
+        path=abs_file_path,
+        filename=filename,
+        stat_result=stat,
+        headers=headers,
+        media_type='application/pdf' if file_ext == ".pdf" else 'application/epub+zip',
+        # Los PDF se abren en el navegador; EPUB y otros tipos, como descarga
+        content_disposition_type='inline' if file_ext == ".pdf" else 'attachment',
+    )
+    response.chunk_size = DOWNLOAD_CHUNK_BYTES
+    return response
+
+@app.get("/covers/{book_id}/{variant}")
+def get_cover_variant(book_id: int, variant: str, db: Session = Depends(get_read_db)):
+    """Sirve una variante de portada (`{hash}-{ancho}.{webp|jpg}`), generándola la primera vez."""
+    from . import covers
+    parsed = covers.parse_variant_name(variant)
+    if not parsed:
+        raise HTTPException(status_code=404, detail="Variante de portada no válida.")
+    book = crud.get_book(db, book_id=book_id)
+    if not book or not book.cover_image_url:
+        raise HTTPException(status_code=404, detail="Portada no encontrada.")
+    result = covers.get_or_create_variant(book.cover_image_url, *parsed)
+    if not result:
+        # El hash no coincide con la portada actual (p.ej. se ha cambiado)
+        raise HTTPException(status_code=404, detail="Portada no encontrada.")
+    path, media_type = result
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": covers.IMMUTABLE_CACHE_CONTROL})
+
+def _book_file_for_reading(db: Session, book_id: int, ext: str, detail: str) -> tuple[str, str, os.stat_result]:
+    """Ruta, hash y stat del archivo de un libro con extensión `ext` (404, o 400 con `detail`)."""
+    book = crud.get_book(db, book_id=book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Libro no encontrado.")
+    abs_file_path = get_safe_path(book.file_path)
+    if os.path.splitext(abs_file_path)[1].lower() != ext:
+        raise HTTPException(status_code=400, detail=detail)
+    try:
+        stat = os.stat(abs_file_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado en el disco.")
+    digest = book.content_hash or f"s{stat.st_size}-{int(stat.st_mtime)}"
+    return abs_file_path, digest, stat
+
+def _pdf_for_pages(db: Session, book_id: int) -> tuple[str, str, os.stat_result]:
+    return _book_file_for_reading(db, book_id, ".pdf", "Solo los libros en PDF se pueden leer por páginas.")
+
+def _check_page(pdf_path: str, page: int) -> int:
+    from . import page_render
+    try:
+        total = page_render.page_count(pdf_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"No se pudo abrir el PDF: {e}")
+    if not 1 <= page <= total:
+        raise HTTPException(status_code=404, detail=f"Página fuera de rango (1-{total}).")
+    return total
+
+@app.get("/books/{book_id}/pages")
+def get_book_pages(book_id: int, db: Session = Depends(get_read_db)):
+    """Número de páginas de un PDF, para paginar con la API de páginas sin descargarlo."""
+    from . import page_render
+    abs_file_path, _digest, _stat = _pdf_for_pages(db, book_id)
+    try:
+        total = page_render.page_count(abs_file_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"No se pudo abrir el PDF: {e}")
+    return {"book_id": book_id, "page_count": total}
+
+@app.get("/books/{book_id}/pages/{page}/image")
+def get_book_page_image(book_id: int, page: int, request: Request, width: int | None = None, db: Session = Depends(get_read_db)):
+    """Una página del PDF (1..n) renderizada en WebP al ancho pedido.
+
+    El ancho se ajusta a los límites y pasos de `page_render`. Las páginas
+    salen de la caché en disco y, al servir una, se prerenderizan las vecinas.
+    """
+    from . import page_render
+    abs_file_path, digest, stat = _pdf_for_pages(db, book_id)
+    total = _check_page(abs_file_path, page)
+    width = page_render.normalize_width(width)
+    headers = {"ETag": f'"{digest}-p{page}-w{width}"', "Cache-Control": "private, no-cache"}
+    if _not_modified(request, headers["ETag"], stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    try:
+        path = page_render.render_page(abs_file_path, digest, page, width)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al renderizar la página: {e}")
+    page_render.prefetch_neighbors(abs_file_path, digest, page, width, total)
+    return FileResponse(path, media_type="image/webp", headers=headers)
+
+@app.get("/books/{book_id}/pages/{page}/text")
+def get_book_page_text(book_id: int, page: int, request: Request, db: Session = Depends(get_read_db)):
+    """Capa de texto de una página: texto plano y palabras con su caja (en puntos PDF)."""
+    from . import page_render
+    abs_file_path, digest, stat = _pdf_for_pages(db, book_id)
+    _check_page(abs_file_path, page)
+    headers = {"ETag": f'"{digest}-p{page}-text"', "Cache-Control": "private, no-cache"}
+    if _not_modified(request, headers["ETag"], stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    try:
+        layer = page_render.page_text(abs_file_path, page)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al extraer el texto de la página: {e}")
+    return JSONResponse(layer, headers=headers)
+
+# El contenido de un EPUB no es de confianza: si se abre directamente desde la
+# API (XHTML o SVG) no puede ejecutar scripts en este origen
+EPUB_CONTENT_HEADERS = {
+    "Content-Security-Policy": "sandbox; script-src 'none'; object-src 'none'",
+    "X-Content-Type-Options": "nosniff",
+}
+
+def _open_epub_for_reading(db: Session, book_id: int, request: Request, suffix: str):
+    """Abre el EPUB de un libro para la API de capítulos.
+
+    Devuelve (libro abierto, cabeceras con el ETag de `suffix`) o lanza una
+    HTTPException: 304 si el cliente ya tiene esa respuesta.
+    """
+    from . import epub_engine
+    abs_file_path, digest, stat = _book_file_for_reading(db, book_id, ".epub", "Solo los libros en EPUB se pueden leer por capítulos.")
+    headers = {"ETag": f'"{digest}-{suffix}"', "Cache-Control": "private, no-cache"}
+    if _not_modified(request, headers["ETag"], stat.st_mtime):
+        raise HTTPException(status_code=304, headers=headers)
+    try:
+        return epub_engine.open_epub(abs_file_path), headers
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"No se pudo abrir el EPUB: {e}")
+
+def _epub_toc_entries(entries: list[dict], chapters: dict[str, int]) -> list[dict]:
+    return [
+        {
+            "title": entry["title"],
+            # Número de capítulo (1..n) del documento al que apunta, o None si no está en el spine
+            "chapter": chapters.get(entry["path"]),
+            "fragment": entry["fragment"],
+            "children": _epub_toc_entries(entry["children"], chapters),
+        }
+        for entry in entries
+    ]
+
+@app.get("/books/{book_id}/epub/toc")
+def get_epub_toc(book_id: int, request: Request, db: Session = Depends(get_read_db)):
+    """Índice y lista de capítulos (documentos del spine) de un EPUB, leídos del zip."""
+    book, headers = _open_epub_for_reading(db, book_id, request, "toc")
+    with book:
+        spine = book.spine_items()
+        chapters = {item["path"]: n for n, item in enumerate(spine, start=1)}
+        body = {
+            "book_id": book_id,
+            "title": book.metadata["title"][0]["value"] if book.metadata["title"] else None,
+            "chapter_count": len(spine),
+            "chapters": [{"chapter": n, "id": item["id"], "href": item["href"]} for n, item in enumerate(spine, start=1)],
+            "toc": _epub_toc_entries(book.toc(), chapters),
+        }
+    return JSONResponse(body, headers=headers)
+
+@app.get("/books/{book_id}/epub/chapters/{chapter}")
+def get_epub_chapter(book_id: int, chapter: int, request: Request, db: Session = Depends(get_read_db)):
+    """Un capítulo (documento del spine, 1..n) del EPUB, sin extraer el libro.
+
+    Los enlaces a otros capítulos y a imágenes, CSS o fuentes se reescriben a
+    URLs absolutas de esta API; las rutas relativas dentro de los CSS siguen
+    funcionando porque los recursos se sirven con su ruta del zip.
+    """
+    from urllib.parse import quote
+    book, headers = _open_epub_for_reading(db, book_id, request, f"c{chapter}")
+    with book:
+        spine = book.spine_items()
+        if not 1 <= chapter <= len(spine):
+            raise HTTPException(status_code=404, detail=f"Capítulo fuera de rango (1-{len(spine)}).")
+        chapters = {item["path"]: n for n, item in enumerate(spine, start=1)}
+        resources = {item["path"] for item in book.manifest.values()}
+        prefix = f"{str(request.base_url).rstrip('/')}/books/{book_id}/epub"
+
+        def rewrite(path: str, fragment: str | None) -> str | None:
+            suffix = f"#{fragment}" if fragment else ""
+            if path in chapters:
+                return f"{prefix}/chapters/{chapters[path]}{suffix}"
+            if path in resources:
+                return f"{prefix}/resources/{quote(path)}{suffix}"
+            return None
+
+        item = spine[chapter - 1]
+        try:
+            content = book.rewrite_document(item["path"], rewrite)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al leer el capítulo: {e}")
+    return Response(content, media_type=item["media_type"], headers={**headers, **EPUB_CONTENT_HEADERS})
+
+@app.get("/books/{book_id}/epub/resources/{path:path}")
+def get_epub_resource(book_id: int, path: str, request: Request, db: Session = Depends(get_read_db)):
+    """Un recurso del manifiesto del EPUB (imagen, CSS, fuente...) leído directamente del zip."""
+    book, headers = _open_epub_for_reading(db, book_id, request, f"r-{hashlib.sha1(path.encode()).hexdigest()[:12]}")
+    with book:
+        # Solo recursos declarados en el manifiesto, nunca rutas arbitrarias del zip
+        item = next((i for i in book.manifest.values() if i["path"] == path and book.has(path)), None)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Recurso no encontrado en el EPUB.")
+        content = book.read(path)
+    return Response(content, media_type=item["media_type"] or "application/octet-stream", headers={**headers, **EPUB_CONTENT_HEADERS})
 
 @app.post("/rag/upload-book/", response_model=schemas.RagUploadResponse)
 async def upload_book_for_rag(file: UploadFile = File(...)):
@@ -536,6 +1112,8 @@ async def upload_book_for_rag(file: UploadFile = File(...)):
     file_location = os.path.join(str(TEMP_BOOKS_DIR_FS), f"{book_id}_{file.filename}")
     with open(file_location, "wb") as f:
         f.write(await file.read())
+    # El archivo y sus vectores se borran al caducar (ver temp_store)
+    await asyncio.to_thread(temp_books_store.register, file_location, rag_book_id=book_id)
     
     try:
         from . import rag
@@ -546,18 +1124,18 @@ async def upload_book_for_rag(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Error al procesar el libro para RAG: {e}")
 
 @app.post("/rag/query/", response_model=schemas.RagQueryResponse)
-async def query_rag_endpoint(query_data: schemas.RagQuery, db: Session = Depends(get_db)):
+async def query_rag_endpoint(query_data: schemas.RagQuery, db: AsyncSession = Depends(get_async_read_db)):
     try:
         mode = query_data.mode or "balanced"
         # Metadatos del libro
-        book = db.query(models.Book).filter(models.Book.id == int(query_data.book_id)).first()
+        book = await crud_async.get_book(db, book_id=int(query_data.book_id))
         metadata = None
         library_ctx = None
         if book:
             metadata = {"title": book.title, "author": book.author, "category": book.category}
             if mode != "strict":
                 # Otras obras del mismo autor en la biblioteca
-                others = [b.title for b in db.query(models.Book).filter(models.Book.author == book.author, models.Book.id != book.id).limit(50).all()]
+                others = [b.title for b in await crud_async.get_books_by_author(db, book.author_id, book.author, exclude_book_id=book.id)]
                 library_ctx = {"author_other_books": others}
         response_text = await rag.query_rag(query_data.query, query_data.book_id, mode=mode, metadata=metadata, library=library_ctx)
         return {"response": response_text}
@@ -566,12 +1144,12 @@ async def query_rag_endpoint(query_data: schemas.RagQuery, db: Session = Depends
 
 
 @app.post("/rag/index/{book_id}")
-async def index_existing_book_for_rag(book_id: int, force: bool = False, db: Session = Depends(get_db)):
+async def index_existing_book_for_rag(book_id: int, force: bool = False, db: AsyncSession = Depends(get_async_read_db)):
     """Indexa en RAG un libro ya existente en BD usando su file_path.
 
     Usa el ID de BD como book_id en RAG. Si `force` es True, reindexa (borra y vuelve a indexar).
     """
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    book = await crud_async.get_book(db, book_id=book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Libro no encontrado.")
     
@@ -579,8 +1157,7 @@ async def index_existing_book_for_rag(book_id: int, force: bool = False, db: Ses
     if not os.path.exists(abs_file_path):
         raise HTTPException(status_code=404, detail="Archivo no encontrado en el disco.")
     try:
-        from . import rag
-        await rag.process_book_for_rag(abs_file_path, str(book.id), force_reindex=force)
+        await reindex_book(book.id, abs_file_path, force)
         return {"message": "Libro indexado en RAG", "book_id": str(book.id), "force": force}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al indexar en RAG: {e}")
@@ -598,8 +1175,9 @@ def rag_status(book_id: int):
 
 
 @app.get("/rag/stats")
-async def get_rag_stats():
+async def get_rag_stats(request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
     """Obtiene estadísticas del índice RAG."""
+    check_library_etag(request, response, await crud_async.get_rag_version(db))
     try:
         from . import rag
         rag._ensure_init()
@@ -609,41 +1187,39 @@ async def get_rag_stats():
         return {"total_documents": 0, "error": str(e)}
 
 @app.post("/rag/reindex/category/{category_name}")
-async def rag_reindex_category(category_name: str, force: bool = True, db: Session = Depends(get_db)):
+async def rag_reindex_category(category_name: str, force: bool = True, db: AsyncSession = Depends(get_async_read_db)):
     """(Re)indexa todos los libros de una categoría en RAG."""
-    books = db.query(models.Book).filter(models.Book.category == category_name).all()
+    books = await crud_async.get_books_by_category(db, category_name)
     if not books:
         raise HTTPException(status_code=404, detail=f"Categoría '{category_name}' no encontrada o sin libros.")
     processed, failed = 0, []
     for b in books:
         try:
-            from . import rag
             abs_file_path = get_safe_path(b.file_path)
-            await rag.process_book_for_rag(abs_file_path, str(b.id), force_reindex=force)
+            await reindex_book(b.id, abs_file_path, force)
             processed += 1
         except Exception as e:
             failed.append({"book_id": b.id, "error": str(e)})
     return {"category": category_name, "processed": processed, "failed": failed, "force": force}
 
 
-async def background_reindex_all(force: bool, db_session: Session):
+async def background_reindex_all(force: bool):
     """Tarea en segundo plano para reindexar toda la biblioteca."""
-    books = db_session.query(models.Book).all()
-    from . import rag
+    # Sesión propia: la de la petición ya está cerrada cuando se ejecuta la tarea
+    async with database.AsyncReadSessionLocal() as db:
+        books = await crud_async.get_all_books(db)
     for b in books:
         try:
             abs_file_path = get_safe_path(b.file_path)
-            await rag.process_book_for_rag(abs_file_path, str(b.id), force_reindex=force)
+            await reindex_book(b.id, abs_file_path, force)
         except Exception as e:
             print(f"RAG: Fallo al reindexar libro {b.id}: {e}")
 
 @app.post("/rag/reindex/all")
-async def rag_reindex_all(background_tasks: BackgroundTasks, force: bool = True, db: Session = Depends(get_db)):
+async def rag_reindex_all(background_tasks: BackgroundTasks, force: bool = True, db: AsyncSession = Depends(get_async_read_db)):
     """(Re)indexa todos los libros de la biblioteca en RAG (en segundo plano)."""
-    # Necesitamos una sesión de DB que no se cierre al terminar la petición
-    # Pero FastAPI.BackgroundTasks maneja bien la inyección si pasamos el objeto
-    background_tasks.add_task(background_reindex_all, force, db)
-    return {"message": "Iniciado proceso de reindexado masivo en segundo plano.", "total_books": db.query(models.Book).count()}
+    background_tasks.add_task(background_reindex_all, force)
+    return {"message": "Iniciado proceso de reindexado masivo en segundo plano.", "total_books": await crud_async.get_books_count(db)}
 
 
 @app.get("/rag/estimate/book/{book_id}")
@@ -1,10 +1,38 @@
 # Final test comment to trigger workflow
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, event, text
 from .database import Base
+from . import catalog, fulltext, library_version
+
+class Category(Base):
+    """Categoría con su número de libros (mantenido por triggers, ver `catalog`)."""
+    __tablename__ = "categories"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    book_count = Column(Integer, nullable=False, default=0)
+
+class Author(Base):
+    """Autor con su número de libros (mantenido por triggers, ver `catalog`)."""
+    __tablename__ = "authors"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    book_count = Column(Integer, nullable=False, default=0)
 
 class Book(Base):
     __tablename__ = "books"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Orden por título/autor con paginación por clave: NULL cuenta como '' (ver crud.get_books_page).
+        # SQLite añade el rowid a cada índice, así que (expresión, id) no necesita un índice compuesto.
+        Index("ix_books_title_sort", text("coalesce(title, '')")),
+        Index("ix_books_author_sort", text("coalesce(author, '')")),
+        # Claves ajenas a categories/authors
+        Index("ix_books_category_fk", "category_id"),
+        Index("ix_books_author_fk", "author_id"),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
@@ -12,3 +40,51 @@ class Book(Base):
     category = Column(String, index=True)
     cover_image_url = Column(String, nullable=True)
     file_path = Column(String, unique=True) # Ruta al archivo original
+    content_hash = Column(String, nullable=True, index=True) # SHA-256 del archivo (deduplicación)
+    cover_placeholder = Column(String, nullable=True) # Portada diminuta en base64 (LQIP)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True) # Rellenado por trigger
+    author_id = Column(Integer, ForeignKey("authors.id"), nullable=True) # Rellenado por trigger
+
+    @property
+    def cover_variants(self) -> list[dict]:
+        """Variantes (anchos/formatos) de la portada para construir un `srcset`."""
+        from .covers import cover_variants
+        return cover_variants(self.id, self.cover_image_url)
+
+# Índice FTS5 (título/autor/categoría), triggers de categorías/autores y de la versión, creados junto a la tabla `books`
+event.listen(Book.__table__, "after_create", fulltext.on_books_created)
+event.listen(Book.__table__, "after_create", catalog.on_books_created)
+event.listen(Book.__table__, "after_create", library_version.on_books_created)
+
+class BookPassage(Base):
+    """Fragmento del texto de un libro para la búsqueda en el contenido (ver `fulltext`)."""
+    __tablename__ = "book_passages"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), index=True)
+    page = Column(Integer) # Página del PDF o capítulo del EPUB (desde 1)
+    char_offset = Column(Integer) # Posición del fragmento dentro de la página o capítulo
+    text = Column(String)
+
+# Índice FTS5 del contenido; un trigger borra los fragmentos al borrar el libro
+event.listen(BookPassage.__table__, "after_create", fulltext.on_passages_created)
+
+class MetadataCache(Base):
+    """Resultados del análisis de metadatos con IA, indexados por hash del texto y del modelo."""
+    __tablename__ = "metadata_cache"
+    __table_args__ = {'extend_existing': True}
+
+    key = Column(String, primary_key=True) # SHA-256 de (modelo, texto analizado)
+    model = Column(String)
+    result = Column(String) # JSON con title/author/category
+
+class LibraryVersion(Base):
+    """Contador (una sola fila) que sube con cada escritura en la biblioteca (ver `library_version`)."""
+    __tablename__ = "library_version"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+event.listen(LibraryVersion.__table__, "after_create", library_version.on_version_created)
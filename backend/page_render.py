@@ -0,0 +1,204 @@
+"""Renderizado de páginas de PDF en el servidor, página a página.
+
+Para leer un PDF grande el visor ya no necesita descargar el archivo entero:
+`/books/{id}/pages/{n}/image?width=...` devuelve una sola página en WebP al
+ancho pedido y `/books/{id}/pages/{n}/text`, su capa de texto (palabras con
+sus coordenadas) para poder seleccionar y buscar.
+
+Las páginas renderizadas se guardan en una caché en disco
+(`backend/page_cache/`) con el nombre `{hash del libro}-p{página}-w{ancho}.webp`,
+así que un libro que cambia de contenido nunca reutiliza páginas antiguas.
+El tamaño total está limitado (`PAGE_RENDER_CACHE_MB`) con expulsión LRU por
+fecha de modificación, igual que `conversion_cache`. Para no recorrer el
+directorio (decenas de miles de archivos) en cada renderizado, el proceso
+lleva la cuenta de los bytes en memoria y solo lo recorre al arrancar y al
+superar el límite, cuando libera hasta `EVICT_TO` del límite.
+
+Al servir una página se renderizan en segundo plano las vecinas
+(`PAGE_RENDER_PREFETCH` por delante y una por detrás) en un pool de hilos
+(`PAGE_RENDER_WORKERS`), de modo que al pasar página la imagen ya está en caché.
+"""
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+base_dir = Path(__file__).resolve().parent
+PAGE_CACHE_DIR = (base_dir / "page_cache").resolve()
+MAX_CACHE_BYTES = int(float(os.getenv("PAGE_RENDER_CACHE_MB", "512")) * 1024 * 1024)
+MIN_WIDTH = int(os.getenv("PAGE_RENDER_MIN_WIDTH", "200"))
+MAX_WIDTH = int(os.getenv("PAGE_RENDER_MAX_WIDTH", "2000"))
+DEFAULT_WIDTH = 1000
+# Los anchos se redondean a múltiplos de este paso para no llenar la caché de variantes
+WIDTH_STEP = 50
+QUALITY = int(os.getenv("PAGE_RENDER_QUALITY", "80"))
+PREFETCH_PAGES = int(os.getenv("PAGE_RENDER_PREFETCH", "2"))
+WORKERS = int(os.getenv("PAGE_RENDER_WORKERS", "2"))
+
+# Al superar el límite se borra hasta quedar en esta fracción, para no expulsar en cada página nueva
+EVICT_TO = 0.9
+
+_executor: ThreadPoolExecutor | None = None
+# Bytes en caché por directorio (se recorre la primera vez que se escribe en él)
+_cache_bytes: dict[str, int] = {}
+_cache_lock = threading.Lock()
+# Páginas que se están prefetchando, para no encolar dos veces la misma
+_pending: set[str] = set()
+_pending_lock = threading.Lock()
+# Memo del número de páginas por (ruta, mtime_ns, tamaño)
+_page_counts: dict[tuple[str, int, int], int] = {}
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="page-render")
+    return _executor
+
+
+def normalize_width(width: int | None) -> int:
+    """Ancho efectivo: dentro de [MIN_WIDTH, MAX_WIDTH] y redondeado a `WIDTH_STEP`."""
+    width = DEFAULT_WIDTH if width is None else width
+    width = min(max(width, MIN_WIDTH), MAX_WIDTH)
+    return max(MIN_WIDTH, round(width / WIDTH_STEP) * WIDTH_STEP)
+
+
+def cache_path(digest: str, page: int, width: int) -> Path:
+    return PAGE_CACHE_DIR / f"{digest}-p{page}-w{width}.webp"
+
+
+def page_count(pdf_path: str) -> int:
+    """Número de páginas del PDF (memorizado mientras el archivo no cambie)."""
+    st = os.stat(pdf_path)
+    key = (pdf_path, st.st_mtime_ns, st.st_size)
+    count = _page_counts.get(key)
+    if count is None:
+        import fitz
+        with fitz.open(pdf_path) as doc:
+            count = doc.page_count
+        _page_counts[key] = count
+    return count
+
+
+def render_page(pdf_path: str, digest: str, page: int, width: int) -> str:
+    """Devuelve la ruta del WebP de la página `page` (1..n) a `width` píxeles, renderizándola si hace falta."""
+    target = cache_path(digest, page, width)
+    try:
+        # Acierto: se marca como usada para la expulsión LRU
+        os.utime(target)
+        return str(target)
+    except FileNotFoundError:
+        pass
+
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        pdf_page = doc[page - 1]
+        zoom = width / pdf_page.rect.width
+        pix = pdf_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+    # Escritura atómica: una petición y el prefetch pueden renderizar la misma página a la vez
+    tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+    img.save(tmp, "WEBP", quality=QUALITY, method=4)
+    size = os.path.getsize(tmp)
+    os.replace(tmp, target)
+    if _add_cached_bytes(size) > MAX_CACHE_BYTES:
+        evict(int(MAX_CACHE_BYTES * EVICT_TO), keep=str(target))
+    return str(target)
+
+
+def _scan() -> list[tuple[float, int, Path]]:
+    entries = []
+    for path in PAGE_CACHE_DIR.glob("*.webp"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def _add_cached_bytes(size: int) -> int:
+    """Suma `size` al total en memoria (recorriendo el directorio la primera vez) y lo devuelve."""
+    key = str(PAGE_CACHE_DIR)
+    with _cache_lock:
+        total = _cache_bytes.get(key)
+    if total is None:
+        # El archivo recién escrito ya entra en el recorrido
+        total = sum(entry_size for _, entry_size, _ in _scan())
+        with _cache_lock:
+            _cache_bytes[key] = total
+        return total
+    with _cache_lock:
+        _cache_bytes[key] += size
+        return _cache_bytes[key]
+
+
+def page_text(pdf_path: str, page: int) -> dict:
+    """Capa de texto de una página: texto plano y palabras con su caja en puntos PDF."""
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        pdf_page = doc[page - 1]
+        words = pdf_page.get_text("words", sort=True)
+        return {
+            "page": page,
+            "width": pdf_page.rect.width,
+            "height": pdf_page.rect.height,
+            "text": pdf_page.get_text("text", sort=True),
+            "words": [[round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2), word] for x0, y0, x1, y1, word, *_ in words],
+        }
+
+
+def evict(max_bytes: int | None = None, keep: str | None = None) -> int:
+    """Borra las páginas menos usadas hasta quedar por debajo del límite. Devuelve cuántas borró."""
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    entries = _scan()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        if keep and str(path) == keep:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    with _cache_lock:
+        _cache_bytes[str(PAGE_CACHE_DIR)] = total
+    return removed
+
+
+def _prefetch_one(pdf_path: str, digest: str, page: int, width: int, key: str):
+    try:
+        render_page(pdf_path, digest, page, width)
+    except Exception as e:
+        print(f"Advertencia: no se pudo prerenderizar la página {page} de {pdf_path}: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+
+def prefetch_neighbors(pdf_path: str, digest: str, page: int, width: int, total: int) -> list:
+    """Programa en el pool el renderizado de las páginas vecinas que aún no están en caché.
+
+    Devuelve los futures (vacío si no hay nada que hacer).
+    """
+    futures = []
+    neighbors = [page + i for i in range(1, PREFETCH_PAGES + 1)] + ([page - 1] if PREFETCH_PAGES else [])
+    for number in neighbors:
+        if not 1 <= number <= total or cache_path(digest, number, width).exists():
+            continue
+        key = f"{digest}-{number}-{width}"
+        with _pending_lock:
+            if key in _pending:
+                continue
+            _pending.add(key)
+        futures.append(_pool().submit(_prefetch_one, pdf_path, digest, number, width, key))
+    return futures
@@ -15,6 +15,9 @@ _ai_enabled = False
 # Modelos configurables por entorno; por defecto 2.5 para generación
 EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "models/text-embedding-004")
 GENERATION_MODEL = os.getenv("GEMINI_GENERATION_MODEL", "models/gemini-2.5-flash")
+# How much of a book goes into the RAG index
+MAX_PDF_PAGES = 1000
+MAX_EPUB_CHARS = 1000000
 
 def _ensure_init():
     global _initialized, _collection, _ai_enabled
@@ -54,11 +57,11 @@ async def get_embedding(text: str, task_type: str = "RETRIEVAL_DOCUMENT"):
 def extract_text_from_pdf(file_path: str) -> str:
     """Extracts text from a PDF file using standardized utils."""
     # Para RAG extraemos todo el contenido posible
-    return utils.extract_text_from_pdf(file_path, max_pages=1000)
+    return utils.extract_text_from_pdf(file_path, max_pages=MAX_PDF_PAGES)
 
 def extract_text_from_epub(file_path: str) -> str:
     """Extracts text from an EPUB file using standardized utils."""
-    return utils.extract_text_from_epub(file_path, max_chars=1000000)
+    return utils.extract_text_from_epub(file_path, max_chars=MAX_EPUB_CHARS)
 
 def extract_text(file_path: str) -> str:
     """Unified text extraction for supported types."""
@@ -68,6 +71,19 @@ def extract_text(file_path: str) -> str:
         return extract_text_from_epub(file_path)
     raise ValueError("Unsupported file type. Only PDF and EPUB are supported.")
 
+def join_page_texts(file_path: str, texts: list[str]) -> str:
+    """Same text as `extract_text`, built from page/chapter texts that were already extracted."""
+    if file_path.lower().endswith(".pdf"):
+        return "".join(t + "\n" for t in texts[:MAX_PDF_PAGES])
+    text = ""
+    for doc_text in texts:
+        if not doc_text:
+            continue
+        text += doc_text + "\n"
+        if len(text) > MAX_EPUB_CHARS:
+            break
+    return text
+
 def chunk_text(text: str, max_tokens: int = 1000) -> list[str]:
     """Chunks text into smaller pieces based on token count."""
     if not text.strip():
@@ -97,11 +113,20 @@ def _has_index_for_book(book_id: str) -> bool:
 
 def delete_book_from_rag(book_id: str):
     """Deletes all vectors for a book_id from ChromaDB (no-op if none)."""
+    delete_books_from_rag([book_id])
+
+def delete_books_from_rag(book_ids: list[str]):
+    """Deletes the vectors of many books with a single `$in` filter per block."""
     _ensure_init()
-    try:
-        _collection.delete(where={"book_id": book_id})
-    except Exception as e:
-        print(f"RAG: error deleting index for {book_id}: {e}")
+    for i in range(0, len(book_ids), 5000):
+        block = book_ids[i:i + 5000]
+        try:
+            _collection.delete(where={"book_id": {"$in": block}})
+        except Exception as e:
+            print(f"RAG: error deleting index for {len(block)} books: {e}")
+    # Invalidates the ETag of /rag/stats (not the catalog's: no book has changed)
+    from . import library_version
+    library_version.bump_rag()
 
 def get_index_count(book_id: str) -> int:
     """Returns number of vectors stored for a given book_id."""
@@ -117,11 +142,13 @@ def has_index(book_id: str) -> bool:
     """Public helper to know if a book has index in RAG."""
     return get_index_count(book_id) > 0
 
-async def process_book_for_rag(file_path: str, book_id: str, force_reindex: bool = False):
+async def process_book_for_rag(file_path: str, book_id: str, force_reindex: bool = False, chunks: list[str] | None = None):
     """Extracts text, chunks it, generates embeddings, and stores in ChromaDB.
 
     If force_reindex is True, deletes any existing vectors for book_id first.
     Skips if already indexed and force_reindex is False.
+    If `chunks` is given (e.g. produced off the event loop by `ingest.extract_full_text`),
+    the file is not opened again.
     """
     _ensure_init()
     if force_reindex:
@@ -130,19 +157,20 @@ async def process_book_for_rag(file_path: str, book_id: str, force_reindex: bool
         if _has_index_for_book(book_id):
             print(f"RAG: book_id {book_id} already indexed; skipping.")
             return
-    if file_path.lower().endswith(".pdf"):
-        text = extract_text_from_pdf(file_path)
-    elif file_path.lower().endswith(".epub"):
-        text = extract_text_from_epub(file_path)
-    else:
-        raise ValueError("Unsupported file type. Only PDF and EPUB are supported.")
+    if not chunks:
+        if file_path.lower().endswith(".pdf"):
+            text = extract_text_from_pdf(file_path)
+        elif file_path.lower().endswith(".epub"):
+            text = extract_text_from_epub(file_path)
+        else:
+            raise ValueError("Unsupported file type. Only PDF and EPUB are supported.")
 
-    if not text.strip():
-        raise ValueError("Could not extract text from the book.")
+        if not text.strip():
+            raise ValueError("Could not extract text from the book.")
 
-    chunks = chunk_text(text)
-    if not chunks:
-        raise ValueError("Could not chunk text from the book.")
+        chunks = chunk_text(text)
+        if not chunks:
+            raise ValueError("Could not chunk text from the book.")
 
     # Batch process embeddings for efficiency
     tasks = [get_embedding(chunk) for chunk in chunks]
@@ -157,6 +185,8 @@ async def process_book_for_rag(file_path: str, book_id: str, force_reindex: bool
                 ids=[f"{book_id}_chunk_{i}"]
             )
     print(f"Processed {len(chunks)} chunks for book ID: {book_id}")
+    from . import library_version
+    await asyncio.to_thread(library_version.bump_rag)
 
 def estimate_embeddings_for_file(file_path: str, max_tokens: int = 1000) -> dict:
     """Estimate token count and number of chunks for a file using the same tokenizer and chunk size.
@@ -0,0 +1,116 @@
+"""Caché en memoria de las respuestas de los listados más consultados.
+
+`/books/`, `/categories/`, `/books/count` y `/books/search/` se piden mucho
+más de lo que cambia la biblioteca. La respuesta se guarda ya serializada
+(bytes JSON y cabeceras) con una clave formada por el endpoint y sus
+parámetros normalizados (`normalize_text`).
+
+Toda la caché corresponde a una versión de la biblioteca (`library_version`),
+que cada petición ya lee para su ETag. Si una petición trae una versión más
+nueva, se descarta la caché entera antes de consultarla: la versión sube con
+cualquier escritura en `books`, también las de otros procesos (importación
+por CLI, varios workers de uvicorn, scripts), así que nunca se sirve una
+respuesta antigua con el ETag nuevo y las entradas viejas no ocupan memoria.
+Se invalida todo y no por etiquetas: los triggers no dicen qué cambió y
+averiguarlo en cada escritura costaría más que recalcular unos listados.
+La memoria está limitada (`RESPONSE_CACHE_MB`) con expulsión LRU, y
+`metrics()` expone aciertos, fallos y expulsiones.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = int(float(os.getenv("RESPONSE_CACHE_MB", "32")) * 1024 * 1024)
+ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+
+
+def normalize_text(value: str | None) -> str | None:
+    """Normaliza un texto de búsqueda: minúsculas y espacios simples (vacío = None).
+
+    Las búsquedas no distinguen mayúsculas ni espacios, así que el endpoint
+    consulta con el valor normalizado y la clave coincide para "Borges" y " borges".
+    """
+    if value is None:
+        return None
+    return " ".join(value.split()).lower() or None
+
+
+def make_key(endpoint: str, **params) -> tuple:
+    """Clave de la caché: endpoint y parámetros (ya normalizados) en orden estable."""
+    return (endpoint, *sorted(params.items()))
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = MAX_BYTES, enabled: bool = ENABLED):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple[bytes, dict]]" = OrderedDict()
+        self._bytes = 0
+        # Versión de la biblioteca a la que corresponden las entradas
+        self.version: int | None = None
+        self._metrics = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0, "invalidated": 0, "skipped_stale": 0}
+
+    def _sync(self, version: int):
+        """Descarta todo si `version` es más nueva que la de las entradas (con el bloqueo)."""
+        if self.version is None or version > self.version:
+            self._metrics["invalidated"] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self.version = version
+
+    def get(self, key: tuple, version: int) -> tuple[bytes, dict] | None:
+        """Devuelve (cuerpo, cabeceras) en la versión `version` y marca la entrada como usada, o None."""
+        with self._lock:
+            self._sync(version)
+            entry = self._entries.get(key) if version == self.version else None
+            if entry is None:
+                self._metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics["hits"] += 1
+            return entry
+
+    def put(self, key: tuple, body: bytes, headers: dict | None, version: int):
+        """Guarda una respuesta calculada tras leer `version` (se descarta si la caché ya va por otra)."""
+        if not self.enabled or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._sync(version)
+            if version != self.version:
+                self._metrics["skipped_stale"] += 1
+                return
+            self._remove(key)
+            self._entries[key] = (body, dict(headers or {}))
+            self._bytes += len(body)
+            self._metrics["stores"] += 1
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._metrics["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.version = None
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                **self._metrics,
+                "hit_rate": self._metrics["hits"] / lookups if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "version": self.version,
+                "enabled": self.enabled,
+            }
+
+
+cache = ResponseCache()
@@ -1,18 +1,39 @@
 from pydantic import BaseModel
 
+class CoverVariant(BaseModel):
+    width: int
+    webp: str
+    jpeg: str
+
 class BookBase(BaseModel):
     title: str
     author: str
     category: str
     cover_image_url: str | None = None
+    cover_placeholder: str | None = None
     file_path: str
 
 class Book(BookBase):
     id: int
+    cover_variants: list[CoverVariant] = []
 
     class Config:
         from_attributes = True
 
+class CategoryCount(BaseModel):
+    name: str
+    book_count: int
+
+class ContentSearchHit(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    unit: str  # 'page' (PDF) | 'chapter' (EPUB)
+    page: int
+    char_offset: int
+    snippet: str  # HTML: texto escapado y coincidencias entre <mark></mark>
+    score: float
+
 class ConversionResponse(BaseModel):
     download_url: str
 
@@ -27,3 +48,10 @@ class RagQuery(BaseModel):
 
 class RagQueryResponse(BaseModel):
     response: str
+
+class BulkImportRequest(BaseModel):
+    directory: str
+    workers: int | None = None
+    batch_size: int = 50
+    llm_concurrency: int = 8
+    llm_batch_size: int = 8
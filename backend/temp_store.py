@@ -0,0 +1,205 @@
+"""Almacén efímero para `temp_books/` con caducidad y cuota.
+
+Los PDF convertidos desde Herramientas y los libros subidos solo para
+consultar con RAG se registran aquí con un tiempo de vida (TTL). Un barrido
+periódico:
+
+1. borra las entradas caducadas;
+2. si el total supera la cuota, borra las usadas hace más tiempo (LRU);
+3. adopta los archivos huérfanos (anteriores a este módulo o de un proceso
+   interrumpido) con el TTL por defecto contado desde su fecha de modificación.
+
+Al borrar una entrada se eliminan también los vectores RAG efímeros
+asociados. El índice se guarda fuera del directorio (que se sirve en
+`/temp_books`), en `backend/temp_store_index.json`, para sobrevivir a
+reinicios, y `metrics()` expone contadores para monitorizarlo.
+"""
+import json
+import os
+import stat
+import threading
+import time
+import uuid
+
+DEFAULT_TTL_SECONDS = float(os.getenv("TEMP_STORE_TTL_HOURS", "24")) * 3600
+QUOTA_BYTES = int(float(os.getenv("TEMP_STORE_QUOTA_MB", "2048")) * 1024 * 1024)
+SWEEP_INTERVAL_SECONDS = float(os.getenv("TEMP_STORE_SWEEP_MINUTES", "10")) * 60
+# Nombre del índice en versiones anteriores, dentro del propio directorio
+LEGACY_INDEX_NAME = ".temp_store.json"
+# Archivos que se están escribiendo y que aún no son entradas del almacén
+IN_PROGRESS_SUFFIXES = (".upload", ".tmp")
+
+
+class TempStore:
+    def __init__(self, directory: str, default_ttl: float = DEFAULT_TTL_SECONDS, quota_bytes: int = QUOTA_BYTES,
+                 index_path: str | None = None):
+        self.directory = str(directory)
+        # El índice no puede vivir en el directorio: se serviría con los archivos
+        self.index_path = index_path or f"{os.path.normpath(self.directory)}.index.json"
+        self.default_ttl = default_ttl
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._metrics = {
+            "sweeps": 0, "expired": 0, "evicted": 0, "adopted": 0,
+            "rag_indexes_deleted": 0, "bytes_freed": 0,
+            "last_sweep_at": None, "last_sweep_seconds": None, "last_sweep_removed": 0,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    # --- Índice ---
+    def _load(self):
+        legacy = os.path.join(self.directory, LEGACY_INDEX_NAME)
+        if os.path.exists(legacy):
+            # Se saca el índice antiguo del directorio servido
+            if not os.path.exists(self.index_path):
+                os.replace(legacy, self.index_path)
+            else:
+                os.remove(legacy)
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def _save(self):
+        tmp = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.index_path)
+
+    # --- Entradas ---
+    def register(self, path: str, ttl: float | None = None, rag_book_id: str | None = None) -> dict:
+        """Registra un archivo ya escrito en el directorio temporal.
+
+        Escribe el índice en disco: desde código asíncrono, con `asyncio.to_thread`.
+        """
+        name = os.path.basename(path)
+        now = time.time()
+        entry = {
+            "created_at": now,
+            "last_access": now,
+            "expires_at": now + (self.default_ttl if ttl is None else ttl),
+            "size": os.path.getsize(path),
+            "rag_book_id": rag_book_id,
+        }
+        with self._lock:
+            self._entries[name] = entry
+            self._save()
+        return entry
+
+    def touch(self, name: str):
+        """Marca una entrada como usada (para la expulsión LRU). No persiste al momento.
+
+        Sin bloqueo: se llama desde el middleware en el bucle de eventos y asignar
+        un campo de la entrada es atómico; el barrido nunca debe frenarlo.
+        """
+        entry = self._entries.get(os.path.basename(name))
+        if entry:
+            entry["last_access"] = time.time()
+
+    def _remove(self, name: str, entry: dict) -> int:
+        """Borra el archivo y los vectores RAG de una entrada ya sacada del índice. Sin el bloqueo."""
+        freed = 0
+        path = os.path.join(self.directory, name)
+        try:
+            freed = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        rag_deleted = 0
+        if entry.get("rag_book_id"):
+            # Vectores RAG de un libro subido solo para consulta
+            from . import rag
+            try:
+                rag.delete_book_from_rag(entry["rag_book_id"])
+                rag_deleted = 1
+            except Exception as e:
+                print(f"Advertencia: no se pudieron borrar los vectores RAG de {name}: {e}")
+        with self._lock:
+            self._metrics["rag_indexes_deleted"] += rag_deleted
+            self._metrics["bytes_freed"] += freed
+        return freed
+
+    def sweep(self, now: float | None = None) -> dict:
+        """Caduca, adopta huérfanos y aplica la cuota. Devuelve las métricas actualizadas.
+
+        Las víctimas se eligen y se sacan del índice con el bloqueo; los archivos y
+        los vectores RAG se borran después, sin él, para no frenar `register`/`touch`.
+        """
+        started = time.monotonic()
+        now = time.time() if now is None else now
+        # 1. Listado del directorio, fuera del bloqueo
+        listed_at = time.time()
+        files = {}
+        try:
+            names = [n for n in os.listdir(self.directory) if not n.startswith(".")]
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                files[name] = st
+
+        expired, evicted, adopted = [], [], 0
+        with self._lock:
+            # Huérfanos: archivos sin entrada en el índice
+            for name, st in files.items():
+                if name in self._entries:
+                    continue
+                if name.endswith(IN_PROGRESS_SUFFIXES):
+                    # Subidas o conversiones en curso: solo se borran si quedaron abandonadas
+                    if now - st.st_mtime > self.default_ttl:
+                        expired.append((name, {}))
+                    continue
+                self._entries[name] = {
+                    "created_at": st.st_mtime, "last_access": st.st_mtime,
+                    "expires_at": st.st_mtime + self.default_ttl, "size": st.st_size, "rag_book_id": None,
+                }
+                adopted += 1
+            # Entradas cuyo archivo ya no existe (salvo las que guardan vectores RAG y las
+            # registradas después del listado)
+            for name, entry in list(self._entries.items()):
+                if name not in files and not entry.get("rag_book_id") and entry["created_at"] < listed_at:
+                    del self._entries[name]
+
+            # 2. Caducidad
+            for name, entry in list(self._entries.items()):
+                if entry["expires_at"] <= now:
+                    expired.append((name, self._entries.pop(name)))
+
+            # 3. Cuota con expulsión LRU
+            total = sum(e["size"] for e in self._entries.values())
+            for name, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_access"]):
+                if total <= self.quota_bytes:
+                    break
+                total -= entry["size"]
+                evicted.append((name, self._entries.pop(name)))
+            self._save()
+
+        for name, entry in expired + evicted:
+            self._remove(name, entry)
+
+        with self._lock:
+            self._metrics["adopted"] += adopted
+            self._metrics["expired"] += len(expired)
+            self._metrics["evicted"] += len(evicted)
+            self._metrics["sweeps"] += 1
+            self._metrics["last_sweep_removed"] = len(expired) + len(evicted)
+            self._metrics["last_sweep_at"] = now
+            self._metrics["last_sweep_seconds"] = round(time.monotonic() - started, 4)
+        return self.metrics()
+
+    def metrics(self) -> dict:
+        """Contadores acumulados y ocupación actual del almacén."""
+        with self._lock:
+            return {
+                **self._metrics,
+                "entries": len(self._entries),
+                "bytes": sum(e["size"] for e in self._entries.values()),
+                "quota_bytes": self.quota_bytes,
+            }
@@ -64,19 +64,6 @@ def test_delete_book():
     mock_session.query().filter().first.return_value = None
     assert crud.delete_book(mock_session, 2) is None
 
-def test_delete_books_by_category():
-    mock_session.query().filter().all.return_value = [mock_book]
-    import os
-    os.makedirs("/tmp", exist_ok=True)
-    open("/tmp/test_file.txt", "w").close()
-    open("/tmp/test_cover.jpg", "w").close()
-    mock_session.delete.return_value = None
-    mock_session.commit.return_value = None
-    assert crud.delete_books_by_category(mock_session, "Test") == 1
-    mock_session.query().filter().all.return_value = []
-    assert crud.delete_books_by_category(mock_session, "NoMatch") == 0
-
-
 def test_get_books_count():
     mock_session.query().count.return_value = 1
     assert crud.get_books_count(mock_session) == 1
@@ -181,9 +181,9 @@ def test_delete_single_book(mock_delete_book, mock_db):
     assert result == {"message": "Libro 'Book 1' eliminado con éxito."}
 
 
-@patch("backend.main.crud.delete_books_by_category")
+@patch("backend.main.bulk_delete.delete_books")
 def test_delete_category_and_books(mock_delete_books, mock_db):
-    mock_delete_books.return_value = 1
+    mock_delete_books.return_value = {"deleted": 1, "ids": [1]}
     result = delete_category_and_books(category_name="Category 1", db=mock_db)
     assert result == {"message": "Categoría 'Category 1' y sus 1 libros han sido eliminados."}
 
@@ -198,9 +198,9 @@ def test_delete_single_book_not_found(mock_delete_book, mock_db):
 
 
 
-@patch("backend.main.crud.delete_books_by_category")
+@patch("backend.main.bulk_delete.delete_books")
 def test_delete_category_and_books_not_found(mock_delete_books, mock_db):
-    mock_delete_books.return_value = 0
+    mock_delete_books.return_value = {"deleted": 0, "ids": []}
     with pytest.raises(HTTPException) as e:
         delete_category_and_books(category_name="Category 1", db=mock_db)
     assert e.value.status_code == 404
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models, response_cache
+
+
+@pytest.fixture(autouse=True)
+def _empty_response_cache():
+    """La caché de respuestas es global al proceso: cada prueba empieza sin entradas."""
+    response_cache.cache.clear()
+    yield
+
+
+@pytest.fixture
+def engine():
+    """Base de datos SQLite en memoria con el esquema completo (tablas, triggers y FTS)."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    """Fábrica de sesiones sobre `engine`, para sustituir `database.SessionLocal` en los endpoints."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db_session(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
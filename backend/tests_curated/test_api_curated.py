@@ -39,3 +39,20 @@ def test_rag_query_endpoint(monkeypatch):
     assert r.status_code == 200
     assert r.json() == {"response": "ok"}
 
+
+
+def test_books_batch_endpoint(monkeypatch):
+    calls = []
+
+    def fake_get_books_by_ids(db, ids):
+        calls.append(ids)
+        return [{"id": i, "title": f"T{i}", "author": "A", "category": "C", "cover_image_url": None, "file_path": f"{i}.pdf"} for i in ids]
+
+    monkeypatch.setattr(app_module.crud, "get_books_by_ids", fake_get_books_by_ids)
+    r = client.get("/books/batch", params={"ids": "3,1, 2"})
+    assert r.status_code == 200
+    assert [b["id"] for b in r.json()] == [3, 1, 2]
+    assert calls == [[3, 1, 2]]
+    assert client.get("/books/batch", params={"ids": "1,x"}).status_code == 400
+    too_many = ",".join(str(i) for i in range(app_module.BATCH_MAX_IDS + 1))
+    assert client.get("/books/batch", params={"ids": too_many}).status_code == 400
@@ -0,0 +1,84 @@
+import os
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import backend.bulk_delete as bulk_delete
+import backend.crud as crud
+import backend.models as models
+import backend.rag as rag
+
+
+def _books(db, tmp_path, category: str, count: int) -> list[int]:
+    rows = []
+    for i in range(count):
+        path = tmp_path / f"{category}-{i}.pdf"
+        path.write_bytes(b"%PDF")
+        rows.append({"title": f"{category} {i}", "author": f"Autor {i % 3}", "category": category, "cover_image_url": None, "file_path": str(path)})
+    return crud.create_books_bulk(db, rows)
+
+
+def _wait_removed(paths, timeout: float = 5):
+    stop = time.time() + timeout
+    while any(os.path.exists(p) for p in paths) and time.time() < stop:
+        time.sleep(0.01)
+    return not any(os.path.exists(p) for p in paths)
+
+
+def test_bulk_delete_uses_one_statement_and_keeps_catalog_in_sync(tmp_path, engine, db_session):
+    db = db_session
+    novels = _books(db, tmp_path, "Novela", 3)
+    _books(db, tmp_path, "Cuento", 2)
+    crud.replace_book_passages(db, novels[0], [{"page": 1, "char_offset": 0, "text": "ballena blanca"}])
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    rows = crud.delete_books_bulk(db, category="Novela")
+    assert sorted(r["id"] for r in rows) == sorted(novels)
+    # Un único DELETE … RETURNING, sin SELECT previo
+    [statement] = statements
+    assert statement.startswith("DELETE FROM books") and "RETURNING" in statement
+    assert {r["file_path"] for r in rows} == {str(tmp_path / f"Novela-{i}.pdf") for i in range(3)}
+    assert crud.get_categories_with_counts(db) == [{"name": "Cuento", "book_count": 2}]
+    assert db.query(models.BookPassage).count() == 0
+    assert crud.search_book_passages(db, "ballena") == []
+
+    cuentos = [b.id for b in db.query(models.Book).all()]
+    assert [r["id"] for r in crud.delete_books_bulk(db, book_ids=[cuentos[1], 999])] == [cuentos[1]]
+    assert crud.get_books_count(db) == 1
+
+
+def test_delete_books_cleans_vectors_once_and_files_in_background(tmp_path, monkeypatch, db_session):
+    db = db_session
+    ids = _books(db, tmp_path, "Novela", 4)
+    paths = [str(tmp_path / f"Novela-{i}.pdf") for i in range(4)]
+    calls = []
+    monkeypatch.setattr(rag, "delete_books_from_rag", lambda book_ids: calls.append(book_ids))
+
+    result = bulk_delete.delete_books(db, category="Novela")
+    assert result["deleted"] == 4 and sorted(result["ids"]) == sorted(ids)
+    assert len(calls) == 1 and sorted(calls[0]) == sorted(str(i) for i in ids)
+    assert _wait_removed(paths)
+    assert bulk_delete.delete_books(db, category="Novela") == {"deleted": 0, "ids": []}
+
+
+def test_bulk_delete_endpoints(tmp_path, monkeypatch, session_factory, db_session):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "SessionLocal", session_factory)
+    monkeypatch.setattr(rag, "delete_books_from_rag", lambda book_ids: None)
+    db = db_session
+    ids = _books(db, tmp_path, "Novela", 3)
+    _books(db, tmp_path, "Cuento", 2)
+    client = TestClient(main.app)
+
+    r = client.delete("/books", params={"ids": f"{ids[0]},{ids[1]},999"})
+    assert r.status_code == 200
+    assert r.json() == {"deleted": 2, "ids": [ids[0], ids[1]], "not_found": [999]}
+    assert client.delete("/books", params={"ids": "1,x"}).status_code == 400
+
+    r = client.delete("/categories/Cuento")
+    assert r.status_code == 200 and "2 libros" in r.json()["message"]
+    assert client.delete("/categories/Cuento").status_code == 404
+    assert crud.get_books_count(db) == 1
@@ -0,0 +1,91 @@
+import pytest
+
+from backend import bulk_import, models
+
+
+@pytest.mark.asyncio
+async def test_import_directory_dedupes_and_resumes(tmp_path, monkeypatch, session_factory, db_session):
+    monkeypatch.setattr(bulk_import.database, "SessionLocal", session_factory)
+    source = tmp_path / "archivo"
+    (source / "sub").mkdir(parents=True)
+    (source / "a.pdf").write_bytes(b"mismo contenido")
+    (source / "copia.pdf").write_bytes(b"mismo contenido")
+    (source / "sub" / "c.epub").write_bytes(b"otro libro")
+    (source / "notas.txt").write_text("ignorado")
+    books_dir = tmp_path / "books"
+    books_dir.mkdir()
+
+    monkeypatch.setattr(bulk_import.ingest, "read_book", lambda p, *args: {"text": f"texto de {p}", "cover_image_url": None})
+
+    calls = []
+
+    async def fake_analyze(text):
+        calls.append(text)
+        return {"title": "Titulo", "author": "Autor", "category": "Cat"}
+
+    kwargs = dict(
+        books_dir=str(books_dir),
+        covers_dir_fs=str(tmp_path),
+        covers_url_prefix="static/covers",
+        analyze=fake_analyze,
+        relative_path=lambda p: p,
+        resolve_path=lambda p: p,
+        workers=2,
+        batch_size=1,
+        checkpoint_path=str(tmp_path / "checkpoint.jsonl"),
+    )
+    report = await bulk_import.import_directory(str(source), **kwargs)
+
+    assert report["scanned"] == 3
+    assert report["imported"] == 2
+    assert report["duplicates"] == 1
+    assert report["books_per_minute"] > 0
+    assert len(calls) == 2
+
+    assert db_session.query(models.Book).count() == 2
+    assert all(b.content_hash for b in db_session.query(models.Book).all())
+
+    # Reanudación: todo figura ya en el checkpoint
+    again = await bulk_import.import_directory(str(source), **kwargs)
+    assert again["resumed"] == 3
+    assert again["imported"] == 0
+    assert len(calls) == 2
+
+
+def test_destinations_with_the_same_name_are_claimed_once(tmp_path):
+    books_dir = tmp_path / "books"
+    books_dir.mkdir()
+    for folder, content in (("uno", b"primero"), ("dos", b"segundo")):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "libro.pdf").write_bytes(content)
+
+    # El primero reserva el nombre aunque aún no haya copiado nada: el segundo no puede elegirlo
+    first, claimed = bulk_import._unique_destination(str(tmp_path / "uno" / "libro.pdf"), "h1", str(books_dir))
+    second, claimed_second = bulk_import._unique_destination(str(tmp_path / "dos" / "libro.pdf"), "h2", str(books_dir))
+    assert claimed and claimed_second
+    assert (first, second) == (str(books_dir / "libro.pdf"), str(books_dir / "libro_1.pdf"))
+
+    # Reanudación: el mismo contenido ya copiado se reutiliza sin reservar otro nombre
+    (books_dir / "libro.pdf").write_bytes(b"primero")
+    from backend import utils
+    digest = utils.file_sha256(str(books_dir / "libro.pdf"))
+    assert bulk_import._unique_destination(str(tmp_path / "uno" / "libro.pdf"), digest, str(books_dir)) == (first, False)
+
+
+def test_admin_import_is_restricted_to_the_import_root(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    root = tmp_path / "raiz"
+    (root / "lote").mkdir(parents=True)
+    (tmp_path / "fuera").mkdir()
+    client = TestClient(main.app)
+
+    monkeypatch.delenv("BULK_IMPORT_ROOT", raising=False)
+    assert client.post("/admin/import", json={"directory": str(root / "lote")}).status_code == 403
+
+    monkeypatch.setenv("BULK_IMPORT_ROOT", str(root))
+    assert client.post("/admin/import", json={"directory": str(tmp_path / "fuera")}).status_code == 403
+    assert client.post("/admin/import", json={"directory": "../fuera"}).status_code == 403
+    assert client.post("/admin/import", json={"directory": "no-existe"}).status_code == 400
+    assert main.resolve_import_directory("lote") == str(root / "lote")
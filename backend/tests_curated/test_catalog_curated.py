@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+
+import backend.crud as crud
+import backend.models as models
+
+
+def _authors(db):
+    return {a.name: a.book_count for a in db.query(models.Author).all()}
+
+
+def test_counts_follow_inserts_updates_and_deletes(db_session):
+    db = db_session
+    rayuela = crud.create_book(db, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")
+    crud.create_books_bulk(db, [
+        {"title": "Final del juego", "author": "Cortázar", "category": "Cuento", "cover_image_url": None, "file_path": "books/final.pdf"},
+        {"title": "Ficciones", "author": "Borges", "category": "Cuento", "cover_image_url": None, "file_path": "books/ficciones.pdf"},
+    ])
+    assert crud.get_categories_with_counts(db) == [{"name": "Cuento", "book_count": 2}, {"name": "Novela", "book_count": 1}]
+    assert _authors(db) == {"Cortázar": 2, "Borges": 1}
+
+    # Cambiar el autor mueve el libro; la categoría vacía desaparece al borrar
+    crud.update_book(db, rayuela.id, title="Rayuela", author="Julio Cortázar", cover_image_url=None)
+    assert _authors(db) == {"Cortázar": 1, "Borges": 1, "Julio Cortázar": 1}
+    crud.delete_book(db, rayuela.id)
+    assert crud.get_categories(db) == ["Cuento"]
+    assert _authors(db) == {"Cortázar": 1, "Borges": 1}
+
+    assert len(crud.delete_books_bulk(db, category="Cuento")) == 2
+    assert crud.get_categories_with_counts(db) == [] and _authors(db) == {}
+
+
+def test_categories_endpoint_returns_counts(monkeypatch, session_factory, db_session):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "SessionLocal", session_factory)
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    crud.create_book(db_session, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")
+
+    r = TestClient(main.app).get("/categories/")
+    assert r.status_code == 200
+    assert r.json() == [{"name": "Novela", "book_count": 1}]
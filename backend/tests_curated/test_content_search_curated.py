@@ -0,0 +1,93 @@
+import zipfile
+
+from fastapi.testclient import TestClient
+
+import backend.crud as crud
+import backend.fulltext as fulltext
+import backend.models as models
+
+
+def _make_pdf(path, pages):
+    import fitz
+
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def _make_epub(path, chapters):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("mimetype", "application/epub+zip")
+        zf.writestr("META-INF/container.xml", (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="content.opf"/></rootfiles></container>'
+        ))
+        items = "".join(f'<item id="c{i}" href="c{i}.xhtml" media-type="application/xhtml+xml"/>' for i in range(len(chapters)))
+        refs = "".join(f'<itemref idref="c{i}"/>' for i in range(len(chapters)))
+        zf.writestr("content.opf", f'<package xmlns="http://www.idpf.org/2007/opf"><manifest>{items}</manifest><spine>{refs}</spine></package>')
+        for i, text in enumerate(chapters):
+            zf.writestr(f"c{i}.xhtml", f"<html><body><p>{text}</p></body></html>")
+    return str(path)
+
+
+def test_split_passage_cuts_on_spaces_and_keeps_offsets():
+    text = "uno dos tres cuatro cinco"
+    parts = list(fulltext.split_passage(text, size=9))
+    assert parts == [(0, "uno dos"), (8, "tres"), (13, "cuatro"), (20, "cinco")]
+    assert all(text[offset:offset + len(p)] == p for offset, p in parts)
+    assert fulltext.content_match('ballena "capitan Ahab" mar') == '"capitan Ahab" "ballena"* "mar"*'
+
+
+def test_content_search_returns_pages_chapters_and_snippets(tmp_path, db_session):
+    db = db_session
+    pdf = crud.create_book(db, "Moby Dick", "Melville", "Novela", None, "books/moby.pdf")
+    epub = crud.create_book(db, "Viaje", "Verne", "Novela", None, "books/viaje.epub")
+    crud.replace_book_passages(db, pdf.id, fulltext.iter_passages(_make_pdf(
+        tmp_path / "moby.pdf", ["Llamadme Ismael.", "El capitan Ahab busca la ballena blanca."])))
+    crud.replace_book_passages(db, epub.id, fulltext.iter_passages(_make_epub(
+        tmp_path / "viaje.epub", ["Prólogo sin interés.", "Una ballena cruzó el océano."])))
+
+    hits = crud.search_book_passages(db, "ballena")
+    assert {(h["book_id"], h["unit"], h["page"]) for h in hits} == {(pdf.id, "page", 2), (epub.id, "chapter", 2)}
+    assert all("<mark>ballena</mark>" in h["snippet"] for h in hits)
+
+    # Sin acentos, dentro de un libro y con frase exacta
+    assert [h["page"] for h in crud.search_book_passages(db, "oceano", book_id=epub.id)] == [2]
+    assert crud.search_book_passages(db, "oceano", book_id=pdf.id) == []
+    assert [h["book_id"] for h in crud.search_book_passages(db, '"ballena blanca"')] == [pdf.id]
+
+    # Reindexar sustituye y borrar el libro elimina su contenido
+    assert crud.replace_book_passages(db, pdf.id, [{"page": 1, "char_offset": 0, "text": "nada"}]) == 1
+    assert [h["book_id"] for h in crud.search_book_passages(db, "ballena")] == [epub.id]
+    db.delete(epub)
+    db.commit()
+    assert crud.search_book_passages(db, "ballena") == []
+    assert db.query(models.BookPassage).filter(models.BookPassage.book_id == epub.id).count() == 0
+
+
+def test_content_search_endpoint(monkeypatch, session_factory, db_session):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "SessionLocal", session_factory)
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    db = db_session
+    book = crud.create_book(db, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")
+    crud.replace_book_passages(db, book.id, [{"page": 7, "char_offset": 0, "text": "Encontraría a la Maga"}])
+
+    r = TestClient(main.app).get("/books/search/content", params={"q": "maga", "book_id": book.id})
+    assert r.status_code == 200
+    assert [(h["title"], h["page"], h["snippet"]) for h in r.json()] == [("Rayuela", 7, "Encontraría a la <mark>Maga</mark>")]
+
+
+def test_content_snippets_escape_book_text(db_session):
+    db = db_session
+    book = crud.create_book(db, "Trampa", "Anónimo", "Novela", None, "books/trampa.pdf")
+    raw = 'La <img src=x onerror="alert(1)"> ballena & el \x1emar\x1f'
+    passages = [{"page": 1, "char_offset": offset, "text": text} for offset, text in fulltext.split_passage(raw)]
+    crud.replace_book_passages(db, book.id, passages)
+
+    [hit] = crud.search_book_passages(db, "ballena")
+    assert hit["snippet"] == 'La &lt;img src=x onerror=&quot;alert(1)&quot;&gt; <mark>ballena</mark> &amp; el mar'
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from backend import conversion_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversion_cache, "CACHE_DIR", tmp_path / "cache")
+    return tmp_path / "cache"
+
+
+@pytest.mark.asyncio
+async def test_repeat_and_concurrent_conversions_render_once(tmp_path, cache_dir, monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def fake_convert(epub_path, output_path, workers=None):
+        calls.append(epub_path)
+        release.wait(timeout=2)
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-1.7 fake")
+        return {"chapters": [], "pages": 1}
+
+    monkeypatch.setattr(conversion_cache.conversion, "convert_epub_to_pdf", fake_convert)
+    epub = tmp_path / "libro.epub"
+    epub.write_bytes(b"epub")
+
+    first = asyncio.ensure_future(conversion_cache.get_or_convert(str(epub)))
+    second = asyncio.ensure_future(conversion_cache.get_or_convert(str(epub)))
+    await asyncio.sleep(0.05)
+    release.set()
+    (path1, report1), (path2, report2) = await asyncio.gather(first, second)
+
+    assert path1 == path2 and report1 == {"chapters": [], "pages": 1} and report2 is None
+    assert len(calls) == 1
+
+    # Acierto: misma ruta, sin informe y sin convertir otra vez
+    path3, report3 = await conversion_cache.get_or_convert(str(epub))
+    assert (path3, report3) == (path1, None)
+    assert len(calls) == 1
+    assert [p.suffix for p in cache_dir.iterdir()] == [".pdf"]
+
+
+def test_evict_removes_least_recently_used_first(cache_dir):
+    cache_dir.mkdir()
+    now = time.time()
+    for i, name in enumerate(["viejo", "medio", "nuevo"]):
+        path = cache_dir / f"{name}.pdf"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (now + i, now + i))
+
+    assert conversion_cache.evict(max_bytes=150) == 2
+    assert [p.name for p in cache_dir.iterdir()] == ["nuevo.pdf"]
@@ -0,0 +1,48 @@
+import zipfile
+
+from backend import conversion
+
+
+def _make_epub(path):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("mimetype", "application/epub+zip")
+        zf.writestr("META-INF/container.xml", (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="content.opf"/></rootfiles></container>'
+        ))
+        zf.writestr("content.opf", (
+            '<package xmlns="http://www.idpf.org/2007/opf"><metadata><meta name="cover" content="img"/></metadata><manifest>'
+            '<item id="a" href="a.xhtml" media-type="application/xhtml+xml"/>'
+            '<item id="b" href="b.xhtml" media-type="application/xhtml+xml"/>'
+            '<item id="img" href="cover.png" media-type="image/png"/>'
+            '</manifest><spine><itemref idref="b"/><itemref idref="a"/></spine></package>'
+        ))
+        for name in ("a.xhtml", "b.xhtml"):
+            zf.writestr(name, "<html><body><p>texto</p></body></html>")
+        zf.writestr("cover.png", b"png")
+    return str(path)
+
+
+def _fake_render(epub_path, item_path, target_path):
+    import fitz
+
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), item_path or "cover")
+    doc.save(target_path)
+    doc.close()
+    return {"chapter": item_path or "cover", "pages": 1, "seconds": 0.01}
+
+
+def test_convert_merges_chapters_in_spine_order_to_destination(tmp_path, monkeypatch):
+    import fitz
+
+    monkeypatch.setattr(conversion, "render_chapter", _fake_render)
+    output = tmp_path / "libro.pdf"
+    report = conversion.convert_epub_to_pdf(_make_epub(tmp_path / "libro.epub"), str(output), workers=1)
+
+    assert [c["chapter"] for c in report["chapters"]] == ["cover", "b.xhtml", "a.xhtml"]
+    assert report["pages"] == 3
+    with fitz.open(str(output)) as doc:
+        assert [page.get_text().strip() for page in doc] == ["cover", "b.xhtml", "a.xhtml"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["libro.epub", "libro.pdf"]
+    assert "3 páginas" in conversion.format_report(report)
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import conversion_cache, conversion_jobs, temp_store
+from backend import main as app_module
+
+
+def test_supervise_kills_jobs_over_the_time_limit():
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=time.sleep, args=(30,))
+    proc.start()
+
+    with pytest.raises(TimeoutError):
+        conversion_jobs.supervise(proc, parent_conn, timeout=0.5, max_rss=None)
+    assert not proc.is_alive()
+    child_conn.close()
+
+
+def test_convert_tool_returns_job_and_exposes_download(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversion_cache, "CACHE_DIR", tmp_path / "cache")
+    temp_dir = tmp_path / "temp_books"
+    store = temp_store.TempStore(str(temp_dir), index_path=str(tmp_path / "index.json"))
+    monkeypatch.setattr(app_module, "TEMP_BOOKS_DIR_FS", temp_dir)
+    monkeypatch.setattr(app_module, "temp_books_store", store)
+
+    def fake_run(epub_path, output_path):
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-1.7 fake")
+        return {
+            "chapters": [{"chapter": "c1.xhtml", "pages": 1, "seconds": 0.1}],
+            "pages": 1, "render_seconds": 0.1, "merge_seconds": 0.0, "total_seconds": 0.1,
+        }
+
+    monkeypatch.setattr(conversion_jobs, "_run_in_process", fake_run)
+
+    with TestClient(app_module.app) as client:
+        r = client.post("/tools/convert-epub-to-pdf", files={"file": ("libro.epub", b"epub", "application/epub+zip")})
+        assert r.status_code == 202
+        job_id = r.json()["job_id"]
+
+        for _ in range(50):
+            job = client.get(f"/tools/convert-epub-to-pdf/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.05)
+
+        assert job["status"] == "completed", job
+        assert job["conversion"]["pages"] == 1
+        pdf_name = os.path.basename(job["download_url"])
+        assert (temp_dir / pdf_name).exists()
+        assert store.metrics()["entries"] == 1
+
+        assert client.get("/tools/convert-epub-to-pdf/no-existe").status_code == 404
+
+
+def test_converted_book_gets_a_content_hash_etag(tmp_path, monkeypatch):
+    import asyncio
+    import hashlib
+
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from sqlalchemy.orm import sessionmaker
+
+    from backend import crud_async, database, models
+
+    sync_engine = database.create_sqlite_engine(f"sqlite:///{tmp_path / 'library.db'}")
+    models.Base.metadata.create_all(bind=sync_engine)
+    engine = database.create_async_sqlite_engine(f"sqlite+aiosqlite:///{tmp_path / 'library.db'}")
+    factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    monkeypatch.setattr(app_module.database, "AsyncSessionLocal", factory)
+    monkeypatch.setattr(app_module.database, "ReadSessionLocal", sessionmaker(bind=sync_engine))
+    books_dir = tmp_path / "books"
+    books_dir.mkdir()
+    monkeypatch.setattr(app_module, "BOOKS_DIR_FS", books_dir)
+    monkeypatch.setattr(conversion_cache, "CACHE_DIR", tmp_path / "cache")
+
+    def fake_run(epub_path, output_path):
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-1.7 convertido")
+        return None
+
+    async def fake_pipeline(file_path, *_args):
+        return {"metadata": {"title": "Rayuela", "author": "Cortázar", "category": "Novela"}, "full_text": asyncio.get_running_loop().create_future()}
+
+    async def no_index(*_args):
+        return None
+
+    monkeypatch.setattr(conversion_jobs, "_run_in_process", fake_run)
+    monkeypatch.setattr(app_module.ingest, "run_pipeline", fake_pipeline)
+    monkeypatch.setattr(app_module, "background_index_book", no_index)
+    epub = books_dir / "rayuela.epub"
+    epub.write_bytes(b"epub")
+
+    async def seed():
+        async with factory() as db:
+            return (await crud_async.create_book(db, "Rayuela", "Cortázar", "Novela", None, str(epub))).id
+
+    try:
+        book_id = asyncio.run(seed())
+        client = TestClient(app_module.app)
+        r = client.post(f"/api/books/{book_id}/convert")
+        assert r.status_code == 200, r.text
+        pdf = books_dir / "rayuela.pdf"
+        expected = hashlib.sha256(pdf.read_bytes()).hexdigest()
+
+        url = f"/books/download/{r.json()['id']}"
+        assert client.get(url).headers["etag"] == f'"{expected}"'
+        # Un acierto de la caché cambia el mtime del PDF (enlace duro), no el ETag
+        os.utime(pdf, (2**31, 2**31))
+        assert client.get(url).headers["etag"] == f'"{expected}"'
+    finally:
+        asyncio.run(engine.dispose())
+        sync_engine.dispose()
@@ -0,0 +1,78 @@
+from PIL import Image
+
+from backend import covers
+
+
+def _master(path, width=400, height=600, color=(120, 30, 30)):
+    Image.new("RGB", (width, height), color).save(path, "JPEG")
+    return str(path)
+
+
+def test_cover_variants_are_content_hashed_and_never_upscaled(tmp_path):
+    master = _master(tmp_path / "cover.jpg", width=300)
+    variants = covers.cover_variants(7, master)
+
+    assert [v["width"] for v in variants] == [160, 240, 300]
+    digest = covers.master_info(master)[0]
+    assert variants[0]["webp"] == f"covers/7/{digest}-160.webp"
+    assert variants[0]["jpeg"] == f"covers/7/{digest}-160.jpg"
+    assert covers.cover_variants(7, None) == []
+
+
+def test_get_or_create_variant_generates_once_and_rejects_stale_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(covers, "COVER_CACHE_DIR", tmp_path / "cache")
+    master = _master(tmp_path / "cover.jpg")
+    digest = covers.master_info(master)[0]
+
+    path, media_type = covers.get_or_create_variant(master, digest, 160, "webp")
+    assert media_type == "image/webp"
+    with Image.open(path) as img:
+        assert img.format == "WEBP" and img.width == 160
+    mtime = (tmp_path / "cache" / f"{digest}-160.webp").stat().st_mtime_ns
+
+    # Segunda petición: se sirve desde la caché en disco
+    covers.get_or_create_variant(master, digest, 160, "webp")
+    assert (tmp_path / "cache" / f"{digest}-160.webp").stat().st_mtime_ns == mtime
+
+    assert covers.get_or_create_variant(master, "0" * 16, 160, "webp") is None
+    assert covers.get_or_create_variant(master, digest, 999, "jpg") is None
+
+
+def test_parse_variant_name():
+    assert covers.parse_variant_name("0123456789abcdef-240.jpg") == ("0123456789abcdef", 240, "jpg")
+    assert covers.parse_variant_name("../etc/passwd") is None
+
+
+def test_make_placeholder_is_a_tiny_jpeg_data_uri(tmp_path):
+    import base64
+    import io
+
+    master = _master(tmp_path / "cover.jpg")
+    placeholder = covers.make_placeholder(master)
+
+    prefix = "data:image/jpeg;base64,"
+    assert placeholder.startswith(prefix)
+    with Image.open(io.BytesIO(base64.b64decode(placeholder[len(prefix):]))) as img:
+        assert img.format == "JPEG" and img.size == (16, 24)
+    assert covers.placeholder_for(None) is None
+    assert covers.make_placeholder(str(tmp_path / "no_existe.jpg")) is None
+
+
+def test_cover_variant_endpoint_uses_the_read_session(tmp_path, monkeypatch, session_factory, db_session):
+    from fastapi.testclient import TestClient
+
+    from backend import crud, main
+
+    def no_write_session():
+        raise AssertionError("la portada no debe abrir una sesión de escritura")
+
+    monkeypatch.setattr(covers, "COVER_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(main.database, "SessionLocal", no_write_session)
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    master = _master(tmp_path / "cover.jpg")
+    book = crud.create_book(db_session, "Rayuela", "Cortázar", "Novela", master, "books/rayuela.pdf")
+    digest = covers.master_info(master)[0]
+
+    r = TestClient(main.app).get(f"/covers/{book.id}/{digest}-160.webp")
+    assert r.status_code == 200 and r.headers["content-type"] == "image/webp"
+    assert r.headers["cache-control"] == covers.IMMUTABLE_CACHE_CONTROL
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import backend.crud_async as crud_async
+import backend.database as database
+import backend.models as models
+
+
+def _async_factory(tmp_path):
+    url = f"sqlite:///{tmp_path / 'library.db'}"
+    sync_engine = database.create_sqlite_engine(url)
+    models.Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+    engine = database.create_async_sqlite_engine(f"sqlite+aiosqlite:///{tmp_path / 'library.db'}")
+    return engine, async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_async_crud_matches_sync_behaviour(tmp_path):
+    engine, factory = _async_factory(tmp_path)
+    async with factory() as db:
+        rayuela = await crud_async.create_book(db, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf", content_hash="abc")
+        final = await crud_async.create_book(db, "Final del juego", "Cortázar", "Cuento", None, "books/final.pdf")
+        # Los triggers del catálogo ya han rellenado el autor
+        assert rayuela.author_id is not None and rayuela.author_id == final.author_id
+
+        assert (await crud_async.get_book(db, rayuela.id)).title == "Rayuela"
+        assert (await crud_async.get_book_by_path(db, "books/final.pdf")).id == final.id
+        assert (await crud_async.get_book_by_content_hash(db, "abc")).id == rayuela.id
+        assert await crud_async.get_book_by_path(db, "books/otro.pdf") is None
+        assert [b.id for b in await crud_async.get_books_by_ids(db, [final.id, rayuela.id, 999, final.id])] == [final.id, rayuela.id]
+        assert [b.title for b in await crud_async.get_books_by_category(db, "Cuento")] == ["Final del juego"]
+        assert [b.title for b in await crud_async.get_books_by_author(db, rayuela.author_id, "Cortázar", exclude_book_id=rayuela.id)] == ["Final del juego"]
+        assert [b.title for b in await crud_async.get_books_by_author(db, None, "Cortázar", exclude_book_id=final.id)] == ["Rayuela"]
+        assert await crud_async.get_books_count(db) == 2
+
+        updated = await crud_async.update_book(db, rayuela.id, "Rayuela (ed. crítica)", "Julio Cortázar", None)
+        assert updated.title == "Rayuela (ed. crítica)" and updated.author_id != final.author_id
+        assert await crud_async.update_book(db, 999, "x", "y", None) is None
+    await engine.dispose()
+
+
+def test_update_endpoint_uses_async_session(tmp_path, monkeypatch):
+    from backend import main
+
+    engine, factory = _async_factory(tmp_path)
+    monkeypatch.setattr(main.database, "AsyncSessionLocal", factory)
+    monkeypatch.setattr(main.database, "AsyncReadSessionLocal", factory)
+    client = TestClient(main.app)
+
+    async def seed():
+        async with factory() as db:
+            return (await crud_async.create_book(db, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")).id
+
+    try:
+        book_id = asyncio.run(seed())
+
+        r = client.put(f"/books/{book_id}", data={"title": "Rayuela", "author": "Julio Cortázar"})
+        assert r.status_code == 200
+        assert r.json()["author"] == "Julio Cortázar"
+        assert client.put("/books/999", data={"title": "x", "author": "y"}).status_code == 404
+    finally:
+        asyncio.run(engine.dispose())
@@ -111,3 +111,21 @@ def test_delete_book_when_missing_returns_none(monkeypatch):
     # commit no debe ser llamado
     assert db.committed is False
 
+
+
+def test_get_books_by_ids_keeps_requested_order(engine, db_session):
+    from sqlalchemy import event
+
+    db = db_session
+    ids = crud.create_books_bulk(db, [
+        {"title": f"Libro {i}", "author": "A", "category": "C", "cover_image_url": None, "file_path": f"books/{i}.pdf"}
+        for i in range(3)
+    ])
+    db.expunge_all()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    books = crud.get_books_by_ids(db, [ids[2], 999, ids[0], ids[2]])
+    assert [b.id for b in books] == [ids[2], ids[0]]
+    assert len(statements) == 1
+    assert crud.get_books_by_ids(db, []) == []
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from backend import database
+
+
+def test_engines_apply_pragmas_and_read_engine_is_read_only(tmp_path):
+    url = f"sqlite:///{tmp_path / 'library.db'}"
+    write = database.create_sqlite_engine(url)
+    read = database.create_sqlite_engine(url, readonly=True)
+    with write.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar().lower() == database.JOURNAL_MODE.lower()
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == database.BUSY_TIMEOUT_MS
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -database.CACHE_KIB
+
+    with read.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM t").scalar() == 0
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+
+    database.optimize(write)
+    with write.connect() as conn:
+        assert conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first()
+    write.dispose()
+    read.dispose()
@@ -0,0 +1,61 @@
+from email.utils import formatdate
+
+from fastapi.testclient import TestClient
+
+import backend.crud as crud
+
+
+def _client(tmp_path, monkeypatch, session_factory, content_hash="abc123"):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    path = tmp_path / "libro.pdf"
+    path.write_bytes(bytes(range(256)) * 4)
+    book = crud.create_book(session_factory(), "Libro", "Autor", "Novela", None, str(path), content_hash=content_hash)
+    return TestClient(main.app), f"/books/download/{book.id}"
+
+
+def test_download_supports_ranges_and_strong_etag(tmp_path, monkeypatch, session_factory):
+    client, url = _client(tmp_path, monkeypatch, session_factory)
+
+    full = client.get(url)
+    assert full.status_code == 200 and len(full.content) == 1024
+    assert full.headers["etag"] == '"abc123"'
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["content-type"] == "application/pdf"
+    assert "last-modified" in full.headers
+
+    part = client.get(url, headers={"Range": "bytes=256-511"})
+    assert part.status_code == 206
+    assert part.content == bytes(range(256))
+    assert part.headers["content-range"] == "bytes 256-511/1024"
+
+    # If-Range con otro ETag: el archivo ha cambiado, se devuelve entero
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"otro"'})
+    assert stale.status_code == 200 and len(stale.content) == 1024
+    assert client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"abc123"'}).status_code == 206
+
+    head = client.head(url)
+    assert head.status_code == 200 and head.content == b"" and head.headers["content-length"] == "1024"
+
+
+def test_download_conditional_requests(tmp_path, monkeypatch, session_factory):
+    client, url = _client(tmp_path, monkeypatch, session_factory)
+
+    cached = client.get(url, headers={"If-None-Match": '"abc123"'})
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["etag"] == '"abc123"'
+    assert client.get(url, headers={"If-None-Match": '"otro"'}).status_code == 200
+
+    last_modified = client.get(url).headers["last-modified"]
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": formatdate(0, usegmt=True)}).status_code == 200
+    assert client.get(url, headers={"If-Modified-Since": "no es una fecha"}).status_code == 200
+
+
+def test_download_without_content_hash_uses_file_etag(tmp_path, monkeypatch, session_factory):
+    client, url = _client(tmp_path, monkeypatch, session_factory, content_hash=None)
+    etag = client.get(url).headers["etag"]
+    assert etag.startswith('"1024-')
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/books/download/999").status_code == 404
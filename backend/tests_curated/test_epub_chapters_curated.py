@@ -0,0 +1,105 @@
+import zipfile
+
+from fastapi.testclient import TestClient
+
+import backend.crud as crud
+
+OPF = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Libro de prueba</dc:title></metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="c1" href="text/uno.xhtml" media-type="application/xhtml+xml"/>
+    <item id="c2" href="text/dos.xhtml" media-type="application/xhtml+xml"/>
+    <item id="css" href="styles/main.css" media-type="text/css"/>
+    <item id="img" href="images/mapa de la isla.png" media-type="image/png"/>
+  </manifest>
+  <spine><itemref idref="c1"/><itemref idref="c2"/></spine>
+</package>"""
+
+NAV = (
+    '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops"><body>'
+    '<nav epub:type="toc"><ol><li><a href="text/uno.xhtml">Uno</a></li>'
+    '<li><a href="text/dos.xhtml#fin">Dos</a></li></ol></nav></body></html>'
+)
+
+CHAPTER = (
+    '<html xmlns="http://www.w3.org/1999/xhtml"><head><link rel="stylesheet" href="../styles/main.css"/></head>'
+    '<body onload="robar()"><img src="../images/mapa%20de%20la%20isla.png" onerror="robar()"/><a href="dos.xhtml#fin">Siguiente</a>'
+    '<script src="../js/robar.js"></script>tras el script<a href="javascript:robar()">x</a></body></html>'
+)
+
+
+def _epub(path):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("mimetype", "application/epub+zip")
+        zf.writestr("META-INF/container.xml", (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf"/></rootfiles></container>'
+        ))
+        zf.writestr("OEBPS/content.opf", OPF)
+        zf.writestr("OEBPS/nav.xhtml", NAV)
+        zf.writestr("OEBPS/text/uno.xhtml", CHAPTER)
+        zf.writestr("OEBPS/text/dos.xhtml", '<html xmlns="http://www.w3.org/1999/xhtml"><body><p id="fin">Fin</p></body></html>')
+        zf.writestr("OEBPS/styles/main.css", "body { background: url(../images/fondo.png) }")
+        zf.writestr("OEBPS/images/mapa de la isla.png", b"\x89PNG")
+        zf.writestr("OEBPS/secreto.txt", "no declarado")
+
+
+def _client(tmp_path, monkeypatch, session_factory):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    path = tmp_path / "libro.epub"
+    _epub(path)
+    pdf = tmp_path / "libro.pdf"
+    pdf.write_bytes(b"%PDF")
+    db = session_factory()
+    book = crud.create_book(db, "Libro", "Autora", "Novela", None, str(path), content_hash="cafe")
+    other = crud.create_book(db, "Otro", "Autora", "Novela", None, str(pdf))
+    return TestClient(main.app), book.id, other.id
+
+
+def test_epub_toc_lists_chapters_and_is_revalidated(tmp_path, monkeypatch, session_factory):
+    client, book_id, pdf_id = _client(tmp_path, monkeypatch, session_factory)
+
+    r = client.get(f"/books/{book_id}/epub/toc")
+    assert r.status_code == 200 and r.headers["etag"] == '"cafe-toc"'
+    body = r.json()
+    assert body["title"] == "Libro de prueba" and body["chapter_count"] == 2
+    assert [c["href"] for c in body["chapters"]] == ["text/uno.xhtml", "text/dos.xhtml"]
+    assert body["toc"] == [
+        {"title": "Uno", "chapter": 1, "fragment": None, "children": []},
+        {"title": "Dos", "chapter": 2, "fragment": "fin", "children": []},
+    ]
+    cached = client.get(f"/books/{book_id}/epub/toc", headers={"If-None-Match": '"cafe-toc"'})
+    assert cached.status_code == 304 and cached.content == b""
+    assert client.get(f"/books/{pdf_id}/epub/toc").status_code == 400
+
+
+def test_epub_chapter_links_point_to_served_urls(tmp_path, monkeypatch, session_factory):
+    client, book_id, _pdf_id = _client(tmp_path, monkeypatch, session_factory)
+    base = f"http://testserver/books/{book_id}/epub"
+
+    r = client.get(f"/books/{book_id}/epub/chapters/1")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/xhtml+xml")
+    assert r.headers["etag"] == '"cafe-c1"'
+    html = r.text
+    assert f'href="{base}/resources/OEBPS/styles/main.css"' in html
+    assert f'src="{base}/resources/OEBPS/images/mapa%20de%20la%20isla.png"' in html
+    assert f'href="{base}/chapters/2#fin"' in html
+    # Sin contenido activo, y con cabeceras que impiden ejecutarlo si se abre directamente
+    assert "<script" not in html and "robar" not in html and "tras el script" in html
+    assert r.headers["content-security-policy"].startswith("sandbox")
+    assert r.headers["x-content-type-options"] == "nosniff"
+    assert client.get(f"/books/{book_id}/epub/chapters/1", headers={"If-None-Match": '"cafe-c1"'}).status_code == 304
+    assert client.get(f"/books/{book_id}/epub/chapters/3").status_code == 404
+
+    image = client.get(f"{base}/resources/OEBPS/images/mapa%20de%20la%20isla.png")
+    assert image.status_code == 200 and image.content == b"\x89PNG" and image.headers["content-type"] == "image/png"
+    assert image.headers["content-security-policy"].startswith("sandbox") and image.headers["x-content-type-options"] == "nosniff"
+    css = client.get(f"/books/{book_id}/epub/resources/OEBPS/styles/main.css")
+    assert css.headers["content-type"].startswith("text/css") and "fondo.png" in css.text
+    # Solo se sirve lo declarado en el manifiesto
+    assert client.get(f"/books/{book_id}/epub/resources/OEBPS/secreto.txt").status_code == 404
+    assert client.get(f"/books/{book_id}/epub/resources/META-INF/container.xml").status_code == 404
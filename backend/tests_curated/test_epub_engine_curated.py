@@ -0,0 +1,134 @@
+import io
+import zipfile
+
+from backend import epub_engine
+
+OPF = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Libro de prueba</dc:title>
+    <dc:creator>Autora</dc:creator>
+  </metadata>
+  <manifest>
+    <item id="c2" href="text/dos.xhtml" media-type="application/xhtml+xml"/>
+    <item id="c1" href="text/uno%20a.xhtml" media-type="application/xhtml+xml"/>
+    <item id="css" href="style.css" media-type="text/css"/>
+    <item id="img" href="images/portada.png" media-type="image/png" properties="cover-image"/>
+  </manifest>
+  <spine><itemref idref="c1"/><itemref idref="c2"/></spine>
+</package>"""
+
+
+def _epub_bytes():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("mimetype", "application/epub+zip")
+        zf.writestr("META-INF/container.xml", (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf"/></rootfiles></container>'
+        ))
+        zf.writestr("OEBPS/content.opf", OPF)
+        zf.writestr("OEBPS/text/uno a.xhtml", (
+            '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>No</title><style>p {}</style></head>'
+            "<body><h1>Primero</h1><p>Hola<b>mundo</b> <!-- nota -->y&nbsp;más</p><script>x()</script></body></html>"
+        ))
+        zf.writestr("OEBPS/text/dos.xhtml", '<html><body><p>Segundo</p></body></html>')
+        zf.writestr("OEBPS/style.css", "p { margin: 0 }")
+        zf.writestr("OEBPS/images/portada.png", b"png")
+    return buffer.getvalue()
+
+
+def test_text_follows_spine_and_skips_non_content():
+    with epub_engine.open_epub(_epub_bytes()) as book:
+        assert list(book.iter_text()) == ["Primero Holamundo y más", "Segundo"]
+        assert book.text(max_chars=5) == "Primero Holamundo y más\n"
+
+
+def test_manifest_cover_styles_and_raw_documents(tmp_path):
+    path = tmp_path / "libro.epub"
+    path.write_bytes(_epub_bytes())
+    with epub_engine.open_epub(str(path)) as book:
+        assert book.metadata["title"][0]["value"] == "Libro de prueba"
+        assert book.cover_item()["path"] == "OEBPS/images/portada.png"
+        assert [i["path"] for i in book.stylesheets()] == ["OEBPS/style.css"]
+        docs = list(book.iter_documents())
+        assert [item["id"] for item, _ in docs] == ["c1", "c2"]
+        assert docs[1][1].startswith(b"<html>")
+        assert book.resolve("../images/portada.png", base="OEBPS/text/dos.xhtml") == "OEBPS/images/portada.png"
+
+
+def _toc_epub(nav: str | None = None, ncx: str | None = None, chapter: str = "<html><body/></html>"):
+    manifest = '<item id="c1" href="text/uno.xhtml" media-type="application/xhtml+xml"/>'
+    manifest += '<item id="c2" href="text/dos.xhtml" media-type="application/xhtml+xml"/>'
+    manifest += '<item id="img" href="images/a.png" media-type="image/png"/>'
+    if nav:
+        manifest += '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+    if ncx:
+        manifest += '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'
+    spine = '<spine toc="ncx">' if ncx else "<spine>"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("META-INF/container.xml", (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf"/></rootfiles></container>'
+        ))
+        zf.writestr("OEBPS/content.opf", (
+            f'<package xmlns="http://www.idpf.org/2007/opf"><manifest>{manifest}</manifest>'
+            f'{spine}<itemref idref="c1"/><itemref idref="c2"/></spine></package>'
+        ))
+        zf.writestr("OEBPS/text/uno.xhtml", chapter)
+        zf.writestr("OEBPS/text/dos.xhtml", "<html><body/></html>")
+        zf.writestr("OEBPS/images/a.png", b"png")
+        if nav:
+            zf.writestr("OEBPS/nav.xhtml", nav)
+        if ncx:
+            zf.writestr("OEBPS/toc.ncx", ncx)
+    return buffer.getvalue()
+
+
+def test_toc_from_nav_ncx_or_spine():
+    nav = (
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops"><body>'
+        '<nav epub:type="landmarks"><ol><li><a href="text/dos.xhtml">No</a></li></ol></nav>'
+        '<nav epub:type="toc"><ol><li><a href="text/uno.xhtml">Parte <b>I</b></a><ol>'
+        '<li><a href="text/dos.xhtml#s2">Sección 2</a></li></ol></li></ol></nav></body></html>'
+    )
+    with epub_engine.open_epub(_toc_epub(nav=nav)) as book:
+        assert book.toc() == [{
+            "title": "Parte I", "path": "OEBPS/text/uno.xhtml", "fragment": None,
+            "children": [{"title": "Sección 2", "path": "OEBPS/text/dos.xhtml", "fragment": "s2", "children": []}],
+        }]
+
+    ncx = (
+        '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/"><navMap>'
+        '<navPoint id="n1"><navLabel><text>Uno</text></navLabel><content src="text/uno.xhtml"/>'
+        '<navPoint id="n2"><navLabel><text>Dos</text></navLabel><content src="text/dos.xhtml#x"/></navPoint>'
+        '</navPoint></navMap></ncx>'
+    )
+    with epub_engine.open_epub(_toc_epub(ncx=ncx)) as book:
+        toc = book.toc()
+        assert [e["title"] for e in toc] == ["Uno"]
+        assert toc[0]["children"][0]["path"] == "OEBPS/text/dos.xhtml" and toc[0]["children"][0]["fragment"] == "x"
+
+    with epub_engine.open_epub(_toc_epub()) as book:
+        assert [(e["title"], e["path"]) for e in book.toc()] == [("Capítulo 1", "OEBPS/text/uno.xhtml"), ("Capítulo 2", "OEBPS/text/dos.xhtml")]
+
+
+def test_rewrite_document_only_touches_internal_links():
+    chapter = (
+        '<html xmlns="http://www.w3.org/1999/xhtml"><body><p>a&#160;b</p>'
+        '<img src="../images/a.png"/><a href="dos.xhtml#n1">sig</a><a href="#local">aquí</a>'
+        '<a href="https://example.com/x">web</a><img src="data:image/png;base64,AA"/></body></html>'
+    )
+    seen = []
+
+    def rewrite(path, fragment):
+        seen.append((path, fragment))
+        return f"/r/{path}" + (f"#{fragment}" if fragment else "")
+
+    with epub_engine.open_epub(_toc_epub(chapter=chapter)) as book:
+        out = book.rewrite_document("OEBPS/text/uno.xhtml", rewrite).decode("utf-8")
+    assert seen == [("OEBPS/images/a.png", None), ("OEBPS/text/dos.xhtml", "n1")]
+    assert 'src="/r/OEBPS/images/a.png"' in out and 'href="/r/OEBPS/text/dos.xhtml#n1"' in out
+    assert 'href="#local"' in out and 'href="https://example.com/x"' in out and 'src="data:image/png;base64,AA"' in out
+    assert "a\u00a0b" in out
@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+import backend.crud as crud
+import backend.fulltext as fulltext
+
+
+def _add(db, title, author, category):
+    return crud.create_book(db, title=title, author=author, category=category, cover_image_url=None, file_path=f"books/{title}.pdf")
+
+
+def test_match_expression_quotes_words_as_prefixes():
+    assert fulltext.match_expression('cien "años" OR NOT') == '"cien"* "años"* "OR"* "NOT"*'
+    assert fulltext.match_expression("garcía", "author") == 'author : "garcía"*'
+    assert fulltext.match_expression(" -- ") is None
+
+
+def test_search_is_accent_insensitive_ranked_and_kept_in_sync(db_session):
+    db = db_session
+    novela = _add(db, "Cien años de soledad", "Gabriel García Márquez", "Novela")
+    _add(db, "Crónica de una muerte anunciada", "Gabriel García Márquez", "Novela")
+    _add(db, "Ensayos", "Otro Autor", "Soledad")
+
+    assert {b.title for b in crud.get_books(db, search="garcia marquez")} == {
+        "Crónica de una muerte anunciada", "Cien años de soledad"}
+    # El título pesa más que la categoría
+    assert [b.title for b in crud.get_books(db, search="soledad")] == ["Cien años de soledad", "Ensayos"]
+    assert [b.title for b in crud.get_books(db, search="soledad", category="Novela")] == ["Cien años de soledad"]
+    assert [b.title for b in crud.get_books_by_partial_title(db, "cien an")] == ["Cien años de soledad"]
+    assert crud.get_books(db, author="garcia", search="cronica")[0].title == "Crónica de una muerte anunciada"
+
+    crud.update_book(db, novela.id, title="El otoño del patriarca", author="Gabriel García Márquez", cover_image_url=None)
+    assert crud.get_books_by_partial_title(db, "cien") == []
+    assert [b.id for b in crud.get_books_by_partial_title(db, "otono")] == [novela.id]
+
+    crud.delete_book(db, novela.id)
+    assert crud.get_books_by_partial_title(db, "otono") == []
+
+
+def test_ensure_books_fts_indexes_an_existing_library():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE books (id INTEGER PRIMARY KEY, title VARCHAR, author VARCHAR, category VARCHAR)")
+        conn.exec_driver_sql("INSERT INTO books VALUES (1, 'Rayuela', 'Julio Cortázar', 'Novela')")
+
+    assert fulltext.ensure_books_fts(engine)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT rowid FROM books_fts WHERE books_fts MATCH 'cortazar'").all()
+    assert rows == [(1,)]
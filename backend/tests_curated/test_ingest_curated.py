@@ -0,0 +1,147 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend import ingest
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("file_path", ["libro.epub", "libro.pdf"])
+async def test_run_pipeline_overlaps_analysis_with_local_stages(monkeypatch, file_path):
+    analysis_started = threading.Event()
+    full_text_started, release_full_text = threading.Event(), threading.Event()
+
+    def fake_cover(file_path, covers_dir_fs, covers_url_prefix):
+        # Solo termina si el análisis de IA ya está en marcha (ejecución solapada)
+        assert analysis_started.wait(timeout=2)
+        return f"{covers_url_prefix}/cover.jpg"
+
+    def fake_full_text(file_path):
+        full_text_started.set()
+        assert release_full_text.wait(timeout=5)
+        return {"passages": [], "chunks": ["uno", "dos"]}
+
+    async def fake_analyze(text):
+        # El texto completo ya se está leyendo mientras la IA analiza
+        assert full_text_started.wait(timeout=2)
+        analysis_started.set()
+        await asyncio.sleep(0)
+        return {"title": "T", "author": "A", "category": "C", "seen": text}
+
+    def fake_read_pdf(file_path, covers_dir_fs, covers_url_prefix, with_cover=True):
+        assert not with_cover
+        return {"text": "extracto", "metadata": {}, "page_count": 1, "cover_image_url": None}
+
+    monkeypatch.setattr(ingest, "extract_excerpt", lambda p: "extracto")
+    monkeypatch.setattr(ingest, "read_pdf", fake_read_pdf)
+    monkeypatch.setattr(ingest.local_metadata, "from_epub", lambda p: {})
+    monkeypatch.setattr(ingest, "extract_cover", fake_cover)
+    monkeypatch.setattr(ingest.covers, "make_placeholder", lambda path: None)
+    monkeypatch.setattr(ingest, "extract_full_text", fake_full_text)
+
+    res = await ingest.run_pipeline(file_path, "/tmp", "static/covers", fake_analyze)
+    assert res["metadata"]["seen"] == "extracto"
+    assert res["cover_image_url"] == "static/covers/cover.jpg"
+    assert res["text"] == "extracto"
+    # La respuesta no espera al texto completo: la tarea sigue en marcha
+    assert not res["full_text"].done()
+    release_full_text.set()
+    assert (await res["full_text"])["chunks"] == ["uno", "dos"]
+
+
+@pytest.mark.asyncio
+async def test_background_index_book_reads_the_full_text_once(monkeypatch, tmp_path):
+    from backend import main, rag
+
+    pdf = tmp_path / "libro.pdf"
+    _make_pdf(pdf, pages=3)
+    reads = []
+    real_pages = ingest.fulltext.iter_page_texts
+    monkeypatch.setattr(ingest.fulltext, "iter_page_texts", lambda p: reads.append(p) or real_pages(p))
+    indexed = {}
+
+    def fake_content(book_id, file_path, force=True, passages=None):
+        indexed["passages"] = passages
+        return len(passages)
+
+    async def fake_process(file_path, book_id, chunks=None):
+        indexed.update(book_id=book_id, chunks=chunks)
+
+    monkeypatch.setattr(main, "index_book_content", fake_content)
+    monkeypatch.setattr(rag, "process_book_for_rag", fake_process)
+    monkeypatch.setattr(rag, "chunk_text", lambda text: [text])
+
+    full_text = asyncio.ensure_future(asyncio.to_thread(ingest.extract_full_text, str(pdf)))
+    await main.background_index_book(7, str(pdf), full_text)
+    assert reads == [str(pdf)] and indexed["book_id"] == "7"
+    # Lo mismo que leería cada indexación por su cuenta
+    assert indexed["passages"] == list(ingest.fulltext.iter_passages(str(pdf)))
+    assert indexed["chunks"] == [rag.extract_text(str(pdf))]
+
+
+def test_extract_cover_errors_do_not_propagate(monkeypatch):
+    def boom(*_args):
+        raise RuntimeError("imagen corrupta")
+
+    monkeypatch.setattr(ingest, "extract_pdf_cover", boom)
+    assert ingest.extract_cover("x.pdf", "/tmp", "static/covers") is None
+
+
+def test_extract_excerpt_rejects_unsupported_type():
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException) as e:
+        ingest.extract_excerpt("notas.txt")
+    assert e.value.status_code == 400
+
+
+def _make_pdf(path, pages=3, image_on_page=None, image_size=(500, 500)):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Pagina {i + 1} del libro de prueba")
+        if i == image_on_page:
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, *image_size), False)
+            pix.clear_with(200)
+            page.insert_image(fitz.Rect(72, 100, 372, 400), pixmap=pix)
+    doc.set_metadata({"title": "Libro de prueba", "author": "Autora"})
+    doc.save(str(path))
+    doc.close()
+
+
+def test_read_pdf_single_pass_reads_text_metadata_and_cover(tmp_path):
+    pdf = tmp_path / "libro.pdf"
+    _make_pdf(pdf, pages=3, image_on_page=1)
+
+    res = ingest.read_pdf(str(pdf), str(tmp_path), "static/covers")
+    assert "Pagina 1" in res["text"]
+    assert res["metadata"]["title"] == "Libro de prueba"
+    assert res["page_count"] == 3
+    assert res["cover_image_url"] == "static/covers/cover_libro.pdf.jpg"
+    assert (tmp_path / "cover_libro.pdf.jpg").exists()
+
+
+def test_read_pdf_cover_scan_is_bounded_and_falls_back_to_page_render(tmp_path, monkeypatch):
+    import fitz
+
+    pdf = tmp_path / "sin_portada.pdf"
+    _make_pdf(pdf, pages=4, image_on_page=3)
+    monkeypatch.setattr(ingest, "COVER_SCAN_PAGES", 2)
+
+    decoded = []
+    real_pixmap = fitz.Pixmap
+
+    def spy_pixmap(*args):
+        decoded.append(args)
+        return real_pixmap(*args)
+
+    monkeypatch.setattr(fitz, "Pixmap", spy_pixmap)
+    res = ingest.read_pdf(str(pdf), str(tmp_path), "static/covers")
+
+    # La imagen de la página 4 queda fuera del límite: no se decodifica y se renderiza la página 1
+    assert decoded == []
+    assert res["cover_image_url"] == "static/covers/cover_sin_portada.pdf.jpg"
+    assert (tmp_path / "cover_sin_portada.pdf.jpg").exists()
@@ -0,0 +1,80 @@
+from fastapi.testclient import TestClient
+
+import backend.crud as crud
+import backend.library_version as library_version
+import backend.models as models
+
+
+def test_version_increases_with_every_write(db_session):
+    db = db_session
+    assert crud.get_library_version(db) == 0
+    book = crud.create_book(db, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")
+    after_insert = crud.get_library_version(db)
+    assert after_insert > 0
+
+    crud.update_book(db, book.id, title="Rayuela", author="Julio Cortázar", cover_image_url=None)
+    after_update = crud.get_library_version(db)
+    assert after_update > after_insert
+
+    # También las escrituras que no pasan por el ORM
+    db.execute(models.Book.__table__.delete())
+    db.commit()
+    assert crud.get_library_version(db) > after_update
+
+
+
+def test_etag_matching():
+    tag = library_version.etag(3, "/books/", [("sort", "title")])
+    assert tag.startswith('W/"3-')
+    assert tag != library_version.etag(4, "/books/", [("sort", "title")])
+    assert tag != library_version.etag(3, "/books/", [("sort", "author")])
+    assert library_version.matches(tag, tag)
+    assert library_version.matches(f'"otro", {tag.removeprefix("W/")}', tag)
+    assert library_version.matches("*", tag)
+    assert not library_version.matches(None, tag)
+    assert not library_version.matches('W/"2-abc"', tag)
+
+
+def test_list_endpoints_answer_304_until_the_library_changes(monkeypatch, session_factory, db_session):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "SessionLocal", session_factory)
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    crud.create_book(db_session, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")
+    client = TestClient(main.app)
+
+    for path in ("/books/count", "/categories/", "/books/?sort=title"):
+        first = client.get(path)
+        assert first.status_code == 200
+        tag = first.headers["etag"]
+        assert first.headers["cache-control"] == "no-cache"
+
+        cached = client.get(path, headers={"If-None-Match": tag})
+        assert cached.status_code == 304 and cached.content == b""
+        assert cached.headers["etag"] == tag
+
+    tag = client.get("/books/count").headers["etag"]
+    # Otros parámetros, otro ETag
+    assert client.get("/books/?sort=author").headers["etag"] != client.get("/books/?sort=title").headers["etag"]
+
+    crud.create_book(db_session, "Ficciones", "Borges", "Cuento", None, "books/ficciones.pdf")
+    changed = client.get("/books/count", headers={"If-None-Match": tag})
+    assert changed.status_code == 200 and changed.json() == 2
+    assert changed.headers["etag"] != tag
+
+
+def test_rag_changes_bump_their_own_counter_not_the_catalog(monkeypatch, session_factory, db_session):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "SessionLocal", session_factory)
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    db = db_session
+    crud.create_book(db, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")
+    catalog = crud.get_library_version(db)
+    assert crud.get_rag_version(db) == 0
+
+    library_version.bump_rag()
+    library_version.bump_rag()
+    assert crud.get_rag_version(db) == 2
+    # Indexar o borrar vectores no invalida los listados del catálogo
+    assert crud.get_library_version(db) == catalog
@@ -0,0 +1,65 @@
+import zipfile
+
+import pytest
+
+from backend import ingest, local_metadata
+
+CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+OPF = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">
+    <dc:title>El nombre del viento</dc:title>
+    <dc:creator opf:role="aut">Patrick Rothfuss</dc:creator>
+    <dc:creator opf:role="trl">Gemma Rovira</dc:creator>
+    <dc:subject>Fantasía</dc:subject>
+  </metadata>
+</package>"""
+
+
+def _make_epub(path):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("mimetype", "application/epub+zip")
+        zf.writestr("META-INF/container.xml", CONTAINER)
+        zf.writestr("OEBPS/content.opf", OPF)
+    return str(path)
+
+
+def test_read_epub_opf_keeps_authors_only(tmp_path):
+    local = local_metadata.from_epub(_make_epub(tmp_path / "libro.epub"))
+    assert local == {"title": "El nombre del viento", "author": "Patrick Rothfuss", "category": "Fantasía", "confidence": 1.0}
+    assert not local_metadata.needs_ai(local)
+
+
+def test_junk_pdf_metadata_is_low_confidence():
+    local = local_metadata.from_info({"title": "Microsoft Word - borrador.docx", "author": "Admin"})
+    assert local["confidence"] == 0.0
+    assert local_metadata.needs_ai(local)
+    # La IA manda; lo local solo rellena huecos
+    merged = local_metadata.combine(local_metadata.from_info({"title": "Titulo real", "author": "admin"}),
+                                    {"title": "Desconocido", "author": "Autora", "category": "Ensayo"})
+    assert merged == {"title": "Titulo real", "author": "Autora", "category": "Ensayo"}
+
+
+def test_confident_metadata_only_takes_category_from_ai():
+    local = local_metadata.from_info({"title": "Libro", "author": "Autora"})
+    assert local_metadata.needs_ai(local)
+    merged = local_metadata.combine(local, {"title": "Otro", "author": "Otra", "category": "Historia"})
+    assert merged == {"title": "Libro", "author": "Autora", "category": "Historia"}
+
+
+@pytest.mark.asyncio
+async def test_run_pipeline_skips_ai_when_epub_metadata_is_complete(tmp_path, monkeypatch):
+    epub = _make_epub(tmp_path / "libro.epub")
+    monkeypatch.setattr(ingest, "extract_excerpt", lambda p: "extracto")
+    monkeypatch.setattr(ingest, "extract_cover", lambda *args: None)
+
+    async def analyze(text):
+        raise AssertionError("no debería llamarse a la IA")
+
+    res = await ingest.run_pipeline(epub, str(tmp_path), "static/covers", analyze)
+    assert res["metadata"] == {"title": "El nombre del viento", "author": "Patrick Rothfuss", "category": "Fantasía"}
+    await res["full_text"]
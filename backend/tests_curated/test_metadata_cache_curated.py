@@ -0,0 +1,63 @@
+import json
+
+import google.generativeai as genai
+import pytest
+
+
+@pytest.fixture
+def main(monkeypatch, session_factory):
+    import backend.main as main
+
+    monkeypatch.setenv("DISABLE_AI", "0")
+    monkeypatch.setattr(main, "AI_ENABLED", True)
+    monkeypatch.setattr(main.database, "SessionLocal", session_factory)
+    return main
+
+
+def _fake_model(prompts, batch_reply):
+    class FakeModel:
+        def __init__(self, *_args, **_kwargs):
+            pass
+
+        async def generate_content_async(self, prompt):
+            prompts.append(prompt)
+
+            class R:
+                pass
+
+            r = R()
+            if "array JSON" in prompt:
+                r.text = batch_reply
+            else:
+                r.text = '{"title": "Suelto", "author": "Autor", "category": "Cat"}'
+            return r
+
+    return FakeModel
+
+
+@pytest.mark.asyncio
+async def test_batch_analysis_uses_one_call_and_persistent_cache(main, monkeypatch):
+    prompts = []
+    reply = json.dumps([
+        {"index": 1, "title": "B", "author": "Autor B", "category": "Cat"},
+        {"index": 0, "title": "A", "author": "Autor A", "category": "Cat"},
+    ])
+    monkeypatch.setattr(genai, "GenerativeModel", _fake_model(prompts, reply))
+
+    res = await main.analyze_metadata_batch(["texto a", "texto b", "texto a"])
+    assert [r["title"] for r in res] == ["A", "B", "A"]
+    assert len(prompts) == 1
+
+    # Mismo texto y modelo: se responde desde la caché sin llamar a la IA
+    assert (await main.analyze_metadata("texto b"))["title"] == "B"
+    assert len(prompts) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_parse_failure_falls_back_to_single_calls(main, monkeypatch):
+    prompts = []
+    monkeypatch.setattr(genai, "GenerativeModel", _fake_model(prompts, "no es json"))
+
+    res = await main.analyze_books_with_gemini(["uno", "dos"])
+    assert [r["title"] for r in res] == ["Suelto", "Suelto"]
+    assert len(prompts) == 3
@@ -0,0 +1,123 @@
+import io
+import os
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import backend.crud as crud
+import backend.page_render as page_render
+
+
+def _make_pdf(path, pages=4):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=400, height=600)
+        page.insert_text((72, 100), f"Capitulo {i + 1} de la ballena")
+    doc.save(str(path))
+    doc.close()
+
+
+def _client(tmp_path, monkeypatch, session_factory):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    monkeypatch.setattr(page_render, "PAGE_CACHE_DIR", tmp_path / "page_cache")
+    monkeypatch.setattr(page_render, "PREFETCH_PAGES", 0)
+    pdf = tmp_path / "libro.pdf"
+    _make_pdf(pdf)
+    epub = tmp_path / "libro.epub"
+    epub.write_bytes(b"PK")
+    db = session_factory()
+    book = crud.create_book(db, "Moby Dick", "Melville", "Novela", None, str(pdf), content_hash="feedbeef")
+    other = crud.create_book(db, "Otro", "Autor", "Novela", None, str(epub))
+    return TestClient(main.app), book.id, other.id
+
+
+def test_page_image_is_rendered_once_and_revalidated(tmp_path, monkeypatch, session_factory):
+    client, book_id, epub_id = _client(tmp_path, monkeypatch, session_factory)
+
+    assert client.get(f"/books/{book_id}/pages").json() == {"book_id": book_id, "page_count": 4}
+    r = client.get(f"/books/{book_id}/pages/2/image", params={"width": 612})
+    assert r.status_code == 200 and r.headers["content-type"] == "image/webp"
+    assert r.headers["etag"] == '"feedbeef-p2-w600"'
+    with Image.open(io.BytesIO(r.content)) as img:
+        assert img.format == "WEBP" and img.width == 600 and img.height == 900
+
+    cached = page_render.cache_path("feedbeef", 2, 600)
+    assert cached.exists()
+    # Un segundo acierto no vuelve a renderizar
+    monkeypatch.setattr(Image, "frombytes", lambda *a, **k: (_ for _ in ()).throw(AssertionError("render")))
+    assert client.get(f"/books/{book_id}/pages/2/image", params={"width": 600}).content == r.content
+    assert client.get(f"/books/{book_id}/pages/2/image", params={"width": 600}, headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+    assert client.get(f"/books/{book_id}/pages/5/image").status_code == 404
+    assert client.get(f"/books/{book_id}/pages/0/text").status_code == 404
+    assert client.get(f"/books/{epub_id}/pages/1/image").status_code == 400
+    assert client.get("/books/999/pages").status_code == 404
+
+
+def test_page_text_layer(tmp_path, monkeypatch, session_factory):
+    client, book_id, _epub_id = _client(tmp_path, monkeypatch, session_factory)
+
+    layer = client.get(f"/books/{book_id}/pages/3/text").json()
+    assert layer["page"] == 3 and layer["width"] == 400 and layer["height"] == 600
+    assert "Capitulo 3 de la ballena" in layer["text"]
+    words = [w[4] for w in layer["words"]]
+    assert words == ["Capitulo", "3", "de", "la", "ballena"]
+    x0, y0, x1, y1, _ = layer["words"][0]
+    assert 70 <= x0 < x1 and y0 < 100 <= y1 + 5
+
+
+def test_prefetch_neighbors_and_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_render, "PAGE_CACHE_DIR", tmp_path / "page_cache")
+    monkeypatch.setattr(page_render, "PREFETCH_PAGES", 2)
+    pdf = tmp_path / "libro.pdf"
+    _make_pdf(pdf)
+
+    page_render.render_page(str(pdf), "abc", 2, 300)
+    futures = page_render.prefetch_neighbors(str(pdf), "abc", 2, 300, total=4)
+    for future in futures:
+        future.result(timeout=10)
+    assert sorted(p.name for p in (tmp_path / "page_cache").glob("*.webp")) == [f"abc-p{n}-w300.webp" for n in (1, 2, 3, 4)]
+    # Ya está todo en caché: nada que encolar
+    assert page_render.prefetch_neighbors(str(pdf), "abc", 2, 300, total=4) == []
+
+    newest = page_render.cache_path("abc", 4, 300)
+    os.utime(newest, (2**31, 2**31))
+    assert page_render.evict(max_bytes=newest.stat().st_size) == 3
+    assert [p.name for p in (tmp_path / "page_cache").glob("*.webp")] == [newest.name]
+
+
+def test_normalize_width():
+    assert page_render.normalize_width(None) == page_render.DEFAULT_WIDTH
+    assert page_render.normalize_width(10) == page_render.MIN_WIDTH
+    assert page_render.normalize_width(10**6) == page_render.MAX_WIDTH
+    assert page_render.normalize_width(824) == 800
+
+
+def test_render_keeps_a_running_total_and_only_scans_over_budget(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "page_cache"
+    monkeypatch.setattr(page_render, "PAGE_CACHE_DIR", cache_dir)
+    monkeypatch.setattr(page_render, "_cache_bytes", {})
+    pdf = tmp_path / "libro.pdf"
+    _make_pdf(pdf)
+    scans = []
+    real_scan = page_render._scan
+    monkeypatch.setattr(page_render, "_scan", lambda: scans.append(1) or real_scan())
+
+    for number in (1, 2, 3):
+        page_render.render_page(str(pdf), "abc", number, 300)
+    page_render.render_page(str(pdf), "abc", 2, 300)  # acierto
+    # Un recorrido inicial; después solo se suma en memoria
+    total = sum(p.stat().st_size for p in cache_dir.glob("*.webp"))
+    assert len(scans) == 1 and page_render._cache_bytes[str(cache_dir)] == total
+
+    # La página siguiente supera el límite: se expulsa (la más antigua primero) hasta el 90 %
+    monkeypatch.setattr(page_render, "MAX_CACHE_BYTES", total + 1)
+    os.utime(page_render.cache_path("abc", 1, 300), (1, 1))
+    page_render.render_page(str(pdf), "abc", 4, 300)
+    assert len(scans) == 2
+    assert not page_render.cache_path("abc", 1, 300).exists() and page_render.cache_path("abc", 4, 300).exists()
+    assert page_render._cache_bytes[str(cache_dir)] == sum(p.stat().st_size for p in cache_dir.glob("*.webp"))
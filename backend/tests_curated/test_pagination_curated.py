@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import event
+
+import backend.crud as crud
+import backend.models as models
+
+
+@pytest.fixture()
+def db(engine, db_session):
+    with engine.begin() as conn:
+        conn.execute(models.Book.__table__.insert(), [
+            {"title": f"Libro {i % 7}", "author": f"Autor {i % 3}", "category": "Novela" if i % 2 else "Ensayo", "file_path": f"books/{i}.pdf"}
+            for i in range(1, 51)
+        ])
+    return db_session
+
+
+def _walk(db, **kwargs):
+    books, cursor, pages = [], None, 0
+    while True:
+        page, cursor = crud.get_books_page(db, cursor=cursor, limit=7, **kwargs)
+        books += page
+        pages += 1
+        if cursor is None:
+            return books, pages
+
+
+@pytest.mark.parametrize("sort", ["recent", "title", "author"])
+def test_cursor_pages_match_offset_order(db, sort):
+    books, pages = _walk(db, sort=sort, category="Novela")
+    expected = crud.get_books(db, category="Novela", sort=sort, limit=1000)
+    assert [b.id for b in books] == [b.id for b in expected]
+    assert len(books) == 25 and pages == 4
+
+
+def test_search_pages_by_relevance_and_rejects_foreign_cursors(db):
+    books, _ = _walk(db, author="Autor 2")
+    assert sorted(b.id for b in books) == [i for i in range(1, 51) if i % 3 == 2]
+
+    _, cursor = crud.get_books_page(db, sort="title", limit=5)
+    with pytest.raises(ValueError):
+        crud.get_books_page(db, sort="author", cursor=cursor)
+    with pytest.raises(ValueError):
+        crud.get_books_page(db, cursor="no-es-un-cursor")
+
+
+def _plan(db, statement, params=()):
+    return " ".join(row[-1] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params).all())
+
+
+def test_keyset_queries_seek_an_index_without_sorting(db):
+    # SQLite añade el rowid a cada índice: el de category ya sirve para filtrar y ordenar por id
+    plan = _plan(db, "SELECT id FROM books WHERE category = 'Novela' AND id < 30 ORDER BY id DESC LIMIT 21")
+    assert "SEARCH books USING COVERING INDEX ix_books_category (category=? AND rowid<?)" in plan, plan
+
+    # La página siguiente por título busca en el índice de coalesce(title, '')
+    _, cursor = crud.get_books_page(db, sort="title", limit=7)
+    statements = []
+    listener = lambda conn, cur, statement, params, context, many: statements.append((statement, params))
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        crud.get_books_page(db, sort="title", cursor=cursor, limit=7)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    plan = _plan(db, *statements[-1])
+    assert "SEARCH books USING INDEX ix_books_title_sort" in plan and "TEMP B-TREE" not in plan, plan
+
+
+def test_books_without_title_or_author_are_paged(db):
+    # Más libros sin título que una página: el cursor de la primera cae en uno de ellos
+    db.execute(models.Book.__table__.update().where(models.Book.id <= 10).values(title=None, author=None))
+    db.commit()
+    for sort in ("title", "author"):
+        books, _ = _walk(db, sort=sort)
+        expected = crud.get_books(db, sort=sort, limit=1000)
+        assert [b.id for b in books] == [b.id for b in expected]
+        assert len(books) == 50 and [b.id for b in books[:10]] == list(range(1, 11))
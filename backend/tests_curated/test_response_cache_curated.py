@@ -0,0 +1,100 @@
+from fastapi.testclient import TestClient
+
+import backend.crud as crud
+from backend import response_cache
+from backend.response_cache import ResponseCache
+
+
+def test_lru_eviction_memory_cap_and_metrics():
+    cache = ResponseCache(max_bytes=10)
+    cache.put(("a",), b"aaaa", {}, 1)
+    cache.put(("b",), b"bbbb", {"X-Next-Cursor": "c"}, 1)
+    assert cache.get(("a",), 1) == (b"aaaa", {})  # `a` pasa a ser la más reciente
+    cache.put(("c",), b"cccc", {}, 1)
+
+    assert cache.get(("b",), 1) is None
+    assert cache.get(("c",), 1) == (b"cccc", {})
+    metrics = cache.metrics()
+    assert metrics["entries"] == 2 and metrics["bytes"] == 8 and metrics["evicted"] == 1
+    assert metrics["hits"] == 2 and metrics["misses"] == 1 and metrics["hit_rate"] == 2 / 3
+
+    # Una respuesta mayor que la cuota no se guarda
+    cache.put(("big",), b"x" * 11, {}, 1)
+    assert cache.get(("big",), 1) is None
+
+
+def test_new_version_discards_everything_and_stale_results_are_not_stored():
+    cache = ResponseCache()
+    for key in (("novela",), ("cuento",), ("n",)):
+        cache.put(key, b"[]", {}, 1)
+    assert cache.get(("novela",), 1) is not None
+
+    # Una lectura con una versión más nueva vacía la caché
+    assert cache.get(("cuento",), 2) is None
+    assert cache.metrics()["entries"] == 0 and cache.metrics()["invalidated"] == 3
+
+    # Calculada con la versión anterior (petición que leyó antes de la escritura): no se guarda
+    cache.put(("tarde",), b"[]", {}, 1)
+    assert cache.get(("tarde",), 1) is None and cache.metrics()["skipped_stale"] == 1
+    cache.put(("n",), b"2", {}, 2)
+    assert cache.get(("n",), 2) == (b"2", {})
+
+
+def test_key_normalization():
+    assert response_cache.normalize_text("  Jorge   LUIS ") == "jorge luis"
+    assert response_cache.normalize_text("   ") is None
+    assert response_cache.make_key("books", b=1, a=2) == response_cache.make_key("books", a=2, b=1)
+
+
+def test_endpoints_serve_from_cache_until_a_write(monkeypatch, session_factory, db_session):
+    from backend import main
+
+    monkeypatch.setattr(main.database, "SessionLocal", session_factory)
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    db = db_session
+    crud.create_book(db, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")
+    crud.create_book(db, "Ficciones", "Borges", "Cuento", None, "books/ficciones.pdf")
+    client = TestClient(main.app)
+    hits = response_cache.cache.metrics()["hits"]
+
+    first = client.get("/books/", params={"category": "Novela"})
+    assert [b["title"] for b in first.json()] == ["Rayuela"]
+    assert client.get("/books/", params={"category": "Cuento"}).status_code == 200
+    assert client.get("/books/count").json() == 2
+    assert client.get("/books/search/", params={"title": " RAYUELA "}).json()[0]["title"] == "Rayuela"
+    # Mismo resultado desde la caché, con su ETag
+    again = client.get("/books/", params={"category": "Novela"})
+    assert again.content == first.content and again.headers["etag"] == first.headers["etag"]
+    assert client.get("/books/search/", params={"title": "rayuela"}).status_code == 200
+    metrics = client.get("/admin/response-cache").json()
+    assert metrics["hits"] - hits == 2 and metrics["entries"] == 4
+
+    # Cualquier escritura sube la versión y la siguiente petición recalcula
+    crud.delete_books_bulk(db, category="Cuento")
+    assert client.get("/books/count").json() == 1
+    assert response_cache.cache.metrics()["entries"] == 1
+
+    book = crud.get_book_by_title(db, "Rayuela")
+    crud.update_book(db, book.id, title="Rayuela (ed. crítica)", author="Cortázar", cover_image_url=None)
+    assert [b["title"] for b in client.get("/books/", params={"category": "Novela"}).json()] == ["Rayuela (ed. crítica)"]
+
+
+def test_writes_from_other_processes_are_not_served_stale(monkeypatch, session_factory, db_session):
+    from sqlalchemy import text
+    from backend import main
+
+    monkeypatch.setattr(main.database, "ReadSessionLocal", session_factory)
+    db = db_session
+    crud.create_book(db, "Rayuela", "Cortázar", "Novela", None, "books/rayuela.pdf")
+    client = TestClient(main.app)
+    first = client.get("/books/", params={"category": "Novela"})
+    assert client.get("/books/count").json() == 1
+
+    # Escritura sin pasar por crud (otro proceso): también sube la versión
+    db.execute(text("INSERT INTO books (title, author, category, file_path) VALUES ('Final del juego', 'Cortázar', 'Novela', 'books/final.pdf')"))
+    db.commit()
+    again = client.get("/books/", params={"category": "Novela"}, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 200 and again.headers["etag"] != first.headers["etag"]
+    assert sorted(b["title"] for b in again.json()) == ["Final del juego", "Rayuela"]
+    assert client.get("/books/count").json() == 2
+    assert client.get("/books/search/", params={"title": "final"}).json()[0]["title"] == "Final del juego"
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+from backend import temp_store
+
+
+def _write(path, size):
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_sweep_expires_entries_and_their_rag_vectors(tmp_path, monkeypatch):
+    deleted = []
+    monkeypatch.setattr("backend.rag.delete_book_from_rag", deleted.append)
+    store = temp_store.TempStore(str(tmp_path), default_ttl=60, quota_bytes=10_000)
+
+    store.register(_write(tmp_path / "rag.pdf", 10), ttl=1, rag_book_id="uuid-1")
+    store.register(_write(tmp_path / "vigente.pdf", 10))
+
+    metrics = store.sweep(now=time.time() + 5)
+    assert not (tmp_path / "rag.pdf").exists() and (tmp_path / "vigente.pdf").exists()
+    assert deleted == ["uuid-1"]
+    assert metrics["expired"] == 1 and metrics["rag_indexes_deleted"] == 1 and metrics["entries"] == 1
+
+
+def test_slow_rag_cleanup_does_not_block_register_or_touch(tmp_path, monkeypatch):
+    cleaning, release = threading.Event(), threading.Event()
+
+    def slow_delete(book_id):
+        cleaning.set()
+        assert release.wait(timeout=5)
+
+    monkeypatch.setattr("backend.rag.delete_book_from_rag", slow_delete)
+    store = temp_store.TempStore(str(tmp_path), default_ttl=60, quota_bytes=10_000)
+    store.register(_write(tmp_path / "rag.pdf", 10), ttl=1, rag_book_id="uuid-1")
+    sweeper = threading.Thread(target=store.sweep, kwargs={"now": time.time() + 5})
+    sweeper.start()
+    try:
+        assert cleaning.wait(timeout=5)
+        # El barrido está esperando a RAG: registrar y tocar no esperan al barrido
+        done = threading.Event()
+        worker = threading.Thread(target=lambda: (store.register(_write(tmp_path / "nuevo.pdf", 10)), store.touch("nuevo.pdf"), done.set()))
+        worker.start()
+        assert done.wait(timeout=1)
+    finally:
+        release.set()
+        sweeper.join()
+    assert store.metrics()["expired"] == 1 and "nuevo.pdf" in store._entries
+
+
+def test_quota_evicts_least_recently_used_and_adopts_orphans(tmp_path):
+    store = temp_store.TempStore(str(tmp_path), default_ttl=3600, quota_bytes=250)
+    store.register(_write(tmp_path / "a.pdf", 100))
+    store.register(_write(tmp_path / "b.pdf", 100))
+    store.touch("a.pdf")
+    old = _write(tmp_path / "huerfano.pdf", 100)
+    os.utime(old, (time.time() - 10, time.time() - 10))
+    _write(tmp_path / "subida.epub.upload", 100)
+
+    metrics = store.sweep()
+    assert metrics["adopted"] == 1
+    # Orden LRU: huerfano (más antiguo) sale primero; la subida en curso no se toca
+    assert sorted(os.listdir(tmp_path)) == ["a.pdf", "b.pdf", "subida.epub.upload"]
+
+    # El índice sobrevive a un reinicio
+    assert temp_store.TempStore(str(tmp_path)).metrics()["entries"] == 2
+
+
+def test_index_lives_outside_the_served_directory(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    served = tmp_path / "temp_books"
+    served.mkdir()
+    (served / temp_store.LEGACY_INDEX_NAME).write_text('{"viejo.pdf": {"created_at": 0, "last_access": 0, "expires_at": 1e12, "size": 1, "rag_book_id": null}}')
+    store = temp_store.TempStore(str(served), index_path=str(tmp_path / "index.json"))
+    assert "viejo.pdf" in store._entries and os.listdir(served) == []
+    store.register(_write(served / "nuevo.pdf", 10))
+    assert (tmp_path / "index.json").exists() and sorted(os.listdir(served)) == ["nuevo.pdf"]
+
+    (main.TEMP_BOOKS_DIR_FS / ".oculto").write_text("x")
+    try:
+        assert TestClient(main.app).get("/temp_books/.oculto").status_code == 404
+    finally:
+        (main.TEMP_BOOKS_DIR_FS / ".oculto").unlink()
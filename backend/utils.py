@@ -1,12 +1,8 @@
 import os
 import google.generativeai as genai
 from dotenv import load_dotenv
-import io
+import hashlib
 import tempfile
-import zipfile
-import pathlib
-from weasyprint import HTML, CSS
-from bs4 import BeautifulSoup
 
 def configure_genai():
     load_dotenv()
@@ -43,72 +39,29 @@ def is_allowed_file(filename: str, allowed_extensions: set) -> bool:
     """
     return get_file_extension(filename) in allowed_extensions
 
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 def convert_epub_bytes_to_pdf_bytes(epub_content: bytes) -> bytes:
     """
     Convierte el contenido de un archivo EPUB (en bytes) a un archivo PDF (en bytes).
-    Esta es una función compleja que extrae el contenido del EPUB y lo renderiza.
+    Envoltorio de `conversion.convert_epub_to_pdf`, que trabaja con archivos en disco.
     """
+    from .conversion import convert_epub_to_pdf
     try:
         with tempfile.TemporaryDirectory() as temp_dir:
-            # 1. Extraer el EPUB a una carpeta temporal
-            with zipfile.ZipFile(io.BytesIO(epub_content), 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            # 2. Encontrar el archivo .opf (el "manifiesto" del libro)
-            opf_path = next(pathlib.Path(temp_dir).rglob('*.opf'), None)
-            if not opf_path:
-                raise Exception("No se pudo encontrar el archivo .opf en el EPUB.")
-            content_root = opf_path.parent
-
-            # 3. Leer y analizar el manifiesto .opf
-            with open(opf_path, 'rb') as f:
-                opf_soup = BeautifulSoup(f, 'lxml-xml')
-
-            # 4. Crear una página de portada si se encuentra
-            html_docs = []
-            cover_meta = opf_soup.find('meta', {'name': 'cover'})
-            if cover_meta:
-                cover_id = cover_meta.get('content')
-                cover_item = opf_soup.find('item', {'id': cover_id})
-                if cover_item:
-                    cover_href = cover_item.get('href')
-                    cover_path = content_root / cover_href
-                    if cover_path.exists():
-                        cover_html_string = f"<html><body style='text-align: center; margin: 0; padding: 0;'><img src='{cover_path.as_uri()}' style='width: 100%; height: 100%; object-fit: contain;'/></body></html>"
-                        html_docs.append(HTML(string=cover_html_string))
-
-            # 5. Encontrar y leer todos los archivos CSS
-            stylesheets = []
-            css_items = opf_soup.find_all('item', {'media-type': 'text/css'})
-            for css_item in css_items:
-                css_href = css_item.get('href')
-                if css_href:
-                    css_path = content_root / css_href
-                    if css_path.exists():
-                        stylesheets.append(CSS(filename=css_path))
-
-            # 6. Encontrar el orden de lectura (spine) y añadir los capítulos
-            spine_ids = [item.get('idref') for item in opf_soup.find('spine').find_all('itemref')]
-            html_paths_map = {item['id']: item['href'] for item in opf_soup.find_all('item', {'media-type': 'application/xhtml+xml'})}
-            
-            for chapter_id in spine_ids:
-                href = html_paths_map.get(chapter_id)
-                if href:
-                    chapter_path = content_root / href
-                    if chapter_path.exists():
-                        html_docs.append(HTML(filename=chapter_path, encoding='utf-8'))
-
-            if not html_docs:
-                raise Exception("No se encontró contenido HTML en el EPUB.")
-
-            # 7. Renderizar y unir todos los documentos
-            first_doc = html_docs[0].render(stylesheets=stylesheets)
-            all_pages = [p for doc in html_docs[1:] for p in doc.render(stylesheets=stylesheets).pages]
-            
-            pdf_bytes_io = io.BytesIO()
-            first_doc.copy(all_pages).write_pdf(target=pdf_bytes_io)
-            return pdf_bytes_io.getvalue()
-
+            epub_path = os.path.join(temp_dir, "libro.epub")
+            pdf_path = os.path.join(temp_dir, "libro.pdf")
+            with open(epub_path, "wb") as f:
+                f.write(epub_content)
+            convert_epub_to_pdf(epub_path, pdf_path)
+            with open(pdf_path, "rb") as f:
+                return f.read()
     except Exception as e:
         # En caso de un error de conversión, lo relanzamos para que el endpoint lo maneje
         raise RuntimeError(f"Error durante la conversión de EPUB a PDF: {e}") from e
@@ -128,18 +81,11 @@ def extract_text_from_pdf(file_path: str, max_pages: int = 5) -> str:
         return ""
 
 def extract_text_from_epub(file_path: str, max_chars: int = 5000) -> str:
-    """Extrae texto de un EPUB usando ebooklib."""
-    import ebooklib
-    from ebooklib import epub
+    """Extrae el texto de un EPUB en orden de lectura usando `epub_engine`."""
+    from .epub_engine import open_epub
     try:
-        book = epub.read_epub(file_path)
-        text = ""
-        for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
-            soup = BeautifulSoup(item.get_content(), 'html.parser')
-            text += soup.get_text(separator=' ') + "\n"
-            if len(text) > max_chars:
-                break
-        return text
+        with open_epub(file_path) as book:
+            return book.text(max_chars=max_chars)
     except Exception as e:
         print(f"Error al extraer texto de EPUB {file_path}: {e}")
         return ""
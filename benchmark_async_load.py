@@ -0,0 +1,163 @@
+"""Latencia p99 de la API con tráfico mixto: sesión síncrona frente a aiosqlite en endpoints `async`.
+
+Un endpoint `async def` que usa una `Session` síncrona bloquea el bucle de
+eventos mientras dura la consulta: cualquier otra petición (una consulta RAG
+que espera a la IA, una subida, un listado rápido) espera a que termine. Con
+`AsyncSession` + aiosqlite la consulta se ejecuta en otro hilo y el bucle
+sigue atendiendo.
+
+Se montan dos apps FastAPI mínimas con los mismos endpoints `async`, una con
+`crud`/`SessionLocal` (como estaban antes) y otra con `crud_async`/
+`AsyncSessionLocal`, sobre la misma base de datos sintética:
+
+- pesado: recuento con `LIKE '%...%'` que recorre la tabla (como un
+  `/admin/content-index` o un listado sin índice);
+- ligero: un libro por ID (como `upload_book` comprobando duplicados o
+  `/rag/query/` leyendo los metadatos);
+- sin base de datos: un endpoint que solo espera (como la parte de IA).
+
+`--clients` clientes concurrentes lanzan la mezcla durante `--seconds`
+segundos y se informa de la latencia p50/p99 de cada tipo de petición.
+Las consultas siguen compitiendo por la CPU: con pocos núcleos la mejora se
+ve sobre todo en las peticiones que no esperan a la base de datos.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmark_async_load.py [--books 100000] [--clients 20] [--seconds 5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend import crud, crud_async, database, models
+
+# Peso de cada tipo de petición en la mezcla
+MIX = [("pesado", 1), ("ligero", 6), ("sin_bd", 3)]
+
+
+def populate(engine, count: int):
+    with engine.begin() as conn:
+        conn.execute(models.Book.__table__.insert(), [
+            {"title": f"Libro {i} de la colección", "author": f"Autor {i % 500}", "category": f"Categoría {i % 40}", "file_path": f"books/{i}.pdf"}
+            for i in range(count)
+        ])
+
+
+def sync_app(factory) -> FastAPI:
+    """Endpoints `async` con sesión síncrona: la consulta bloquea el bucle."""
+    app = FastAPI()
+
+    def get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/pesado")
+    async def heavy(db: Session = Depends(get_db)):
+        return db.scalar(select(func.count()).select_from(models.Book).where(models.Book.title.like("%999%")))
+
+    @app.get("/ligero/{book_id}")
+    async def light(book_id: int, db: Session = Depends(get_db)):
+        return crud.get_book(db, book_id).title
+
+    @app.get("/sin_bd")
+    async def no_db():
+        await asyncio.sleep(0.001)
+        return "ok"
+
+    return app
+
+
+def async_app(factory) -> FastAPI:
+    """Los mismos endpoints con `AsyncSession` (aiosqlite)."""
+    app = FastAPI()
+
+    async def get_db():
+        async with factory() as db:
+            yield db
+
+    @app.get("/pesado")
+    async def heavy(db: AsyncSession = Depends(get_db)):
+        return await db.scalar(select(func.count()).select_from(models.Book).where(models.Book.title.like("%999%")))
+
+    @app.get("/ligero/{book_id}")
+    async def light(book_id: int, db: AsyncSession = Depends(get_db)):
+        return (await crud_async.get_book(db, book_id)).title
+
+    @app.get("/sin_bd")
+    async def no_db():
+        await asyncio.sleep(0.001)
+        return "ok"
+
+    return app
+
+
+async def load(app: FastAPI, books: int, clients: int, seconds: float) -> dict[str, list[float]]:
+    latencies = {kind: [] for kind, _ in MIX}
+    kinds = [kind for kind, weight in MIX for _ in range(weight)]
+    stop = time.perf_counter() + seconds
+
+    async def client(index: int):
+        rng = random.Random(index)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            while time.perf_counter() < stop:
+                kind = rng.choice(kinds)
+                url = f"/ligero/{rng.randint(1, books)}" if kind == "ligero" else f"/{kind}"
+                start = time.perf_counter()
+                r = await http.get(url)
+                r.raise_for_status()
+                latencies[kind].append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return latencies
+
+
+def summary(values: list[float]) -> str:
+    if not values:
+        return "sin datos"
+    values = sorted(values)
+    p99 = values[max(int(len(values) * 0.99) - 1, 0)]
+    return f"{len(values):6d} peticiones  p50 {statistics.median(values) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=100_000, help="Libros sintéticos")
+    parser.add_argument("--clients", type=int, default=20, help="Clientes concurrentes")
+    parser.add_argument("--seconds", type=float, default=5, help="Duración de cada prueba")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        setup = database.create_sqlite_engine(f"sqlite:///{path}")
+        models.Base.metadata.create_all(bind=setup)
+        populate(setup, args.books)
+
+        sync_factory = sessionmaker(bind=setup)
+        async_engine = database.create_async_sqlite_engine(f"sqlite+aiosqlite:///{path}", pool_size=args.clients)
+        async_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+        for name, app in (("Session síncrona", sync_app(sync_factory)), ("AsyncSession (aiosqlite)", async_app(async_factory))):
+            latencies = asyncio.run(load(app, args.books, args.clients, args.seconds))
+            print(name)
+            for kind, _ in MIX:
+                print(f"  {kind:7s} {summary(latencies[kind])}")
+
+        asyncio.run(async_engine.dispose())
+        setup.dispose()
+
+
+if __name__ == "__main__":
+    main()
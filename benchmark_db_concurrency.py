@@ -0,0 +1,138 @@
+"""Mide lecturas del catálogo mientras otro hilo escribe en la base de datos.
+
+Compara el engine anterior (`create_engine` sin ajustes: diario `DELETE`,
+sin `mmap` ni caché extra) con los engines de `backend/database.py` (WAL,
+`synchronous=NORMAL`, `busy_timeout` y pool de lectura `query_only`).
+
+Durante `--seconds` segundos un hilo escribe transacciones grandes (un libro
+y 500 fragmentos de contenido, como la indexación en segundo plano) y `--readers`
+hilos piden páginas de `/books/`. El escritor es otro proceso, como la
+importación masiva o un segundo worker de la API. Se informa de las lecturas por segundo, de
+la latencia p50/p99 y de los errores "database is locked".
+
+Uso (desde la raíz del proyecto):
+
+    python benchmark_db_concurrency.py [--books 20000] [--readers 2] [--seconds 5] [--dir .]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, database, models
+
+
+def populate(engine, count: int):
+    with engine.begin() as conn:
+        conn.execute(models.Book.__table__.insert(), [
+            {"title": f"Libro {i}", "author": f"Autor {i % 500}", "category": f"Categoría {i % 40}", "file_path": f"books/{i}.pdf"}
+            for i in range(count)
+        ])
+
+
+def write_loop(url: str, tuned: bool, seconds: float, result):
+    """Proceso escritor: como la indexación del contenido, muchas filas por transacción."""
+    engine = database.create_sqlite_engine(url) if tuned else create_engine(url)
+    factory = sessionmaker(bind=engine)
+    stop = time.perf_counter() + seconds
+    n = errors = 0
+    while time.perf_counter() < stop:
+        db = factory()
+        try:
+            db.execute(models.BookPassage.__table__.insert(), [
+                {"book_id": n % 1000, "page": i, "char_offset": 0, "text": f"Texto de la página {i} del libro {n} " * 20}
+                for i in range(200)
+            ])
+            db.add(models.Book(title=f"Nuevo {n}", author="Autor nuevo", category="Nuevos", file_path=f"new/{n}.pdf"))
+            db.commit()
+            n += 1
+        except OperationalError:
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+    result.put((n, errors))
+
+
+def run(url: str, tuned: bool, read_engine, readers: int, seconds: float) -> dict:
+    read_factory = sessionmaker(bind=read_engine)
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    # El escritor va en otro proceso (como la importación masiva) para no competir por el GIL
+    ctx = multiprocessing.get_context("spawn")
+    result = ctx.Queue()
+    proc = ctx.Process(target=write_loop, args=(url, tuned, seconds, result))
+    proc.start()
+    time.sleep(1)  # arranque del proceso
+    stop = time.perf_counter() + seconds - 1
+
+    def reader(index: int):
+        nonlocal errors
+        category = f"Categoría {index % 40}"
+        while time.perf_counter() < stop:
+            db = read_factory()
+            start = time.perf_counter()
+            try:
+                crud.get_books_page(db, category=category, limit=20)
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                with lock:
+                    errors += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writes, write_errors = result.get()
+    proc.join()
+    latencies.sort()
+    return {
+        "reads_per_second": len(latencies) / (seconds - 1),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else float("nan"),
+        "writes": writes,
+        "errors": {"read": errors, "write": write_errors},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=20_000, help="Libros iniciales")
+    parser.add_argument("--readers", type=int, default=2, help="Hilos de lectura")
+    parser.add_argument("--seconds", type=float, default=5, help="Duración de cada prueba")
+    parser.add_argument("--dir", default=".", help="Directorio para las bases de datos temporales")
+    args = parser.parse_args()
+
+    # En el disco del proyecto: en /tmp (tmpfs) el coste de fsync no se vería
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for name in ("anterior", "ajustado"):
+            url = f"sqlite:///{os.path.join(tmp, name + '.db')}"
+            tuned = name == "ajustado"
+            if tuned:
+                read_engine = database.create_sqlite_engine(url, readonly=True, pool_size=args.readers, max_overflow=args.readers)
+            else:
+                read_engine = create_engine(url, connect_args={"check_same_thread": False})
+            setup = database.create_sqlite_engine(url) if tuned else create_engine(url)
+            models.Base.metadata.create_all(bind=setup)
+            populate(setup, args.books)
+            setup.dispose()
+            result = run(url, tuned, read_engine, args.readers, args.seconds)
+            print(f"{name}: {result['reads_per_second']:8.0f} lecturas/s  p50 {result['p50_ms']:6.1f} ms  "
+                  f"p99 {result['p99_ms']:7.1f} ms  transacciones de escritura {result['writes']}  errores {result['errors']}")
+            read_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
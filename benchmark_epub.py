@@ -0,0 +1,125 @@
+"""Compara el lector de EPUB anterior (tres parsers) con backend/epub_engine.py.
+
+Antes, un mismo EPUB se abría tres veces: ebooklib + html.parser para el
+texto, `epub.read_epub` para la portada y `extractall` a un directorio
+temporal + BeautifulSoup para preparar la conversión. El motor nuevo abre el
+zip una vez y sirve texto, portada y capítulos.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmark_epub.py [libro.epub ...] [--repeat 5]
+
+Sin argumentos genera un EPUB sintético de 200 capítulos.
+"""
+import argparse
+import io
+import pathlib
+import tempfile
+import time
+import zipfile
+
+from backend.epub_engine import open_epub
+
+
+def make_synthetic_epub(chapters=200, paragraphs=60) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("META-INF/container.xml", (
+            '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles></container>'
+        ))
+        manifest, spine = [], []
+        for i in range(chapters):
+            body = "".join(f"<p>Capítulo {i}, párrafo {j}. " + "Texto de relleno para medir el parser. " * 8 + "</p>" for j in range(paragraphs))
+            zf.writestr(f"OEBPS/ch{i}.xhtml", (
+                '<?xml version="1.0" encoding="utf-8"?><html xmlns="http://www.w3.org/1999/xhtml">'
+                f"<head><title>Capítulo {i}</title></head><body><h1>Capítulo {i}</h1>{body}</body></html>"
+            ))
+            manifest.append(f'<item id="ch{i}" href="ch{i}.xhtml" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="ch{i}"/>')
+        zf.writestr("OEBPS/cover.jpg", b"\xff\xd8\xff\xd9")
+        manifest.append('<item id="cover" href="cover.jpg" media-type="image/jpeg"/>')
+        zf.writestr("OEBPS/content.opf", (
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="2.0" unique-identifier="id">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Sintético</dc:title>'
+            '<dc:identifier id="id">bench</dc:identifier><dc:language>es</dc:language><meta name="cover" content="cover"/></metadata>'
+            f'<manifest>{"".join(manifest)}</manifest><spine>{"".join(spine)}</spine></package>'
+        ))
+    return buffer.getvalue()
+
+
+def legacy(path: str):
+    """Las tres lecturas del código anterior."""
+    import ebooklib
+    from bs4 import BeautifulSoup
+    from ebooklib import epub
+
+    # 1. Texto (utils.extract_text_from_epub)
+    book = epub.read_epub(path)
+    text = ""
+    for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
+        text += BeautifulSoup(item.get_content(), "html.parser").get_text(separator=" ") + "\n"
+
+    # 2. Portada (ingest.extract_epub_cover)
+    book = epub.read_epub(path)
+    cover = next(iter(book.get_items_of_type(ebooklib.ITEM_COVER)), None)
+    if cover is None:
+        cover = next((i for i in book.get_items_of_type(ebooklib.ITEM_IMAGE) if "cover" in i.get_name().lower()), None)
+
+    # 3. Preparación de la conversión (utils.convert_epub_bytes_to_pdf_bytes, sin renderizar)
+    with open(path, "rb") as f:
+        content = f.read()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            zf.extractall(temp_dir)
+        opf_path = next(pathlib.Path(temp_dir).rglob("*.opf"))
+        with open(opf_path, "rb") as f:
+            opf = BeautifulSoup(f, "lxml-xml")
+        hrefs = {i["id"]: i["href"] for i in opf.find_all("item", {"media-type": "application/xhtml+xml"})}
+        chapters = [(opf_path.parent / hrefs[r.get("idref")]).read_bytes() for r in opf.find("spine").find_all("itemref") if r.get("idref") in hrefs]
+    return len(text), cover is not None, len(chapters)
+
+
+def engine(path: str):
+    """Las mismas tres lecturas con una sola apertura del zip."""
+    with open_epub(path) as book:
+        text = book.text()
+        cover = book.cover_item()
+        chapters = [content for _, content in book.iter_documents()]
+    return len(text), cover is not None, len(chapters)
+
+
+def timed(fn, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(path)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("epubs", nargs="*", help="EPUB a medir (por defecto, uno sintético)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones (se toma el mejor tiempo)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.epubs
+        if not paths:
+            synthetic = pathlib.Path(tmp) / "sintetico.epub"
+            synthetic.write_bytes(make_synthetic_epub())
+            paths = [str(synthetic)]
+
+        for path in paths:
+            legacy_time, legacy_result = timed(legacy, path, args.repeat)
+            engine_time, engine_result = timed(engine, path, args.repeat)
+            print(f"{pathlib.Path(path).name}")
+            print(f"  anterior (3 parsers): {legacy_time * 1000:8.1f} ms  (texto={legacy_result[0]} car., portada={legacy_result[1]}, capítulos={legacy_result[2]})")
+            print(f"  epub_engine:          {engine_time * 1000:8.1f} ms  (texto={engine_result[0]} car., portada={engine_result[1]}, capítulos={engine_result[2]})")
+            print(f"  aceleración:          {legacy_time / engine_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Compara la búsqueda del catálogo con LIKE '%término%' y con el índice FTS5.
+
+Genera una base de datos SQLite temporal con N libros sintéticos (por
+defecto 100.000) con el esquema de la aplicación, y mide para varias
+búsquedas típicas la consulta anterior (`ilike` sobre título, autor y
+categoría) frente a `crud.get_books`, que usa `books_fts`.
+
+LIKE solo es rápido cuando el término es tan frecuente que los 20 primeros
+libros por ID ya coinciden; con términos raros, o escritos sin acentos (que
+LIKE no encuentra), recorre la tabla entera. FTS5 consulta el índice y ordena
+por relevancia todas las coincidencias.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmark_search.py [--books 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, desc, or_
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, models
+
+WORDS = [
+    "sombra", "viento", "ciudad", "mar", "noche", "jardín", "memoria", "río", "corazón", "guerra",
+    "silencio", "tiempo", "camino", "fuego", "isla", "invierno", "espejo", "lluvia", "reino", "último",
+]
+NAMES = ["Gabriel", "Isabel", "Julio", "Carmen", "Mario", "Elena", "Jorge", "Ana", "Miguel", "Lucía"]
+SURNAMES = ["García", "Allende", "Cortázar", "Laforet", "Vargas", "Garro", "Borges", "Matute", "Delibes", "Gómez"]
+CATEGORIES = ["Novela", "Ensayo", "Poesía", "Historia", "Ciencia", "Filosofía", "Cuento", "Biografía"]
+QUERIES = ["garcia", "memoria", "cortazar novela", "jardin de invierno", "poesia"]
+
+
+def populate(engine, count: int):
+    rng = random.Random(42)
+    rows = [
+        {
+            "id": i + 1,
+            "title": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).capitalize() + f" {i}",
+            "author": f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}",
+            "category": rng.choice(CATEGORIES),
+            "file_path": f"books/{i}.pdf",
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(models.Book.__table__.insert(), rows)
+
+
+def legacy(db, search: str):
+    """La consulta anterior de `crud.get_books`."""
+    term = f"%{search}%"
+    return (
+        db.query(models.Book)
+        .filter(or_(models.Book.title.ilike(term), models.Book.author.ilike(term), models.Book.category.ilike(term)))
+        .order_by(desc(models.Book.id)).limit(20).all()
+    )
+
+
+def timed(fn, db, query, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        db.expunge_all()
+        start = time.perf_counter()
+        result = fn(db, query)
+        best = min(best, time.perf_counter() - start)
+    return best, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=100_000, help="Libros sintéticos a generar")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones (se toma el mejor tiempo)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        start = time.perf_counter()
+        populate(engine, args.books)
+        print(f"{args.books} libros insertados (con triggers FTS5) en {time.perf_counter() - start:.1f}s")
+
+        db = sessionmaker(bind=engine)()
+        for query in QUERIES:
+            legacy_time, legacy_hits = timed(legacy, db, query, args.repeat)
+            fts_time, fts_hits = timed(lambda s, q: crud.get_books(s, search=q), db, query, args.repeat)
+            print(f"'{query}'")
+            print(f"  LIKE:        {legacy_time * 1000:8.1f} ms  ({legacy_hits} resultados)")
+            print(f"  FTS5 + bm25: {fts_time * 1000:8.1f} ms  ({fts_hits} resultados)")
+            print(f"  aceleración: {legacy_time / fts_time:8.1f}x")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
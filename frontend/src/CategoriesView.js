@@ -38,9 +38,10 @@ function CategoriesView() {
       {error && <p className="error-message">{error}</p>}
       {!loading && (
         <div className="categories-grid">
-          {categories.map((category) => (
-            <Link to={`/?category=${encodeURIComponent(category)}`} key={category} className="category-card">
-              {category}
+          {categories.map(({ name, book_count }) => (
+            <Link to={`/?category=${encodeURIComponent(name)}`} key={name} className="category-card">
+              {name}
+              <span className="category-count">{book_count}</span>
             </Link>
           ))}
         </div>
@@ -12,7 +12,8 @@ function Header() {
   useEffect(() => {
     const fetchBookCount = async () => {
       try {
-        const response = await fetch(`${API_URL}/books/count`);
+        // Revalida con If-None-Match: si la biblioteca no ha cambiado la API responde 304 sin cuerpo
+        const response = await fetch(`${API_URL}/books/count`, { cache: 'no-cache' });
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -22,8 +22,18 @@ const useDebounce = (value, delay) => {
   return debouncedValue;
 };
 
+// Ancho aproximado de la portada en la cuadrícula (ver .book-grid en LibraryView.css)
+const COVER_SIZES = '(max-width: 768px) 45vw, 240px';
+
+const buildSrcSet = (variants, format) =>
+  variants.map(v => `${API_URL}/${v[format]} ${v.width}w`).join(', ');
+
 // Componente para la portada (con fallback a genérica)
-const BookCover = React.memo(({ src, alt, title }) => {
+// El marcador (LQIP) se pinta como fondo difuminado hasta que carga la portada real
+const placeholderStyle = (placeholder) =>
+  placeholder ? { backgroundImage: `url(${placeholder})`, backgroundSize: 'cover' } : undefined;
+
+const BookCover = React.memo(({ src, variants = [], placeholder, alt, title }) => {
   const [hasError, setHasError] = useState(false);
   useEffect(() => { setHasError(false); }, [src]);
   const handleError = () => { setHasError(true); };
@@ -36,16 +46,28 @@ const BookCover = React.memo(({ src, alt, title }) => {
       </div>
     );
   }
-  return (
+  const img = (
     <img
       src={src}
+      srcSet={variants.length ? buildSrcSet(variants, 'jpeg') : undefined}
+      sizes={variants.length ? COVER_SIZES : undefined}
       alt={alt}
       className="book-cover"
+      style={placeholderStyle(placeholder)}
       onError={handleError}
       loading="lazy"
       decoding="async"
     />
   );
+  if (!variants.length) {
+    return img;
+  }
+  return (
+    <picture>
+      <source type="image/webp" srcSet={buildSrcSet(variants, 'webp')} sizes={COVER_SIZES} />
+      {img}
+    </picture>
+  );
 });
 
 const BookCard = React.memo(({ book, isMobile, handleAuthorClick, handleCategoryClick, handleDeleteBook, handleConvertToPdf, handleEditClick, convertingId, showConvertButton }) => {
@@ -67,6 +89,8 @@ const BookCard = React.memo(({ book, isMobile, handleAuthorClick, handleCategory
       </div>
       <BookCover
         src={book.cover_image_url ? `${API_URL}/${book.cover_image_url}` : ''}
+        variants={book.cover_variants}
+        placeholder={book.cover_placeholder}
         alt={`Portada de ${book.title}`}
         title={book.title}
       />
@@ -127,12 +151,15 @@ function LibraryView() {
   const [loading, setLoading] = useState(false);
   const [isMobile, setIsMobile] = useState(false);
   const [searchMode, setSearchMode] = useState('exact'); // 'exact' o 'semantic'
+  const [sort, setSort] = useState(''); // '' (relevancia o recientes), 'recent', 'title' o 'author'
   const [ragStats, setRagStats] = useState({ total_documents: 0 });
   const [editingBook, setEditingBook] = useState(null);
   const [convertingId, setConvertingId] = useState(null);
 
   const observer = useRef();
   const isFetchingRef = useRef(false);
+  // Cursor de la página siguiente (cabecera X-Next-Cursor de /books/)
+  const nextCursorRef = useRef(null);
 
   const lastBookElementRef = useCallback(node => {
     if (observer.current) observer.current.disconnect();
@@ -185,7 +212,8 @@ function LibraryView() {
     setPage(0);
     setHasMore(true);
     isFetchingRef.current = false;
-  }, [debouncedSearchTerm, searchParams, searchMode]);
+    nextCursorRef.current = null;
+  }, [debouncedSearchTerm, searchParams, searchMode, sort]);
 
   // Main effect for fetching books
   useEffect(() => {
@@ -208,7 +236,8 @@ function LibraryView() {
       } else if (debouncedSearchTerm) {
         params.append('search', debouncedSearchTerm);
       }
-      params.append('skip', page * PAGE_SIZE);
+      if (sort) params.append('sort', sort);
+      if (page > 0 && nextCursorRef.current) params.append('cursor', nextCursorRef.current);
       params.append('limit', PAGE_SIZE);
       url = `${API_URL}/books/?${params.toString()}`;
     }
@@ -224,8 +253,10 @@ function LibraryView() {
         if (response.ok) {
           const data = await response.json();
           if (!cancelled) {
+            const nextCursor = response.headers.get('X-Next-Cursor');
+            nextCursorRef.current = nextCursor;
             setBooks(prevBooks => page === 0 ? data : [...prevBooks, ...data]);
-            setHasMore(searchMode === 'semantic' ? false : data.length === PAGE_SIZE);
+            setHasMore(searchMode === 'semantic' ? false : Boolean(nextCursor));
           }
         } else if (!cancelled) {
           setError('No se pudieron cargar los libros.');
@@ -248,7 +279,7 @@ function LibraryView() {
       cancelled = true;
     };
 
-  }, [page, debouncedSearchTerm, searchParams, hasMore, searchMode]);
+  }, [page, debouncedSearchTerm, searchParams, hasMore, searchMode, sort]);
 
 
   const handleDeleteBook = useCallback(async (bookId) => {
@@ -398,6 +429,14 @@ function LibraryView() {
               IA 🪄
             </button>
           </div>
+          {searchMode === 'exact' && (
+            <select className="sort-selector" value={sort} onChange={(e) => setSort(e.target.value)} title="Orden de los libros">
+              <option value="">{debouncedSearchTerm ? 'Más relevantes' : 'Recientes'}</option>
+              <option value="recent">Añadidos recientemente</option>
+              <option value="title">Título</option>
+              <option value="author">Autor</option>
+            </select>
+          )}
         </div>
       </div>
 
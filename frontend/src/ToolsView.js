@@ -2,6 +2,8 @@ import React, { useState, useCallback } from 'react';
 import API_URL from './config';
 import './ToolsView.css'; // Usaremos un CSS dedicado
 
+const JOB_POLL_INTERVAL_MS = 1500;
+
 function EpubToPdfConverter() {
   const [selectedFile, setSelectedFile] = useState(null);
   const [message, setMessage] = useState('');
@@ -27,6 +29,24 @@ function EpubToPdfConverter() {
     event.stopPropagation();
   };
 
+  // Consulta el estado del trabajo hasta que termina (completado o fallido)
+  const waitForJob = async (jobId) => {
+    for (;;) {
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      const response = await fetch(`${API_URL}/tools/convert-epub-to-pdf/${jobId}`);
+      if (!response.ok) {
+        return { status: 'failed', error: 'No se encontró el trabajo de conversión.' };
+      }
+      const job = await response.json();
+      if (job.status === 'running') {
+        setMessage('Convirtiendo archivo... Esto puede tardar un momento.');
+      }
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job;
+      }
+    }
+  };
+
   const handleConvert = async () => {
     if (!selectedFile) {
       setMessage('Por favor, selecciona un archivo EPUB primero.');
@@ -40,7 +60,7 @@ function EpubToPdfConverter() {
     const formData = new FormData();
     formData.append('file', selectedFile);
     setIsLoading(true);
-    setMessage('Convirtiendo archivo... Esto puede tardar un momento.');
+    setMessage('Subiendo archivo...');
 
     try {
       const response = await fetch(`${API_URL}/tools/convert-epub-to-pdf`, {
@@ -49,22 +69,29 @@ function EpubToPdfConverter() {
       });
 
       if (response.ok) {
-        // El backend ahora devuelve un JSON con la URL de descarga
-        const result = await response.json();
-        const downloadUrl = `${API_URL}${result.download_url}`;
-        
-        // Crear un enlace y hacer clic para iniciar la descarga
-        const a = document.createElement('a');
-        a.style.display = 'none';
-        a.href = downloadUrl;
-        a.target = '_blank'; // Abre en una nueva pestaña
-        document.body.appendChild(a);
-        a.click();
-        
-        // Limpiar el enlace del DOM
-        document.body.removeChild(a);
-
-        setMessage('¡Conversión completada! La descarga debería iniciarse.');
+        // El backend encola la conversión y devuelve el ID del trabajo
+        const { job_id: jobId } = await response.json();
+        setMessage('Conversión en cola... Esto puede tardar un momento.');
+        const job = await waitForJob(jobId);
+
+        if (job.status === 'completed') {
+          const downloadUrl = `${API_URL}${job.download_url}`;
+
+          // Crear un enlace y hacer clic para iniciar la descarga
+          const a = document.createElement('a');
+          a.style.display = 'none';
+          a.href = downloadUrl;
+          a.target = '_blank'; // Abre en una nueva pestaña
+          document.body.appendChild(a);
+          a.click();
+
+          // Limpiar el enlace del DOM
+          document.body.removeChild(a);
+
+          setMessage('¡Conversión completada! La descarga debería iniciarse.');
+        } else {
+          setMessage(`Error: ${job.error || 'No se pudo convertir el archivo.'}`);
+        }
       } else {
         const result = await response.json();
         setMessage(`Error: ${result.detail || 'No se pudo procesar el archivo.'}`);
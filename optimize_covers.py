@@ -1,11 +1,17 @@
+import argparse
 import os
+import sqlite3
 from PIL import Image
 from pathlib import Path
 
+from backend.covers import placeholder_for
+
 # Configuración
 COVERS_DIR = Path("backend/static/covers")
+DB_PATH = Path("library.db")
 MAX_WIDTH = 400
 QUALITY = 80
+PLACEHOLDER_BATCH_SIZE = 500
 
 def optimize_image(file_path):
     try:
@@ -33,7 +39,7 @@ def optimize_image(file_path):
         print(f"Error optimizando {file_path.name}: {e}")
         return False
 
-def main():
+def optimize_all():
     if not COVERS_DIR.exists():
         print(f"No se encontró el directorio: {COVERS_DIR}")
         return
@@ -50,5 +56,53 @@ def main():
     
     print(f"\nProceso finalizado. {optimized}/{count} imágenes optimizadas.")
 
+def backfill_placeholders(regenerate=False):
+    """Genera el marcador de baja calidad (LQIP) de los libros con portada que no lo tienen."""
+    db_path = DB_PATH.resolve()
+    if not db_path.exists():
+        print(f"No se encontró la base de datos en {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        query = "SELECT id, cover_image_url FROM books WHERE cover_image_url IS NOT NULL"
+        if not regenerate:
+            query += " AND cover_placeholder IS NULL"
+        rows = cursor.execute(query).fetchall()
+        print(f"Generando marcadores para {len(rows)} portadas...")
+
+        done = 0
+        pending = []
+        for book_id, cover_url in rows:
+            placeholder = placeholder_for(cover_url)
+            if placeholder:
+                pending.append((placeholder, book_id))
+            # Se confirma por lotes para no perder el trabajo si se interrumpe
+            if len(pending) >= PLACEHOLDER_BATCH_SIZE:
+                cursor.executemany("UPDATE books SET cover_placeholder = ? WHERE id = ?", pending)
+                conn.commit()
+                done += len(pending)
+                pending = []
+        if pending:
+            cursor.executemany("UPDATE books SET cover_placeholder = ? WHERE id = ?", pending)
+            conn.commit()
+            done += len(pending)
+        print(f"Marcadores generados: {done}/{len(rows)}.")
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimiza las portadas y genera sus marcadores de carga.")
+    parser.add_argument("--placeholders", action="store_true", help="Genera también los marcadores (LQIP) que falten en la BD")
+    parser.add_argument("--only-placeholders", action="store_true", help="Solo genera los marcadores, sin reoptimizar las portadas")
+    parser.add_argument("--regenerate", action="store_true", help="Regenera los marcadores aunque ya existan")
+    args = parser.parse_args()
+
+    if not args.only_placeholders:
+        optimize_all()
+    if args.placeholders or args.only_placeholders:
+        backfill_placeholders(regenerate=args.regenerate)
+
 if __name__ == "__main__":
     main()